@@ -3,16 +3,39 @@ Command Line Interface for the ARXML Merger
 """
 
 import argparse
+import logging
 import sys
+import time
 from pathlib import Path
-from typing import List
+from typing import Callable, List, Optional, Union
 
-from arxml_merger import ArxmlMerger, MergeConfig, ConflictResolutionStrategy
+from arxml_merger import ArxmlMerger, MergeConfig, MergeResult, ConflictResolutionStrategy
 from arxml_merger.core.exceptions import ArxmlMergerException, InvalidArxmlFileError
+from arxml_merger.core.progress import MergeProgress
+from arxml_merger.core.sharding import ShardedMerge
+from arxml_merger.core.watch import DEFAULT_POLL_INTERVAL, MergeWatcher, WatchCycle
+from arxml_merger.server import DEFAULT_ADDRESS, DEFAULT_MODEL_STORE_SIZE, MergeService, create_server
+from arxml_merger.utils.compression import COMPRESSIONS, strip_compression_suffix
+from arxml_merger.utils.archives import is_archive
+from arxml_merger.utils.discovery import (
+    DEFAULT_INPUT_PATTERNS, discover_files, discovery_cache_file, read_manifest
+)
 
 
-def parse_arguments() -> argparse.Namespace:
-    """Parse command line arguments"""
+def parse_size(value: str) -> int:
+    """Parses a size like 1024, 500K, 200M or 2G into bytes"""
+    units = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30, 'T': 1 << 40}
+    text = value.strip().upper().rstrip('B')
+    try:
+        if text and text[-1] in units:
+            return int(float(text[:-1]) * units[text[-1]])
+        return int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid size: {value}")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Argument parser of the merge command"""
     parser = argparse.ArgumentParser(
         description="AUTOSAR ARXML Merger - Merges partial ARXML models based on Splitable Elements",
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -21,20 +44,118 @@ Examples:
   %(prog)s -i model1.arxml model2.arxml -o merged.arxml
   %(prog)s -i *.arxml -o result.arxml --conflict-resolution last_wins
   %(prog)s -i model1.arxml model2.arxml -o merged.arxml --validate-schema
+  %(prog)s -i model1.arxml model2.arxml --dry-run
+  %(prog)s -i model1.arxml.gz model2.arxml.xz -o merged.arxml.gz
+  %(prog)s -i base.arxml supplier.zip -o merged.arxml --archive-exclude 'test/*'
+  %(prog)s --input-dir models/ --manifest overrides.txt -o merged.arxml
+  %(prog)s --input-dir models/ -o merged.arxml --incremental
+  %(prog)s --input-dir models/ -o merged.arxml --out-of-core --spill-dir /scratch
+  %(prog)s --input-dir models/ -o merged.arxml --watch
+  %(prog)s --serve unix:/tmp/arxml-merger.sock
+  %(prog)s shard --input-dir models/ --work-dir /shared/job --shards 16
+  %(prog)s merge-shard --work-dir /shared/job --shard 3
+  %(prog)s stitch --work-dir /shared/job -o merged.arxml
         """
     )
     
     parser.add_argument(
         '-i', '--input',
         nargs='+',
-        required=True,
-        help='Input ARXML files to merge'
+        default=[],
+        help='Input ARXML files or ZIP/TAR bundles to merge'
+    )
+    
+    parser.add_argument(
+        '--input-dir',
+        nargs='+',
+        default=[],
+        metavar='DIR',
+        help='Directories searched recursively for input files (sorted by path)'
+    )
+    
+    parser.add_argument(
+        '--input-pattern',
+        nargs='+',
+        default=list(DEFAULT_INPUT_PATTERNS),
+        metavar='PATTERN',
+        help='File name patterns for --input-dir (default: *.arxml and compressed variants)'
+    )
+    
+    parser.add_argument(
+        '--manifest',
+        metavar='FILE',
+        help="File listing the inputs, one 'path' or 'priority path' per line"
+    )
+    
+    parser.add_argument(
+        '--no-discovery-cache',
+        action='store_true',
+        help='Always rescan --input-dir; by default its file list is cached below --cache-dir or '
+             '--model-cache-dir if one is given'
     )
     
     parser.add_argument(
         '-o', '--output',
-        required=True,
-        help='Output file for merge result'
+        help="Output file for merge result, '-' for stdout (required unless --dry-run)"
+    )
+    
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help='Re-merge only the packages touched by changed inputs, reusing the previous output '
+             'and its merge manifest'
+    )
+    
+    parser.add_argument(
+        '--merge-manifest',
+        metavar='FILE',
+        help='Merge manifest for --incremental (default: OUTPUT.manifest.json.gz)'
+    )
+    
+    parser.add_argument(
+        '--watch',
+        action='store_true',
+        help='Keep running and re-merge incrementally whenever an input file changes'
+    )
+    
+    parser.add_argument(
+        '--watch-interval',
+        type=float,
+        default=DEFAULT_POLL_INTERVAL,
+        metavar='SECONDS',
+        help=f'Polling interval of --watch (default: {DEFAULT_POLL_INTERVAL})'
+    )
+    
+    parser.add_argument(
+        '--serve',
+        nargs='?',
+        const=DEFAULT_ADDRESS,
+        metavar='ADDRESS',
+        help='Run a merge service (JSON-RPC) on HOST:PORT or unix:PATH instead of merging '
+             f'(default: {DEFAULT_ADDRESS}); the other options become its default configuration'
+    )
+    
+    parser.add_argument(
+        '--server-workers',
+        type=int,
+        default=0,
+        metavar='N',
+        help='Requests the merge service executes concurrently (default: 0 = one per CPU)'
+    )
+    
+    parser.add_argument(
+        '--server-max-models',
+        type=int,
+        default=DEFAULT_MODEL_STORE_SIZE,
+        metavar='N',
+        help=f'Parsed inputs the merge service keeps in memory (default: {DEFAULT_MODEL_STORE_SIZE}); '
+             'least recently used ones are dropped'
+    )
+    
+    parser.add_argument(
+        '--dry-run',
+        action='store_true',
+        help='Only report what the merge would do, without building or writing the merged model'
     )
     
     parser.add_argument(
@@ -44,6 +165,13 @@ Examples:
         help='Conflict resolution strategy (default: merge_all)'
     )
     
+    parser.add_argument(
+        '--optimize-order',
+        action='store_true',
+        help='Use the largest input as base and merge the others in cost-based order '
+             '(merge_all only; not with --incremental, --out-of-core, --watch or shard)'
+    )
+    
     parser.add_argument(
         '--validate-schema',
         action='store_true',
@@ -57,6 +185,49 @@ Examples:
         help='Preserve XML comments (default: True)'
     )
     
+    parser.add_argument(
+        '--strip-comments',
+        action='store_true',
+        help='Drop XML comments while parsing'
+    )
+    
+    parser.add_argument(
+        '--preserve-formatting',
+        action='store_true',
+        help='Keep the original whitespace of the input files'
+    )
+    
+    parser.add_argument(
+        '--parser-profile',
+        choices=['fast', 'faithful', 'huge'],
+        help='Parser profile (default: faithful with --preserve-formatting, otherwise fast)'
+    )
+    
+    parser.add_argument(
+        '--low-memory',
+        action='store_true',
+        help='Load, merge and release one input at a time (peak memory: merged model plus largest input)'
+    )
+    
+    parser.add_argument(
+        '--gc-tuning',
+        action='store_true',
+        help='Suspend the cyclic garbage collector while merging'
+    )
+    
+    parser.add_argument(
+        '--out-of-core',
+        action='store_true',
+        help='Spill top-level packages to disk and merge them one at a time '
+             '(peak memory: largest package)'
+    )
+    
+    parser.add_argument(
+        '--spill-dir',
+        metavar='DIR',
+        help='Directory for the spill files of --out-of-core (default: system temp directory)'
+    )
+    
     parser.add_argument(
         '--encoding',
         default='utf-8',
@@ -76,6 +247,110 @@ Examples:
         help='Enable verbose merge output showing detailed element paths'
     )
     
+    parser.add_argument(
+        '--ignore-elements',
+        nargs='+',
+        default=[],
+        metavar='TAG',
+        help='Element tags to drop while parsing, e.g. ADMIN-DATA (optional)'
+    )
+    
+    parser.add_argument(
+        '--save-workers',
+        type=int,
+        default=1,
+        metavar='N',
+        help='Threads serializing top-level packages on save (default: 1, 0 = one per CPU)'
+    )
+    
+    parser.add_argument(
+        '--archive-include',
+        nargs='+',
+        default=[],
+        metavar='PATTERN',
+        help='Glob patterns for members of ZIP/TAR inputs (default: *.arxml)'
+    )
+    
+    parser.add_argument(
+        '--archive-exclude',
+        nargs='+',
+        default=[],
+        metavar='PATTERN',
+        help='Glob patterns for ZIP/TAR members to skip'
+    )
+    
+    parser.add_argument(
+        '--load-workers',
+        type=int,
+        default=1,
+        metavar='N',
+        help='Threads loading ZIP members in parallel (default: 1, 0 = one per CPU)'
+    )
+    
+    parser.add_argument(
+        '--package-workers',
+        type=int,
+        default=1,
+        metavar='N',
+        help='Processes merging large top-level packages in parallel (default: 1, 0 = one per CPU)'
+    )
+    
+    parser.add_argument(
+        '--package-pool-threshold',
+        type=int,
+        default=20000,
+        metavar='ELEMENTS',
+        help='Packages with fewer elements are merged inline by --package-workers (default: 20000)'
+    )
+    
+    parser.add_argument(
+        '--compression',
+        choices=COMPRESSIONS,
+        help='Compress the output (default: chosen by output extension .gz/.xz/.zst)'
+    )
+    
+    parser.add_argument(
+        '--compression-level',
+        type=int,
+        metavar='LEVEL',
+        help='gzip level (1-9), xz preset (0-9) or zstd level (1-22)'
+    )
+    
+    parser.add_argument(
+        '--cache-dir',
+        metavar='DIR',
+        help='Reuse merge results for identical inputs and configuration (opt-in)'
+    )
+    
+    parser.add_argument(
+        '--cache-max-size',
+        type=parse_size,
+        default='1G',
+        metavar='SIZE',
+        help='Size limit of --cache-dir, e.g. 500M or 2G (default: 1G); least recently used results are evicted'
+    )
+    
+    parser.add_argument(
+        '--model-cache-dir',
+        metavar='DIR',
+        help='Cache parsed input models per file content, so unchanged inputs are not re-parsed (opt-in)'
+    )
+    
+    parser.add_argument(
+        '--model-cache-max-size',
+        type=parse_size,
+        default='1G',
+        metavar='SIZE',
+        help='Size limit of --model-cache-dir (default: 1G); least recently used models are evicted'
+    )
+    
+    parser.add_argument(
+        '--progress',
+        choices=['auto', 'always', 'never'],
+        default='auto',
+        help='Show a progress bar on stderr (default: auto, only on a terminal)'
+    )
+    
     parser.add_argument(
         '--log-file',
         help='Log file (optional)'
@@ -88,7 +363,166 @@ Examples:
         help='Pretty print XML output (default: True)'
     )
     
-    return parser.parse_args()
+    return parser
+
+
+def parse_arguments() -> argparse.Namespace:
+    """Parse command line arguments"""
+    parser = build_parser()
+    args = parser.parse_args()
+    if args.serve:
+        if args.input or args.input_dir or args.manifest or args.output:
+            parser.error("--serve takes its inputs and outputs from the requests")
+        return args
+    if not (args.input or args.input_dir or args.manifest):
+        parser.error("at least one of -i/--input, --input-dir or --manifest is required")
+    if not args.output and not args.dry_run:
+        parser.error("the following arguments are required: -o/--output")
+    if args.incremental and (args.dry_run or args.output == '-'):
+        parser.error("--incremental needs an output file")
+    if args.watch and (args.dry_run or args.output == '-'):
+        parser.error("--watch needs an output file")
+    if args.out_of_core and (args.dry_run or args.output == '-'):
+        parser.error("--out-of-core needs an output file")
+    if args.out_of_core and (args.incremental or args.watch):
+        parser.error("--out-of-core cannot be combined with --incremental or --watch")
+    if args.optimize_order and (args.incremental or args.watch or args.out_of_core):
+        parser.error("--optimize-order cannot be combined with --incremental, --out-of-core or --watch")
+    if args.watch_interval <= 0:
+        parser.error("--watch-interval must be positive")
+    return args
+
+
+SHARD_COMMANDS = ('shard', 'merge-shard', 'stitch')
+
+
+def parse_shard_arguments(argv: List[str]) -> argparse.Namespace:
+    """Parse the arguments of the shard, merge-shard and stitch commands"""
+    command, argv = argv[0], argv[1:]
+    if command == 'shard':
+        # Nimmt alle Eingabe- und Merge-Optionen des Merge-Kommandos
+        parser = build_parser()
+        parser.prog += ' shard'
+        parser.description = "Spills the inputs into a shared work directory and splits them into shards"
+        parser.epilog = None
+        parser.add_argument(
+            '--shards',
+            type=int,
+            metavar='N',
+            help='Number of shards (default: one per CPU)'
+        )
+    else:
+        parser = argparse.ArgumentParser(prog=f"{Path(sys.argv[0]).name} {command}")
+        if command == 'merge-shard':
+            parser.description = "Merges shards of a sharded merge (on any node sharing the work directory)"
+            parser.add_argument(
+                '--shard',
+                type=int,
+                nargs='+',
+                metavar='INDEX',
+                help='Shards to merge (default: all shards not merged yet)'
+            )
+        else:
+            parser.description = "Writes the output of a sharded merge from its merged shards"
+            parser.add_argument(
+                '-o', '--output',
+                required=True,
+                help='Output ARXML file'
+            )
+            parser.add_argument(
+                '--compression',
+                choices=COMPRESSIONS,
+                help='Compress the output (default: chosen by output extension .gz/.xz/.zst)'
+            )
+            parser.add_argument(
+                '--compression-level',
+                type=int,
+                metavar='LEVEL',
+                help='gzip level (1-9), xz preset (0-9) or zstd level (1-22)'
+            )
+        parser.add_argument(
+            '--log-level',
+            choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+            default='INFO',
+            help='Log level (default: INFO)'
+        )
+        parser.add_argument(
+            '--log-file',
+            help='Log file (optional)'
+        )
+        parser.add_argument(
+            '--progress',
+            choices=['auto', 'always', 'never'],
+            default='auto',
+            help='Show a progress bar on stderr (default: auto, only on a terminal)'
+        )
+    parser.add_argument(
+        '--work-dir',
+        required=True,
+        help='Work directory shared by all nodes of the sharded merge'
+    )
+    
+    args = parser.parse_args(argv)
+    args.command = command
+    if command == 'shard':
+        if not (args.input or args.input_dir or args.manifest):
+            parser.error("at least one of -i/--input, --input-dir or --manifest is required")
+        if args.output or args.dry_run or args.serve or args.watch or args.incremental or args.out_of_core:
+            parser.error("shard only takes input and merge options; the output is written by stitch")
+        if args.optimize_order:
+            parser.error("shard merges the inputs in the given order; --optimize-order is not supported")
+        if args.shards is not None and args.shards < 1:
+            parser.error("--shards must be positive")
+    return args
+
+
+class ProgressBar(logging.Filter):
+    """Single-line progress bar with ETA; as log filter it clears the line before log output"""
+    
+    STAGES = {'load': 'Loading', 'merge': 'Merging', 'save': 'Writing'}
+    
+    def __init__(self, stream=sys.stderr, width: int = 30, interval: float = 0.1):
+        super().__init__()
+        self.stream = stream
+        self.width = width
+        self.interval = interval
+        self._last_draw = 0.0
+        self._visible = False
+    
+    def __call__(self, event: MergeProgress) -> None:
+        now = time.monotonic()
+        finished = event.fraction == 1.0
+        if now - self._last_draw < self.interval and not finished:
+            return  # höchstens alle interval Sekunden neu zeichnen
+        self._last_draw = now
+        
+        fraction = event.fraction
+        if fraction is None:
+            bar = f"{event.done}"
+        else:
+            filled = int(fraction * self.width)
+            bar = f"[{'#' * filled}{'.' * (self.width - filled)}] {fraction * 100:3.0f}%"
+        if event.stage == 'save':
+            detail = f"{event.done}{'/' + str(event.total) if event.total else ''} packages, {event.bytes_done >> 20} MiB"
+        elif event.stage == 'merge':
+            detail = f"{event.done}/{event.total} files, {event.packages} packages"
+        else:
+            detail = f"{event.done}/{event.total} files"
+        eta = f"  ETA {int(event.eta) // 60}:{int(event.eta) % 60:02d}" if event.eta is not None and not finished else ""
+        self.stream.write(f"\r\x1b[K{self.STAGES.get(event.stage, event.stage)} {bar}  {detail}{eta}")
+        self.stream.flush()
+        self._visible = True
+    
+    def clear(self) -> None:
+        """Removes the bar from the terminal line"""
+        if self._visible:
+            self.stream.write("\r\x1b[K")
+            self.stream.flush()
+            self._visible = False
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        self.clear()
+        return True
 
 
 def create_merge_config(args: argparse.Namespace) -> MergeConfig:
@@ -103,9 +537,28 @@ def create_merge_config(args: argparse.Namespace) -> MergeConfig:
     return MergeConfig(
         conflict_resolution=conflict_resolution_map[args.conflict_resolution],
         validate_schema=args.validate_schema,
-        preserve_comments=args.preserve_comments,
+        optimize_order=args.optimize_order,
+        preserve_comments=args.preserve_comments and not args.strip_comments,
+        preserve_formatting=args.preserve_formatting,
+        parser_profile=args.parser_profile,
         output_encoding=args.encoding,
-        verbose_merge=args.verbose_merge
+        verbose_merge=args.verbose_merge,
+        ignore_elements=args.ignore_elements,
+        save_workers=args.save_workers,
+        output_compression=args.compression,
+        compression_level=args.compression_level,
+        archive_include=args.archive_include,
+        archive_exclude=args.archive_exclude,
+        load_workers=args.load_workers,
+        package_workers=args.package_workers,
+        package_pool_threshold=args.package_pool_threshold,
+        cache_dir=args.cache_dir,
+        cache_max_size=args.cache_max_size,
+        model_cache_dir=args.model_cache_dir,
+        model_cache_max_size=args.model_cache_max_size,
+        low_memory=args.low_memory,
+        gc_tuning=args.gc_tuning,
+        spill_dir=args.spill_dir
     )
 
 
@@ -119,7 +572,8 @@ def validate_input_files(file_paths: List[str]) -> List[Path]:
             print(f"Error: File not found: {file_path}", file=sys.stderr)
             sys.exit(1)
         
-        if not path.suffix.lower() in ['.arxml', '.xml']:
+        # Komprimierte Dateien (model.arxml.gz) werden beim Laden transparent entpackt
+        if not is_archive(path) and not strip_compression_suffix(path).suffix.lower() in ['.arxml', '.xml']:
             print(f"Warning: File has no .arxml/.xml extension: {file_path}", file=sys.stderr)
         
         validated_paths.append(path)
@@ -127,17 +581,159 @@ def validate_input_files(file_paths: List[str]) -> List[Path]:
     return validated_paths
 
 
+def resolve_input_files(args: argparse.Namespace) -> List[Path]:
+    """Collects the inputs of -i, --input-dir and --manifest; duplicates are merged once"""
+    input_files = validate_input_files(args.input)
+    try:
+        if args.input_dir:
+            cache_file = discovery_cache(args)
+            input_files.extend(discover_files(args.input_dir, args.input_pattern, cache_file=cache_file))
+        if args.manifest:
+            input_files.extend(read_manifest(args.manifest))
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    return unique_files(input_files)
+
+
+def discovery_cache(args: argparse.Namespace) -> Optional[Path]:
+    """Cache file of the --input-dir file list; only kept below --cache-dir or --model-cache-dir"""
+    cache_dir = args.cache_dir or args.model_cache_dir
+    if args.no_discovery_cache or not cache_dir:
+        return None
+    return discovery_cache_file(cache_dir, args.input_dir, args.input_pattern)
+
+
+def unique_files(input_files: List[Path]) -> List[Path]:
+    """Drops repeated inputs, keeping the first occurrence"""
+    unique = []
+    seen = set()
+    for path in input_files:
+        key = path.resolve()
+        if key not in seen:
+            seen.add(key)
+            unique.append(path)
+    return unique
+
+
+def watch_inputs(args: argparse.Namespace, input_files: List[Path]) -> Union[List[Path], Callable[[], List[Path]]]:
+    """Inputs of --watch: --input-dir and --manifest are resolved again on every poll"""
+    if not (args.input_dir or args.manifest):
+        return input_files
+    
+    def resolve() -> List[Path]:
+        files = [Path(file_path) for file_path in args.input]
+        if args.input_dir:
+            cache_file = discovery_cache(args)
+            files.extend(discover_files(args.input_dir, args.input_pattern, cache_file=cache_file))
+        if args.manifest:
+            files.extend(read_manifest(args.manifest))
+        return unique_files(files)
+    
+    return resolve
+
+
+def report_watch_cycle(cycle: WatchCycle) -> None:
+    """Prints one line per watch cycle with its latency"""
+    stamp = time.strftime("%H:%M:%S")
+    if not cycle.succeeded:
+        print(f"[{stamp}] Cycle {cycle.number} failed after {cycle.latency * 1000:.0f} ms: {cycle.error}",
+              file=sys.stderr, flush=True)
+        return
+    
+    stats = cycle.result.statistics
+    changed = ", ".join(path.name for path in cycle.changed[:3])
+    if len(cycle.changed) > 3:
+        changed += f" (+{len(cycle.changed) - 3})"
+    if cycle.removed:
+        changed += f"{', ' if changed else ''}{len(cycle.removed)} removed"
+    print(f"[{stamp}] Cycle {cycle.number}: {changed or 'inputs reordered'} -> "
+          f"{stats.files_processed} files, {stats.packages_reused} packages reused, "
+          f"{len(cycle.result.conflicts)} conflicts, latency {cycle.latency * 1000:.0f} ms", flush=True)
+
+
+def run_sharded(args: argparse.Namespace) -> None:
+    """Runs one step of a sharded merge (shard, merge-shard or stitch)"""
+    from arxml_merger.utils import setup_logging
+    setup_logging(log_level=args.log_level, log_file=Path(args.log_file) if args.log_file else None)
+    
+    if args.command == 'shard':
+        config = create_merge_config(args)
+        input_files = resolve_input_files(args)
+    else:
+        config = MergeConfig(output_compression=getattr(args, 'compression', None),
+                             compression_level=getattr(args, 'compression_level', None))
+    sharded = ShardedMerge(args.work_dir, config)
+    progress = None
+    if args.progress == 'always' or (args.progress == 'auto' and sys.stderr.isatty()):
+        # Am Logger statt an den Handlern: jeder Schritt richtet das Logging neu ein
+        progress = sharded.progress_callback = ProgressBar()
+        logging.getLogger("arxml_merger").addFilter(progress)
+    try:
+        if args.command == 'shard':
+            plan = sharded.shard(input_files, args.shards, pretty_print=args.pretty_print)
+        elif args.command == 'merge-shard':
+            indices = args.shard if args.shard is not None else sharded.pending_shards()
+            merged = [index for index in indices if sharded.merge_shard(index)]
+        else:
+            result = sharded.stitch(args.output)
+    finally:
+        if progress is not None:
+            progress.clear()
+    
+    if args.command == 'shard':
+        print(f"Sharded {len(plan.slots)} packages of {len(input_files)} files into {len(plan.shards)} shards "
+              f"in {args.work_dir}")
+    elif args.command == 'merge-shard':
+        print(f"Merged {len(merged)} shards, {len(sharded.pending_shards())} still pending")
+    else:
+        print_summary(result, args.output, sys.stdout)
+
+
+def print_summary(result: MergeResult, output: str, summary, incremental: bool = False) -> None:
+    """Prints the statistics and conflicts of a finished merge"""
+    stats = result.statistics
+    print("✓ Merge completed successfully!", file=summary)
+    print(f"  Files processed: {stats.files_processed}", file=summary)
+    print(f"  Elements merged: {stats.elements_merged}", file=summary)
+    print(f"  Processing time: {stats.processing_time:.2f}s", file=summary)
+    if stats.cache_hit:
+        print("  Result served from cache", file=summary)
+    elif stats.models_from_cache:
+        print(f"  Models loaded from cache: {stats.models_from_cache}", file=summary)
+    if incremental:
+        print(f"  Packages reused: {stats.packages_reused}", file=summary)
+    if stats.peak_rss is not None and not stats.cache_hit:
+        print(f"  Peak memory: {stats.peak_rss / (1 << 20):.1f} MiB "
+              f"(largest input: {stats.largest_input / (1 << 20):.1f} MiB)", file=summary)
+    print(f"  Schema version: {stats.schema_version}", file=summary)
+    for tag, skipped in stats.ignored_elements.items():
+        print(f"  Ignored {tag}: {skipped['nodes']} nodes, {skipped['bytes']} bytes", file=summary)
+    
+    if result.conflicts:
+        print(f"  Conflicts found: {len(result.conflicts)}", file=summary)
+        print(f"  Conflicts resolved: {len([c for c in result.conflicts if c.resolved_value is not None])}",
+              file=summary)
+        
+        if result.has_conflicts():
+            print("\n! Unresolved conflicts:", file=summary)
+            for conflict in result.get_unresolved_conflicts():
+                print(f"    - {conflict.element_path}: {conflict.conflicting_values}", file=summary)
+    
+    print(f"\nResult saved to: {output}", file=summary)
+
+
 def main():
     """Main function for CLI"""
     try:
-        args = parse_arguments()
+        if len(sys.argv) > 1 and sys.argv[1] in SHARD_COMMANDS:
+            run_sharded(parse_shard_arguments(sys.argv[1:]))
+            return
         
-        # Validate input files
-        input_files = validate_input_files(args.input)
+        args = parse_arguments()
         
-        # Create output directory if needed
-        output_path = Path(args.output)
-        output_path.parent.mkdir(parents=True, exist_ok=True)
+        # Validate input files; inputs are merged in the order -i, --input-dir, --manifest
+        input_files = resolve_input_files(args)
         
         # Create merge configuration
         config = create_merge_config(args)
@@ -149,35 +745,83 @@ def main():
             log_file=Path(args.log_file) if args.log_file else None
         )
         
+        if args.serve:
+            service = MergeService(config, workers=args.server_workers, max_models=args.server_max_models)
+            try:
+                server = create_server(service, args.serve)
+            except (OSError, ValueError) as e:
+                print(f"Error: cannot listen on {args.serve}: {e}", file=sys.stderr)
+                sys.exit(1)
+            print(f"Merge service listening on {args.serve} with {service.workers} workers (Ctrl+C to stop)",
+                  flush=True)
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                print("\nMerge service stopped")
+            finally:
+                server.server_close()
+                service.close()
+            return
+        
+        if args.dry_run:
+            plan = ArxmlMerger(config).plan_files(input_files)
+            print(plan.format_report())
+            return
+        
+        # '-' streams the result to stdout, the summary then goes to stderr
+        to_stdout = args.output == '-'
+        summary = sys.stderr if to_stdout else sys.stdout
+        if to_stdout:
+            output_path = sys.stdout.buffer
+        else:
+            # Create output directory if needed
+            output_path = Path(args.output)
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+        
         logger.info("Starting ARXML merge with %d files", len(input_files))
-        logger.info("Output: %s", output_path)
+        logger.info("Output: %s", args.output)
         logger.info("Conflict resolution: %s", args.conflict_resolution)
         
         # Create merger and perform merge
         merger = ArxmlMerger(config)
-        result = merger.merge_files(input_files)
-        
-        # Save result
-        result.save(output_path, pretty_print=args.pretty_print)
-        
-        # Show statistics
-        stats = result.statistics
-        print("✓ Merge completed successfully!")
-        print(f"  Files processed: {stats.files_processed}")
-        print(f"  Elements merged: {stats.elements_merged}")
-        print(f"  Processing time: {stats.processing_time:.2f}s")
-        print(f"  Schema version: {stats.schema_version}")
-        
-        if result.conflicts:
-            print(f"  Conflicts found: {len(result.conflicts)}")
-            print(f"  Conflicts resolved: {len([c for c in result.conflicts if c.resolved_value is not None])}")
-            
-            if result.has_conflicts():
-                print("\n! Unresolved conflicts:")
-                for conflict in result.get_unresolved_conflicts():
-                    print(f"    - {conflict.element_path}: {conflict.conflicting_values}")
-        
-        print(f"\nResult saved to: {output_path}")
+        if args.watch:
+            watcher = MergeWatcher(merger, watch_inputs(args, input_files), output_path, args.merge_manifest,
+                                   pretty_print=args.pretty_print, interval=args.watch_interval)
+            print(f"Watching {len(input_files)} files, writing {args.output} (Ctrl+C to stop)", flush=True)
+            try:
+                watcher.run(on_cycle=report_watch_cycle)
+            except KeyboardInterrupt:
+                print(f"\nWatch stopped after {watcher.cycles} cycles")
+            return
+        
+        if args.incremental:
+            # Schreibt die Ausgabe selbst
+            result = merger.merge_incremental(input_files, output_path, args.merge_manifest,
+                                              pretty_print=args.pretty_print)
+        else:
+            progress = None
+            if args.progress == 'always' or (args.progress == 'auto' and sys.stderr.isatty()):
+                progress = ProgressBar()
+                for handler in logging.getLogger("arxml_merger").handlers:
+                    handler.addFilter(progress)
+            try:
+                if args.out_of_core:
+                    # Schreibt die Ausgabe selbst
+                    merger.progress_callback = progress
+                    result = merger.merge_external(input_files, output_path, pretty_print=args.pretty_print)
+                else:
+                    result = merger.merge_files(input_files, progress_callback=progress)
+                    
+                    # Save result
+                    result.save(output_path, pretty_print=args.pretty_print, progress_callback=progress)
+            finally:
+                merger.close()  # Worker-Prozesse von --package-workers
+                if progress is not None:
+                    progress.clear()
+            if to_stdout:
+                sys.stdout.buffer.flush()
+        
+        print_summary(result, args.output, summary, incremental=args.incremental)
         
     except KeyboardInterrupt:
         print("\nMerge cancelled by user", file=sys.stderr)
@@ -15,9 +15,16 @@ from .exceptions import (
     SchemaValidationError,
     MergeConflictError,
     InvalidArxmlFileError,
-    SplitKeyError
+    SplitKeyError,
+    MergeCancelledError
 )
+from .progress import MergeProgress, CancellationToken
+from .aio import MergeProgressStream
+from .planner import MergePlan, PackagePlan
+from .cache import MergeCache, ModelCache, ModelStore
 from .merger import ArxmlMerger
+from .watch import MergeWatcher, WatchCycle
+from .sharding import ShardedMerge, ShardPlan
 
 __all__ = [
     "MergeConfig",
@@ -31,5 +38,18 @@ __all__ = [
     "MergeConflictError",
     "InvalidArxmlFileError",
     "SplitKeyError",
-    "ArxmlMerger"
+    "MergeCancelledError",
+    "MergeProgress",
+    "CancellationToken",
+    "MergeProgressStream",
+    "MergePlan",
+    "PackagePlan",
+    "MergeCache",
+    "ModelCache",
+    "ModelStore",
+    "ArxmlMerger",
+    "MergeWatcher",
+    "WatchCycle",
+    "ShardedMerge",
+    "ShardPlan"
 ]
@@ -0,0 +1,85 @@
+"""
+Asyncio integration: merges and saves run in an executor, progress arrives as async iterator
+
+The blocking work (parsing, merging, serializing) runs in a thread of an executor, so the
+event loop stays responsive and many merges can be awaited concurrently, also on one
+ArxmlMerger. Cancelling the awaiting task sets a CancellationToken that the worker
+checks between files and packages; the task finishes once the worker has stopped.
+"""
+
+from typing import Callable, Optional, TypeVar
+from concurrent.futures import Executor
+import asyncio
+
+from .exceptions import MergeCancelledError
+from .progress import CancellationToken, MergeProgress, ProgressCallback
+
+
+T = TypeVar("T")
+
+_END = object()
+
+
+class MergeProgressStream:
+    """Async iterator over the progress events of one merge or save; ends when it finishes"""
+
+    def __init__(self):
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _attach(self, loop: asyncio.AbstractEventLoop) -> ProgressCallback:
+        """Callback for the worker thread, forwarding events to the event loop"""
+        self._loop = loop
+        queue = self._queue
+
+        def report(event: MergeProgress) -> None:
+            loop.call_soon_threadsafe(queue.put_nowait, event)
+
+        return report
+
+    def _close(self) -> None:
+        # Auf dem Event-Loop aufgerufen, nach allen Ereignissen des Workers
+        self._loop.call_soon(self._queue.put_nowait, _END)
+
+    def __aiter__(self) -> "MergeProgressStream":
+        return self
+
+    async def __anext__(self) -> MergeProgress:
+        event = await self._queue.get()
+        if event is _END:
+            self._queue.put_nowait(_END)  # weitere Iterationen enden ebenfalls
+            raise StopAsyncIteration
+        return event
+
+
+async def run_in_executor(function: Callable[[Optional[ProgressCallback], CancellationToken], T],
+                          progress: Optional[MergeProgressStream] = None,
+                          executor: Optional[Executor] = None) -> T:
+    """
+    Runs function(progress_callback, cancel_token) in an executor
+
+    Args:
+        function: Blocking work; checks the token and reports through the callback
+        progress: Stream receiving the progress events (closed when the work ends)
+        executor: Executor to run in, defaults to the event loop's
+
+    Returns:
+        The function's result
+    """
+    loop = asyncio.get_running_loop()
+    token = CancellationToken()
+    callback = progress._attach(loop) if progress is not None else None
+    future = loop.run_in_executor(executor, function, callback, token)
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        token.cancel()
+        # Den Worker zu Ende laufen lassen, damit kein Merge im Hintergrund weiterläuft
+        try:
+            await future
+        except MergeCancelledError:
+            pass
+        raise
+    finally:
+        if progress is not None:
+            progress._close()
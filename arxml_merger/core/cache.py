@@ -0,0 +1,390 @@
+"""
+Content-addressed caches for merge results and parsed models
+
+MergeCache: the key covers the content hashes of all inputs (in merge order), the
+merge-relevant MergeConfig fields and the package version. An entry stores the serialized
+output and the statistics and conflicts of the merge, so a hit needs no parsing at all.
+
+ModelCache: one entry per input file, keyed by its content hash, the parser-relevant
+MergeConfig fields and the package version. An entry stores the pruned document (zlib-compressed
+XML) with its schema version, ignored element statistics and split-key check result. A hit still
+hashes the input and parses the stored document; it skips decompressing the input, pruning
+ignored elements, schema detection and the split-key check. Archive members are not cached.
+
+Both evict least-recently-used entries once they exceed their size limit.
+
+ModelStore: parsed inputs kept in memory by long-running callers (watch mode, merge server),
+keyed by resolved path and checked against the content hash; safe to share between threads.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, fields
+from enum import Enum
+from pathlib import Path
+import hashlib
+import json
+import logging
+import marshal
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from lxml import etree
+
+from .models import (
+    ArxmlFile, MergeConfig, MergeConflict, MergeResult, MergeStatistics
+)
+from ..utils.serialization import write_tree
+
+
+CACHE_FORMAT_VERSION = 1
+
+DEFAULT_CACHE_MAX_SIZE = 1 << 30  # 1 GiB
+
+# Felder, die nur die Ausführung betreffen, nicht das gemergte Modell
+_EXECUTION_ONLY_FIELDS = {
+    "verbose_merge", "save_workers", "load_workers", "output_compression", "compression_level",
+    "cache_dir", "cache_max_size", "model_cache_dir", "model_cache_max_size",
+    "low_memory", "gc_tuning", "spill_dir", "package_workers", "package_pool_threshold",
+}
+
+_HASH_CHUNK_SIZE = 1 << 20
+
+_OUTPUT_FILE = "output.arxml"
+_META_FILE = "meta.json"
+_MODEL_SUFFIX = ".model"
+
+
+def hash_file(path: Union[str, Path]) -> str:
+    """Streaming SHA-256 of a file's content"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as stream:
+        for chunk in iter(lambda: stream.read(_HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)  # hashlib gibt den GIL bei großen Blöcken frei
+    return digest.hexdigest()
+
+
+def hash_files(paths: Iterable[Union[str, Path]], workers: Optional[int] = None) -> List[str]:
+    """Hashes files concurrently, results in input order"""
+    paths = list(paths)
+    if len(paths) <= 1:
+        return [hash_file(path) for path in paths]
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="arxml-hash") as executor:
+        return list(executor.map(hash_file, paths))
+
+
+def _json_value(value: Any) -> Any:
+    if isinstance(value, Enum):
+        return value.value
+    return str(value)
+
+
+def config_fingerprint(config: MergeConfig) -> Dict[str, Any]:
+    """MergeConfig fields that influence the merged model"""
+    return {
+        config_field.name: getattr(config, config_field.name)
+        for config_field in fields(config)
+        if config_field.name not in _EXECUTION_ONLY_FIELDS
+    }
+
+
+class MergeCache:
+    """Content-addressed, size-limited LRU cache of merge results"""
+
+    def __init__(self, cache_dir: Union[str, Path], max_size: int = DEFAULT_CACHE_MAX_SIZE,
+                 hash_workers: Optional[int] = None):
+        """
+        Args:
+            cache_dir: Cache directory (created on demand)
+            max_size: Maximum total size of all entries in bytes
+            hash_workers: Threads hashing the inputs (default: ThreadPoolExecutor's)
+        """
+        self.cache_dir = Path(cache_dir)
+        self.results_dir = self.cache_dir / "results"
+        self.max_size = max_size
+        self.hash_workers = hash_workers
+        self.logger = logging.getLogger("arxml_merger")
+
+    def compute_key(self, file_paths: Iterable[Union[str, Path]], config: MergeConfig) -> str:
+        """Cache key of a merge: input content hashes, config and package version"""
+        from .. import __version__
+
+        key_data = {
+            "format": CACHE_FORMAT_VERSION,
+            "version": __version__,
+            "config": config_fingerprint(config),
+            "inputs": hash_files(file_paths, self.hash_workers),
+        }
+        key_json = json.dumps(key_data, sort_keys=True, default=_json_value)
+        return hashlib.sha256(key_json.encode("utf-8")).hexdigest()
+
+    def load(self, key: str, config: MergeConfig) -> Optional[MergeResult]:
+        """
+        Returns the cached result for a key, None on a miss
+
+        The result's tree is parsed from the cached output only when it is accessed;
+        saving with pretty_print copies the cached bytes.
+        """
+        entry = self.results_dir / key
+        try:
+            meta = json.loads((entry / _META_FILE).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if meta.get("format") != CACHE_FORMAT_VERSION:
+            return None
+
+        # Zugriffszeit für die LRU-Verdrängung
+        try:
+            os.utime(entry / _META_FILE)
+        except OSError:
+            return None
+
+        statistics = MergeStatistics(**meta["statistics"])
+        statistics.cache_hit = True
+        conflicts = [MergeConflict.from_dict(conflict) for conflict in meta["conflicts"]]
+        return MergeResult(None, config, statistics, conflicts, cached_output=entry / _OUTPUT_FILE)
+
+    def store(self, key: str, result: MergeResult) -> None:
+        """Stores a result (pretty-printed output, statistics, conflicts) and evicts old entries"""
+        entry = self.results_dir / key
+        if entry.exists():
+            return
+
+        try:
+            self.results_dir.mkdir(parents=True, exist_ok=True)
+            temp_entry = Path(tempfile.mkdtemp(dir=self.results_dir, prefix=".tmp-"))
+        except OSError as e:
+            self.logger.warning("Merge cache not writable: %s", e)
+            return
+
+        try:
+            write_tree(result.merged_tree, temp_entry / _OUTPUT_FILE,
+                       encoding=result.config.output_encoding, pretty_print=True)
+            meta = {
+                "format": CACHE_FORMAT_VERSION,
+                "created": time.time(),
+                "statistics": asdict(result.statistics),
+                "conflicts": [conflict.to_dict() for conflict in result.conflicts],
+            }
+            (temp_entry / _META_FILE).write_text(json.dumps(meta, default=_json_value), encoding="utf-8")
+            # Atomar sichtbar machen; ein paralleler Lauf mit gleichem Schlüssel gewinnt
+            os.rename(temp_entry, entry)
+        except OSError as e:
+            shutil.rmtree(temp_entry, ignore_errors=True)
+            if not entry.exists():
+                self.logger.warning("Could not store merge result in cache: %s", e)
+            return
+
+        self.evict(keep=key)
+
+    def evict(self, keep: Optional[str] = None) -> int:
+        """
+        Removes least recently used entries until the cache fits into max_size
+
+        Args:
+            keep: Key that is never evicted (the entry just stored)
+
+        Returns:
+            Number of bytes freed
+        """
+        return _evict_lru(self.results_dir, self.max_size, keep, self.logger)
+
+
+class ModelCache:
+    """Content-addressed, size-limited LRU cache of parsed input files"""
+
+    def __init__(self, cache_dir: Union[str, Path], max_size: int = DEFAULT_CACHE_MAX_SIZE):
+        """
+        Args:
+            cache_dir: Cache directory (created on demand)
+            max_size: Maximum total size of all entries in bytes
+        """
+        self.cache_dir = Path(cache_dir)
+        self.models_dir = self.cache_dir / "models"
+        self.max_size = max_size
+        self.logger = logging.getLogger("arxml_merger")
+
+    def compute_key(self, file_path: Union[str, Path], config: MergeConfig) -> str:
+        """Cache key of a parsed file: content hash, parser-relevant config and package version"""
+        from .. import __version__
+
+        key_data = {
+            "format": CACHE_FORMAT_VERSION,
+            "version": __version__,
+            "marshal": marshal.version,
+            "parser": config.get_parser_options(),
+            "ignore_elements": sorted(config.ignore_elements),
+            "custom_split_keys": config.custom_split_keys,
+            "input": hash_file(file_path),
+        }
+        key_json = json.dumps(key_data, sort_keys=True, default=_json_value)
+        return hashlib.sha256(key_json.encode("utf-8")).hexdigest()
+
+    def _entry(self, key: str) -> Path:
+        return self.models_dir / f"{key}{_MODEL_SUFFIX}"
+
+    def load(self, key: str, file_path: Union[str, Path], config: MergeConfig) -> Optional[ArxmlFile]:
+        """Returns the cached model for a key as ArxmlFile of file_path, None on a miss"""
+        entry = self._entry(key)
+        try:
+            data = entry.read_bytes()
+            os.utime(entry)  # Zugriffszeit für die LRU-Verdrängung
+        except OSError:
+            return None
+        try:
+            return ArxmlFile.from_bytes(data, file_path, config)
+        except (ValueError, KeyError, etree.XMLSyntaxError) as e:
+            self.logger.warning("Discarding corrupt model cache entry %s: %s", entry.name, e)
+            try:
+                entry.unlink()
+            except OSError:
+                pass
+            return None
+
+    def store(self, key: str, arxml_file: ArxmlFile) -> None:
+        """Stores a parsed model and evicts old entries"""
+        entry = self._entry(key)
+        if entry.exists():
+            return
+
+        try:
+            self.models_dir.mkdir(parents=True, exist_ok=True)
+            fd, temp_name = tempfile.mkstemp(dir=self.models_dir, prefix=".tmp-")
+        except OSError as e:
+            self.logger.warning("Model cache not writable: %s", e)
+            return
+
+        try:
+            with os.fdopen(fd, "wb") as stream:
+                stream.write(arxml_file.to_bytes())
+            os.replace(temp_name, entry)
+        except OSError as e:
+            try:
+                os.unlink(temp_name)
+            except OSError:
+                pass
+            self.logger.warning("Could not store %s in model cache: %s", arxml_file.file_path, e)
+            return
+
+        self.evict(keep=entry.name)
+
+    def evict(self, keep: Optional[str] = None) -> int:
+        """
+        Removes least recently used entries until the cache fits into max_size
+
+        Args:
+            keep: Entry file name that is never evicted
+
+        Returns:
+            Number of bytes freed
+        """
+        return _evict_lru(self.models_dir, self.max_size, keep, self.logger)
+
+
+class ModelStore:
+    """Thread-safe in-memory store of parsed inputs: resolved path -> (content hash, ArxmlFile)"""
+
+    def __init__(self, max_models: Optional[int] = None):
+        """
+        Args:
+            max_models: Maximum number of models; least recently used ones are dropped
+                (default: unlimited)
+        """
+        self.max_models = max_models
+        self._models: "OrderedDict[str, Tuple[str, ArxmlFile]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path: str, file_hash: str) -> Optional[ArxmlFile]:
+        """Returns the model of path if it was parsed from content with file_hash, None otherwise"""
+        with self._lock:
+            model = self._models.get(path)
+            if model is None or model[0] != file_hash:
+                return None
+            self._models.move_to_end(path)
+            return model[1]
+
+    def put(self, path: str, file_hash: str, arxml_file: ArxmlFile) -> None:
+        """Stores the model of path, replacing an older one, and drops the least recently used"""
+        with self._lock:
+            self._models[path] = (file_hash, arxml_file)
+            self._models.move_to_end(path)
+            if self.max_models is not None:
+                while len(self._models) > self.max_models:
+                    self._models.popitem(last=False)
+
+    def retain(self, hashes: Dict[str, str]) -> int:
+        """
+        Drops every model whose path is not in hashes or whose content hash changed
+
+        Args:
+            hashes: Resolved path -> current content hash
+
+        Returns:
+            Number of models dropped
+        """
+        with self._lock:
+            stale = [path for path, (file_hash, _) in self._models.items() if hashes.get(path) != file_hash]
+            for path in stale:
+                del self._models[path]
+        return len(stale)
+
+    def values(self) -> List[ArxmlFile]:
+        """Snapshot of the stored models, least recently used first"""
+        with self._lock:
+            return [arxml_file for _, arxml_file in self._models.values()]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._models)
+
+
+def _entry_usage(path: str) -> Tuple[float, int]:
+    """(last use, size) of a cache entry: a file or a result directory with meta.json"""
+    if os.path.isdir(path):
+        size = sum(item.stat().st_size for item in os.scandir(path))
+        return os.stat(os.path.join(path, _META_FILE)).st_mtime, size
+    stat = os.stat(path)
+    return stat.st_mtime, stat.st_size
+
+
+def _evict_lru(directory: Path, max_size: int, keep: Optional[str], logger: logging.Logger) -> int:
+    """Removes the least recently used entries of a cache directory until it fits into max_size"""
+    entries = []
+    total_size = 0
+    try:
+        candidates = list(os.scandir(directory))
+    except OSError:
+        return 0
+    for candidate in candidates:
+        if candidate.name.startswith("."):
+            continue  # unfertige Einträge anderer Läufe
+        try:
+            last_used, size = _entry_usage(candidate.path)
+        except OSError:
+            continue
+        entries.append((last_used, candidate.name, size))
+        total_size += size
+
+    freed = 0
+    for _, name, size in sorted(entries):
+        if total_size <= max_size:
+            break
+        if name == keep:
+            continue
+        path = directory / name
+        if path.is_dir():
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            try:
+                path.unlink()
+            except OSError:
+                continue
+        total_size -= size
+        freed += size
+    if freed:
+        logger.info("Cache %s: evicted %d bytes", directory, freed)
+    return freed
@@ -0,0 +1,42 @@
+"""
+Per-merge state of ArxmlMerger
+
+ArxmlMerger itself only holds configuration, tables shared read-only by its merges
+(compiled split keys, the process-wide schema handlers, observers) and thread-safe shared
+resources (in-memory models, the package worker pool). Everything a running
+merge changes lives in a MergeContext that the merge opens for its thread, so one merger
+instance can run merges in several threads at the same time.
+"""
+
+from typing import TYPE_CHECKING, Dict, Optional
+from dataclasses import dataclass, field
+
+from lxml import etree
+
+from .progress import CancellationToken, ProgressCallback
+from .worklist import UnitTiming
+from ..utils.xml_utils import SubtreeDigest
+
+if TYPE_CHECKING:
+    from .cache import ModelStore
+
+
+@dataclass
+class MergeContext:
+    """State of one running merge"""
+    # Progress callback and cancellation token of this merge (see core.progress)
+    progress_callback: Optional[ProgressCallback] = None
+    cancel_token: Optional[CancellationToken] = None
+    # Merkle digest state: skip identical subtrees, digests of the current source and the target
+    skip_identical: bool = False
+    source_digests: Optional[Dict[etree._Element, SubtreeDigest]] = None
+    target_digests: Dict[etree._Element, SubtreeDigest] = field(default_factory=dict)
+    # Source elements whose identical copies merge as a no-op (see ArxmlMerger._has_unique_matches)
+    unique_matches: Dict[etree._Element, bool] = field(default_factory=dict)
+    subtrees_skipped: int = 0
+    nodes_skipped: int = 0
+    models_from_cache: int = 0
+    # Parsed inputs kept in memory: ArxmlMerger.models or the store passed by the caller
+    models: Optional["ModelStore"] = None
+    # Merge units per element type if ArxmlMerger.unit_timings is set; added to it at the end
+    unit_timings: Optional[Dict[str, UnitTiming]] = None
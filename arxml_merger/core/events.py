@@ -0,0 +1,127 @@
+"""
+Merge events: structured hooks into the element-level merge
+
+The merge engine reports every decision it takes on an element (added, merged, replaced,
+kept, conflict) as a typed event to the registered observers. Events are only constructed
+when at least one observer is registered; without observers the merge loops do a single
+truthiness check per decision. Paths and signatures are computed lazily, only when an
+observer reads them, and only during the callback (the merged tree keeps changing).
+
+verbose_merge is implemented as the observer VerboseMergeLogger.
+"""
+
+from typing import Callable, List, Optional, Sequence, Tuple, Type
+import logging
+
+from lxml import etree
+
+from .models import MergeConflict
+from ..utils.xml_utils import get_autosar_path, get_element_signature, get_local_name
+
+
+class MergeEvent:
+    """Base class of all merge events"""
+
+    __slots__ = ("element", "source", "source_file", "split_keys")
+
+    def __init__(self, element: etree._Element, source: etree._Element, source_file: str,
+                 split_keys: Optional[List[str]] = None):
+        self.element = element  # betroffenes Element im gemergten Baum
+        self.source = source  # Element der Quelldatei
+        self.source_file = source_file
+        self.split_keys = split_keys  # nur bei Kindern splitbarer Elemente gesetzt
+
+    @property
+    def tag(self) -> str:
+        return get_local_name(self.element)
+
+    @property
+    def path(self) -> str:
+        """AUTOSAR path of the element in the merged tree"""
+        return get_autosar_path(self.element)
+
+    @property
+    def signature(self) -> Optional[str]:
+        """Split key signature of the source element, None for elements without split keys"""
+        if self.split_keys is None:
+            return None
+        return get_element_signature(self.source, self.split_keys)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.tag}, {self.source_file})"
+
+
+class ElementAdded(MergeEvent):
+    """The source element had no counterpart and was copied into the merged tree"""
+    __slots__ = ()
+
+
+class ElementMerged(MergeEvent):
+    """The source element is merged recursively into its counterpart"""
+    __slots__ = ()
+
+
+class ElementReplaced(MergeEvent):
+    """The counterpart was replaced by a copy of the source element (LAST_WINS)"""
+    __slots__ = ()
+
+
+class ElementKept(MergeEvent):
+    """The counterpart was kept and the source element ignored (FIRST_WINS)"""
+    __slots__ = ()
+
+
+class ConflictDetected(MergeEvent):
+    """A conflict was recorded for the element"""
+
+    __slots__ = ("conflict",)
+
+    def __init__(self, element: etree._Element, source: etree._Element, source_file: str,
+                 conflict: MergeConflict, split_keys: Optional[List[str]] = None):
+        super().__init__(element, source, source_file, split_keys)
+        self.conflict = conflict
+
+
+MergeObserver = Callable[[MergeEvent], None]
+
+# (observer, event types or None for all)
+ObserverEntry = Tuple[MergeObserver, Optional[Tuple[Type[MergeEvent], ...]]]
+
+
+def dispatch(observers: Sequence[ObserverEntry], event: MergeEvent) -> None:
+    """Passes an event to every observer registered for its type"""
+    for observer, event_types in observers:
+        if event_types is None or isinstance(event, event_types):
+            observer(event)
+
+
+class VerboseMergeLogger:
+    """Observer logging every merge decision (MergeConfig.verbose_merge)"""
+
+    def __init__(self, logger: logging.Logger):
+        self.logger = logger
+
+    def __call__(self, event: MergeEvent) -> None:
+        if event.tag == "AR-PACKAGE" and not isinstance(event, ConflictDetected):
+            if isinstance(event, ElementAdded):
+                self.logger.info("+ Added new package: %s (from %s)", event.path, event.source_file)
+            else:
+                self.logger.info("* Merging package: %s (from %s)", event.path, event.source_file)
+        elif isinstance(event, ElementAdded):
+            if event.split_keys is not None:
+                self.logger.info("  + Added new splitable element: %s (%s) from %s",
+                                 event.path, event.signature, event.source_file)
+            else:
+                self.logger.info("  + Added new child element: %s from %s", event.path, event.source_file)
+        elif isinstance(event, ElementMerged):
+            if event.split_keys is not None:
+                self.logger.info("  * Merging splitable element: %s (%s) from %s",
+                                 event.path, event.signature, event.source_file)
+            else:
+                self.logger.info("  * Recursively merging: %s from %s", event.path, event.source_file)
+        elif isinstance(event, ElementReplaced):
+            self.logger.info("  ~ Replaced non-splitable element: %s from %s", event.path, event.source_file)
+        elif isinstance(event, ElementKept):
+            self.logger.info("  = Kept target element: %s (ignoring %s)", event.path, event.source_file)
+        elif isinstance(event, ConflictDetected):
+            self.logger.warning("  ! Conflict detected at: %s from %s", event.path, event.source_file)
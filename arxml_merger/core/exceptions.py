@@ -36,3 +36,8 @@ class SplitKeyError(ArxmlMergerException):
         super().__init__(message)
         self.split_key = split_key
         self.element_path = element_path
+
+
+class MergeCancelledError(ArxmlMergerException):
+    """Merge or save stopped through a CancellationToken"""
+    pass
@@ -0,0 +1,428 @@
+"""
+Out-of-core merge for models larger than the available memory
+
+Top-level packages are merged independently of each other (see core.incremental), so the
+merge can run package by package:
+
+1. Spill: every input is streamed with iterparse. Each completed top-level AR-PACKAGE is
+   pruned of ignored elements, serialized into a spill file named after its split key and
+   dropped from the parse tree. The first input keeps a placeholder comment in its place;
+   what remains of it is the envelope of the output.
+2. Merge and write: the envelope is written with the streaming serializer. At each
+   placeholder the package's fragments are read back, merged with the regular element
+   merge (ArxmlMerger._merge_elements), serialized and released again.
+
+At any time only the envelope, the package keys and one package with one source fragment
+are held in memory. The output, its statistics and its conflicts are identical to a full
+merge.
+"""
+
+from typing import Callable, Dict, List, Optional, Tuple, Union
+from dataclasses import dataclass, field
+from pathlib import Path
+import hashlib
+import os
+import tempfile
+import time
+
+from lxml import etree
+
+from .context import MergeContext
+from .models import MergeConflict, MergeResult, MergeStatistics
+from .events import ElementAdded, ElementMerged, dispatch
+from .exceptions import ArxmlMergerException, InvalidArxmlFileError
+from .incremental import PackageKey, _FILE_MODE, _absolute_conflicts, _relative_conflict
+from .progress import ProgressTracker, input_size
+from ..schema.autosar_schema import SchemaDetector
+from ..utils.archives import is_archive
+from ..utils.compression import (
+    check_compression, compression_from_suffix, detect_compression, open_input, open_output
+)
+from ..utils.parsing import get_parser
+from ..utils.pruning import PruningReader
+from ..utils.serialization import (
+    iter_serialized_slots, new_placeholder_marker, serialize_package, supports_splicing
+)
+from ..utils.xml_utils import (
+    get_element_path, get_local_name, prune_element, validate_arxml_structure
+)
+
+
+_SPILL_SUFFIX = ".xml"
+
+
+@dataclass
+class Fragment:
+    """A top-level package of one input, spilled to disk"""
+    file_index: int
+    position: int  # Position unter den Top-Level-Packages der Datei
+    offset: int
+    length: int
+
+
+@dataclass
+class SpilledPackage:
+    """All spilled occurrences of one package key"""
+    spill_file: Path
+    fragments: List[Fragment] = field(default_factory=list)
+    size: int = 0
+
+
+class ExternalMerger:
+    """Merges files package by package through spill files on disk"""
+
+    def __init__(self, merger):
+        """
+        Args:
+            merger: ArxmlMerger providing configuration and the element merge
+        """
+        self.merger = merger
+        self.config = merger.config
+        self.logger = merger.logger
+
+    def merge(self, file_paths: List[Union[str, Path]], output: Union[str, Path],
+              pretty_print: bool = True, spill_dir: Optional[Union[str, Path]] = None) -> MergeResult:
+        """
+        Merges the files into output without holding the merged model in memory
+
+        Args:
+            file_paths: Files to merge (ARXML, optionally compressed; no archives)
+            output: Output path, replaced atomically; compressed by extension or
+                config.output_compression
+            pretty_print: Indent the output
+            spill_dir: Directory for the temporary spill files (default: config.spill_dir,
+                then the system's temporary directory)
+
+        Returns:
+            MergeResult; its tree is parsed from the output on demand
+        """
+        with self.merger._merge_context() as context:
+            return self._merge(file_paths, output, pretty_print, spill_dir, context)
+
+    def _merge(self, file_paths: List[Union[str, Path]], output: Union[str, Path], pretty_print: bool,
+               spill_dir: Optional[Union[str, Path]], context: MergeContext) -> MergeResult:
+        start_time = time.time()
+        if not file_paths:
+            raise ArxmlMergerException("No files provided for merging")
+        archives = [str(file_path) for file_path in file_paths if is_archive(file_path)]
+        if archives:
+            raise ArxmlMergerException(f"Out-of-core merge does not support archive inputs: {archives}")
+        if self.config.optimize_order:
+            raise ArxmlMergerException("Out-of-core merge does not support optimize_order: "
+                                       "it merges the inputs in the given order")
+
+        output = Path(output)
+        compression = self.config.output_compression or compression_from_suffix(output)
+        if compression is not None:
+            try:
+                check_compression(compression, self.config.compression_level)
+            except ValueError as e:
+                raise ArxmlMergerException(str(e)) from e
+        spill_dir = spill_dir or self.config.spill_dir
+        if spill_dir is not None:
+            Path(spill_dir).mkdir(parents=True, exist_ok=True)
+
+        with tempfile.TemporaryDirectory(dir=spill_dir, prefix="arxml-spill-") as temp_dir:
+            self._reset_state(Path(temp_dir), file_paths)
+            self._spill_inputs([Path(file_path) for file_path in file_paths])
+            self._check_splicing()
+            spilled = sum(package.size for package in self.packages.values())
+            self.logger.info("Out-of-core merge: %d packages (%d bytes) spilled to %s",
+                             len(self.packages), spilled, self.spill_dir)
+            slots = self._plan_slots()
+            elements, slot_conflicts = self._write_output(output, compression, pretty_print, slots)
+
+        base_count = len(self.file_keys[0])
+        introduced = [(origin, self.file_keys[origin].index(key)) for key, origin, _ in slots[base_count:]]
+        conflicts = _absolute_conflicts(slot_conflicts, base_count, introduced,
+                                        get_element_path(self._packages_parent(self.envelope_root)))
+        statistics = MergeStatistics(
+            files_processed=len(file_paths),
+            elements_merged=elements,
+            conflicts_found=len(conflicts),
+            conflicts_resolved=len([c for c in conflicts if c.resolved_value is not None]),
+            processing_time=time.time() - start_time,
+            schema_version=self.schema_versions[0],
+            ignored_elements=self.ignored_elements,
+            subtrees_skipped=context.subtrees_skipped,
+            nodes_skipped=context.nodes_skipped,
+            largest_input=max(input_size(file_path) for file_path in file_paths)
+        )
+        self.logger.info("Out-of-core merge completed in %.2fs: %d packages, %d elements",
+                         statistics.processing_time, len(slots), elements)
+        return MergeResult(None, self.config, statistics, conflicts, cached_output=output)
+
+    @staticmethod
+    def _packages_parent(root: etree._Element) -> Optional[etree._Element]:
+        return next((child for child in root if get_local_name(child) == "AR-PACKAGES"), None)
+
+    def _reset_state(self, spill_dir: Path, file_paths: List[Union[str, Path]]) -> None:
+        self.spill_dir = spill_dir
+        self.file_paths = [str(file_path) for file_path in file_paths]
+        self.packages: Dict[PackageKey, SpilledPackage] = {}
+        self.file_keys: List[List[PackageKey]] = []
+        self.ignored_elements: Dict[str, Dict[str, int]] = {}
+        self.schema_versions: List[str] = []
+        self.marker = new_placeholder_marker()
+        self.envelope_root: Optional[etree._Element] = None
+
+    def _check_splicing(self) -> None:
+        if not supports_splicing(self.envelope_root, self.config.output_encoding):
+            raise ArxmlMergerException(
+                "Out-of-core merge needs an ASCII-compatible output encoding and an AR-PACKAGES "
+                f"element in {self.file_paths[0]}"
+            )
+
+    def _spill_inputs(self, file_paths: List[Path], start: int = 0,
+                      on_spilled: Optional[Callable[[int], None]] = None) -> None:
+        """
+        Streams every input from start on and spills its top-level packages
+
+        Args:
+            file_paths: All inputs of the merge
+            start: Index of the first input to spill (earlier ones are already spilled)
+            on_spilled: Called with the input's index after each spilled input
+        """
+        context = self.merger._context
+        tracker = None
+        if context.progress_callback is not None:
+            sizes = [input_size(file_path) for file_path in file_paths]
+            tracker = ProgressTracker(context.progress_callback, "load", len(file_paths), sum(sizes))
+        for index in range(start, len(file_paths)):
+            file_path = file_paths[index]
+            if context.cancel_token is not None:
+                context.cancel_token.raise_if_cancelled()
+            try:
+                self._spill_file(index, file_path)
+            except (OSError, etree.XMLSyntaxError) as e:
+                raise InvalidArxmlFileError(f"Error loading file {file_path}: {e}", str(file_path)) from e
+            self.logger.info("File spilled: %s (Schema: %s, %d packages)",
+                             file_path, self.schema_versions[index], len(self.file_keys[index]))
+            if on_spilled is not None:
+                on_spilled(index)
+            if tracker is not None:
+                tracker.report(index + 1, sum(sizes[:index + 1]), str(file_path))
+
+        versions = set(self.schema_versions)
+        if len(versions) > 1:
+            self.logger.warning("Different schema versions detected: %s", versions)
+
+    def _spill_file(self, index: int, file_path: Path) -> None:
+        """Parses one input incrementally; completed top-level packages go to the spill files"""
+        merger = self.merger
+        ignore = set(self.config.ignore_elements)
+        tags = ["{*}AR-PACKAGE"] + ["{*}" + name for name in sorted(ignore)]
+        keys: List[PackageKey] = []
+        unidentified: List[str] = []
+        schema_handler = extract_key = None
+
+        stream = open_input(file_path) if ignore or detect_compression(file_path) is not None else None
+        try:
+            # Wie parse_pruned: ignorierte Teilbäume erreichen den Parser nicht
+            skipped: Dict[str, Dict[str, int]] = {}
+            if ignore:
+                source = PruningReader(stream, ignore, self.config.get_parser_options()["remove_blank_text"])
+                skipped = source.skipped
+            else:
+                source = stream if stream is not None else str(file_path)
+            context = etree.iterparse(source, events=("end",), tag=tags, **self.config.get_parser_options())
+            for _, element in context:
+                parent = element.getparent()
+                if parent is None:
+                    continue
+                tag = get_local_name(element)
+                if tag in ignore:
+                    prune_element(element, skipped)  # nur bei UTF-16, siehe PruningReader
+                    continue
+                if get_local_name(parent) != "AR-PACKAGES" or parent.getparent() is None \
+                        or parent.getparent().getparent() is not None:
+                    continue  # Unterpaket, wird mit seinem Top-Level-Package geschrieben
+
+                if schema_handler is None:
+                    if index == 0:
+                        self.base_version = SchemaDetector.detect_schema_version(parent.getparent())
+                    schema_handler = merger._get_schema_handler(self.base_version)
+                    extract_key = merger._get_key_extractor(schema_handler, "AR-PACKAGE")
+                key = extract_key(element)
+                unidentified.extend(merger._find_unidentified_elements(element, schema_handler))
+                self._spill_package(key, index, len(keys), etree.tostring(element, with_tail=False))
+                keys.append(key)
+
+                # Erst leeren: ein Teilbaum, der das Dokument verlässt, wird sonst Knoten für Knoten umgehängt
+                tail = element.tail
+                element.clear()
+                if index == 0:
+                    placeholder = etree.Comment(self.marker)
+                    placeholder.tail = tail
+                    parent.replace(element, placeholder)
+                else:
+                    parent.remove(element)
+            root = context.root
+        finally:
+            if stream is not None:
+                stream.close()
+        for tag, stats in skipped.items():
+            totals = self.ignored_elements.setdefault(tag, {"nodes": 0, "bytes": 0})
+            totals["nodes"] += stats["nodes"]
+            totals["bytes"] += stats["bytes"]
+
+        errors = validate_arxml_structure(root)
+        if errors:
+            raise InvalidArxmlFileError(f"Structure errors in {file_path}: {errors}", str(file_path))
+        if unidentified:
+            self.logger.warning("Partial model constraints in %s: %s", file_path, unidentified)
+        self.schema_versions.append(SchemaDetector.detect_schema_version(root))
+        self.file_keys.append(keys)
+        if index == 0:
+            self.base_version = self.schema_versions[0]
+            self.envelope_root = root
+
+    def _spill_package(self, key: PackageKey, file_index: int, position: int, data: bytes) -> None:
+        package = self.packages.get(key)
+        if package is None:
+            name = hashlib.blake2b(repr(key).encode("utf-8"), digest_size=16).hexdigest()
+            package = self.packages[key] = SpilledPackage(self.spill_dir / (name + _SPILL_SUFFIX))
+        with open(package.spill_file, "ab") as stream:
+            package.fragments.append(Fragment(file_index, position, package.size, len(data)))
+            stream.write(data)
+        package.size += len(data)
+
+    def _plan_slots(self) -> List[Tuple[PackageKey, int, Optional[int]]]:
+        """
+        Top-level packages of the output in document order, as the full merge builds them
+
+        Returns:
+            (key, origin file, occurrence) per output package; occurrence is set for
+            repeated keys of the first input, which are copied as they are, never merged into
+        """
+        slots = []
+        seen = set()
+        for index, keys in enumerate(self.file_keys):
+            for key in keys:
+                if key in seen:
+                    if index == 0:
+                        occurrence = sum(1 for slot in slots if slot[0] == key)
+                        slots.append((key, 0, occurrence))
+                    continue
+                seen.add(key)
+                slots.append((key, index, None))
+        return slots
+
+    def _read_fragment(self, package: SpilledPackage, fragment: Fragment) -> etree._Element:
+        with open(package.spill_file, "rb") as stream:
+            stream.seek(fragment.offset)
+            data = stream.read(fragment.length)
+        # Die Fragmente sind bereits mit den Optionen der Konfiguration geparst worden
+        return etree.fromstring(data, get_parser(remove_blank_text=False, resolve_entities=False,
+                                                 huge_tree=True))
+
+    def _merge_slot(self, key: PackageKey, origin: int, occurrence: Optional[int],
+                    placeholder: etree._Element) -> Tuple[etree._Element, List[Tuple[int, int, MergeConflict]]]:
+        """Merges all fragments of a package in place of its placeholder"""
+        merger = self.merger
+        context = merger._context
+        spilled = self.packages[key]
+        if occurrence is not None:
+            base, sources = [f for f in spilled.fragments if f.file_index == 0][occurrence], []
+        else:
+            base = spilled.fragments[0]
+            # Wiederholungen in der ersten Datei sind eigene Packages
+            sources = [f for f in spilled.fragments[1:] if f.file_index != 0]
+
+        package = self._read_fragment(spilled, base)
+        package.tail = placeholder.tail
+        placeholder.getparent().replace(placeholder, package)
+        if origin != 0 and merger._observers:
+            dispatch(merger._observers, ElementAdded(package, package, self.file_paths[origin]))
+
+        schema_handler = merger._get_schema_handler(self.base_version)
+        packages_path = get_element_path(package.getparent()) + "/AR-PACKAGE"
+        conflicts = []
+        for fragment in sources:
+            if context.cancel_token is not None:
+                context.cancel_token.raise_if_cancelled()
+            source_package = self._read_fragment(spilled, fragment)
+            source_file = self.file_paths[fragment.file_index]
+            context.source_digests = {} if context.skip_identical else None
+            if merger._observers:
+                dispatch(merger._observers, ElementMerged(package, source_package, source_file))
+            conflicts.extend((fragment.file_index, fragment.position, _relative_conflict(conflict, packages_path))
+                             for conflict in merger._merge_elements(package, source_package,
+                                                                    schema_handler, source_file))
+            context.source_digests = None
+            context.target_digests = {}
+            context.unique_matches = {}
+        return package, conflicts
+
+    def _slot_nodes(self, slot_count: int) -> Tuple[List[etree._Element], int]:
+        """Placeholder of every output package in the envelope and the envelope's element count"""
+        packages_parent = self._packages_parent(self.envelope_root)
+        slot_nodes = [node for node in packages_parent if node.tag is etree.Comment and node.text == self.marker]
+        elements = sum(1 for _ in self.envelope_root.iter()) - len(slot_nodes)
+        for _ in range(len(slot_nodes), slot_count):
+            # Neue Packages hängt der Merge ans Ende von AR-PACKAGES
+            placeholder = etree.Comment(self.marker)
+            packages_parent.append(placeholder)
+            slot_nodes.append(placeholder)
+        return slot_nodes, elements
+
+    def _merge_package(self, slot: Tuple[PackageKey, int, Optional[int]], placeholder: etree._Element,
+                       pretty_print: bool) -> Tuple[bytes, int, List[Tuple[int, int, MergeConflict]]]:
+        """Merges one output package and serializes it; the placeholder is put back afterwards"""
+        package, conflicts = self._merge_slot(*slot, placeholder)
+        chunk = serialize_package(package, self.config.output_encoding, pretty_print)
+        elements = sum(1 for _ in package.iter())
+        package.clear()  # siehe _spill_file
+        package.getparent().replace(package, placeholder)
+        return chunk, elements, conflicts
+
+    def _write_output(self, output: Path, compression: Optional[str], pretty_print: bool,
+                      slots: List[Tuple[PackageKey, int, Optional[int]]]
+                      ) -> Tuple[int, List[List[Tuple[int, int, MergeConflict]]]]:
+        """
+        Writes the output atomically, merging each package when the serializer reaches it
+
+        Returns:
+            Element count of the output and the conflicts per output package
+        """
+        progress_callback = self.merger._context.progress_callback
+        slot_nodes, elements = self._slot_nodes(len(slots))
+        slot_index = {node: index for index, node in enumerate(slot_nodes)}
+
+        tracker = None
+        if progress_callback is not None:
+            # Mergen und Schreiben sind eine Phase: Fortschritt wie beim Speichern je Package
+            tracker = ProgressTracker(progress_callback, "save", len(slots))
+        slot_conflicts: List[List[Tuple[int, int, MergeConflict]]] = []
+        written = 0
+
+        output.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_name = tempfile.mkstemp(dir=output.parent, prefix=".tmp-", suffix=output.name)
+        os.chmod(temp_name, _FILE_MODE)
+        try:
+            with os.fdopen(fd, "wb") as target:
+                stream = open_output(target, compression, self.config.compression_level) if compression else target
+                try:
+                    for node, chunk in iter_serialized_slots(self.envelope_root, self.marker,
+                                                             self.config.output_encoding, pretty_print):
+                        if node is not None:
+                            slot = slots[slot_index[node]]
+                            chunk, package_elements, conflicts = self._merge_package(slot, node, pretty_print)
+                            elements += package_elements
+                            slot_conflicts.append(conflicts)
+                        stream.write(chunk)
+                        written += len(chunk)
+                        if node is not None and tracker is not None:
+                            tracker.packages += 1
+                            tracker.report(tracker.packages, written, "/".join(part for part in slot[0] if part))
+                finally:
+                    if stream is not target:
+                        stream.close()
+            os.replace(temp_name, output)
+        except BaseException:
+            try:
+                os.unlink(temp_name)
+            except OSError:
+                pass
+            raise
+        return elements, slot_conflicts
@@ -0,0 +1,697 @@
+"""
+Incremental re-merge from a previous result and its merge manifest
+
+A merge manifest records the content hash and the top-level package keys of every input and,
+for every top-level package of the output, the file that introduced it, the files that were
+merged into it, its byte range in the output, its element count and its conflicts. Top-level
+packages are merged independently of each other, so the next run merges again only the
+packages touched by changed, added or removed files and copies every other package byte for
+byte from the previous output. Only files contributing to a touched package are parsed.
+
+The first input without its packages (the envelope) is kept in the manifest, and the output
+is assembled with the streaming serializer, so it is identical to a full re-merge. A changed
+first input, reordered inputs or a different configuration fall back to a full merge.
+"""
+
+from typing import Dict, List, Optional, Tuple, Union
+from bisect import bisect_right
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+from lxml import etree
+
+from .models import ArxmlFile, MergeConflict, MergeResult, MergeStatistics
+from .cache import ModelStore, config_fingerprint, hash_files
+from .events import ElementMerged, dispatch
+from .exceptions import ArxmlMergerException, InvalidArxmlFileError
+from ..utils.archives import is_archive
+from ..utils.compression import check_compression, compression_from_suffix, open_input, open_output
+from ..utils.parsing import get_parser
+from ..utils.serialization import iter_serialized_slots, new_placeholder_marker, supports_splicing
+from ..utils.xml_utils import deep_copy_element, get_element_path, get_local_name
+
+
+MANIFEST_FORMAT_VERSION = 1
+
+MANIFEST_SUFFIX = ".manifest.json.gz"
+
+PackageKey = Tuple[Optional[str], ...]
+
+
+def _file_mode() -> int:
+    # mkstemp legt Dateien mit 0600 an; Ausgaben sollen wie bei open() der umask folgen
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+_FILE_MODE = _file_mode()
+
+
+def default_manifest_path(output: Union[str, Path]) -> Path:
+    """Merge manifest next to the output: merged.arxml -> merged.arxml.manifest.json.gz"""
+    output = Path(output)
+    return output.with_name(output.name + MANIFEST_SUFFIX)
+
+
+@dataclass
+class InputRecord:
+    """An input file of a recorded merge"""
+    path: str
+    hash: str
+    schema_version: Optional[str]
+    ignored_elements: Dict[str, Dict[str, int]]
+    # Split keys of the file's top-level AR-PACKAGE elements in document order
+    packages: List[PackageKey]
+    # Content hashes of these packages; only packages whose content changed are merged again
+    package_hashes: List[str]
+
+
+@dataclass
+class PackageSlot:
+    """A top-level package of the merged output"""
+    key: PackageKey
+    # False for repeated keys in the first input: copied as they are, never merged into
+    merged: bool
+    origin: int
+    files: List[int]
+    offset: int = 0
+    length: int = 0
+    elements: int = 0
+    subtrees_skipped: int = 0
+    nodes_skipped: int = 0
+    # (file index, package position in that file, conflict) in merge order
+    conflicts: List[Tuple[int, int, MergeConflict]] = field(default_factory=list)
+
+
+@dataclass
+class MergeManifest:
+    """Everything an incremental merge needs to know about the previous result"""
+    version: str
+    config_hash: str
+    encoding: str
+    pretty_print: bool
+    compression: Optional[str]
+    output_size: int
+    output_mtime_ns: int
+    marker: str
+    # First input without its packages, with placeholder comments (marker) in their place
+    envelope: str
+    envelope_elements: int
+    # Element path of AR-PACKAGES; conflict paths are stored relative to the top-level package
+    packages_path: str
+    files: List[InputRecord]
+    slots: List[PackageSlot]
+
+    def save(self, path: Union[str, Path]) -> None:
+        """Writes the manifest as gzip-compressed JSON (atomically)"""
+        data = {
+            "format": MANIFEST_FORMAT_VERSION,
+            "version": self.version,
+            "config": self.config_hash,
+            "encoding": self.encoding,
+            "pretty_print": self.pretty_print,
+            "compression": self.compression,
+            "output": [self.output_size, self.output_mtime_ns],
+            "marker": self.marker,
+            "envelope": self.envelope,
+            "envelope_elements": self.envelope_elements,
+            "packages_path": self.packages_path,
+            "files": [
+                [record.path, record.hash, record.schema_version, record.ignored_elements, record.packages,
+                 record.package_hashes]
+                for record in self.files
+            ],
+            "slots": [
+                [slot.key, slot.merged, slot.origin, slot.files, slot.offset, slot.length, slot.elements,
+                 slot.subtrees_skipped, slot.nodes_skipped,
+                 [[index, position, conflict.to_dict()] for index, position, conflict in slot.conflicts]]
+                for slot in self.slots
+            ],
+        }
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_name = tempfile.mkstemp(dir=path.parent, prefix=".tmp-", suffix=MANIFEST_SUFFIX)
+        os.chmod(temp_name, _FILE_MODE)
+        try:
+            with os.fdopen(fd, "wb") as stream, gzip.GzipFile(fileobj=stream, mode="wb", mtime=0) as gz:
+                gz.write(json.dumps(data, separators=(",", ":"), default=str).encode("utf-8"))
+            os.replace(temp_name, path)
+        except BaseException:
+            try:
+                os.unlink(temp_name)
+            except OSError:
+                pass
+            raise
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> Optional['MergeManifest']:
+        """Reads a manifest, None if it is missing, unreadable or of another format"""
+        try:
+            with gzip.open(path, "rb") as stream:
+                data = json.loads(stream.read().decode("utf-8"))
+            if data.get("format") != MANIFEST_FORMAT_VERSION:
+                return None
+            return cls(
+                version=data["version"],
+                config_hash=data["config"],
+                encoding=data["encoding"],
+                pretty_print=data["pretty_print"],
+                compression=data["compression"],
+                output_size=data["output"][0],
+                output_mtime_ns=data["output"][1],
+                marker=data["marker"],
+                envelope=data["envelope"],
+                envelope_elements=data["envelope_elements"],
+                packages_path=data["packages_path"],
+                files=[
+                    InputRecord(path, file_hash, schema_version, ignored, [tuple(key) for key in packages],
+                                package_hashes)
+                    for path, file_hash, schema_version, ignored, packages, package_hashes in data["files"]
+                ],
+                slots=[
+                    PackageSlot(tuple(key), merged, origin, files, offset, length, elements, skipped, nodes,
+                                [(index, position, MergeConflict.from_dict(conflict))
+                                 for index, position, conflict in conflicts])
+                    for key, merged, origin, files, offset, length, elements, skipped, nodes, conflicts
+                    in data["slots"]
+                ],
+            )
+        except (OSError, EOFError, ValueError, KeyError, TypeError, IndexError):
+            return None
+
+
+def _package_children(root: etree._Element) -> List[etree._Element]:
+    """Top-level AR-PACKAGE elements of a document"""
+    for child in root:
+        if get_local_name(child) == "AR-PACKAGES":
+            return [package for package in child if get_local_name(package) == "AR-PACKAGE"]
+    return []
+
+
+def _package_hash(package: etree._Element) -> str:
+    return hashlib.blake2b(etree.tostring(package, with_tail=False), digest_size=16).hexdigest()
+
+
+def _changed_packages(old: Optional[InputRecord], new: InputRecord) -> set:
+    """Keys whose packages in a changed file differ in content or position"""
+    if old is None:
+        return set(new.packages)
+
+    def occurrences(record: InputRecord) -> Dict[PackageKey, List[Tuple[int, str]]]:
+        result: Dict[PackageKey, List[Tuple[int, str]]] = {}
+        for position, (key, package_hash) in enumerate(zip(record.packages, record.package_hashes)):
+            result.setdefault(key, []).append((position, package_hash))
+        return result
+
+    old_packages, new_packages = occurrences(old), occurrences(new)
+    return {key for key in old_packages.keys() | new_packages.keys()
+            if old_packages.get(key) != new_packages.get(key)}
+
+
+def _relative_conflict(conflict: MergeConflict, package_path: str) -> MergeConflict:
+    """Strips the top-level package step ("/AR-PACKAGES/AR-PACKAGE[3]") from a conflict path"""
+    path = conflict.element_path
+    if not path.startswith(package_path):
+        return conflict
+    rest = path[len(package_path):]
+    if rest.startswith("["):
+        rest = rest[rest.index("]") + 1:]
+    return replace(conflict, element_path=rest)
+
+
+def _absolute_conflicts(slot_conflicts: List[List[Tuple[int, int, MergeConflict]]], base_count: int,
+                        introduced: List[Tuple[int, int]], packages_path: str) -> List[MergeConflict]:
+    """
+    Conflicts of package-wise merges in the order and with the paths of a full merge
+
+    Args:
+        slot_conflicts: Per output package: (file index, package position, relative conflict)
+        base_count: Number of packages of the first input
+        introduced: (file index, package position) that added each further output package
+        packages_path: Element path of AR-PACKAGES
+    """
+    # Konfliktpfade hängen davon ab, welche Packages beim Konflikt schon im Baum waren
+    package_path = packages_path + "/AR-PACKAGE"
+    ordered = []
+    for slot_index, conflicts in enumerate(slot_conflicts):
+        for sequence, (file_index, position, conflict) in enumerate(conflicts):
+            present = base_count + bisect_right(introduced, (file_index, position))
+            top = package_path if present == 1 else f"{package_path}[{slot_index + 1}]"
+            ordered.append((file_index, position, sequence,
+                            replace(conflict, element_path=top + conflict.element_path)))
+    ordered.sort(key=lambda item: item[:3])
+    return [conflict for _, _, _, conflict in ordered]
+
+
+def _plan_slots(records: List[InputRecord]) -> List[PackageSlot]:
+    """
+    Top-level packages of the output in document order
+
+    The first input's packages keep their order, packages of later inputs are appended in
+    the order they first appear - exactly as ArxmlMerger._merge_packages builds the tree.
+    """
+    key_sets = [set(record.packages) for record in records]
+    slots = []
+    seen = set()
+    for index, record in enumerate(records):
+        for key in record.packages:
+            if key in seen:
+                if index == 0:
+                    slots.append(PackageSlot(key, False, 0, [0]))
+                continue
+            seen.add(key)
+            contributors = [i for i in range(index, len(records)) if key in key_sets[i]]
+            slots.append(PackageSlot(key, True, index, contributors))
+    return slots
+
+
+class IncrementalMerger:
+    """Merges files into an output file, reusing unchanged packages of the previous run"""
+
+    def __init__(self, merger, models: Optional[ModelStore] = None):
+        """
+        Args:
+            merger: ArxmlMerger providing configuration, loading and the element merge
+            models: Parsed inputs kept in memory between runs (default: merger.models)
+        """
+        self.merger = merger
+        self.models = models
+        self.config = merger.config
+        self.logger = merger.logger
+
+    def merge(self, file_paths: List[Union[str, Path]], output: Union[str, Path],
+              manifest_path: Optional[Union[str, Path]] = None, pretty_print: bool = True,
+              hashes: Optional[List[str]] = None) -> MergeResult:
+        """
+        Merges the files into output and writes the merge manifest
+
+        Args:
+            file_paths: Files to merge (ARXML, optionally compressed; no archives)
+            output: Output path; compressed by extension or config.output_compression
+            manifest_path: Merge manifest, defaults to default_manifest_path(output)
+            pretty_print: Indent the output
+            hashes: Content hashes of the files if already known (see hash_file)
+
+        Returns:
+            MergeResult; after an incremental run its tree is parsed from the output on demand
+        """
+        with self.merger._merge_context(models=self.models):
+            return self._merge(file_paths, output, manifest_path, pretty_print, hashes)
+
+    def _merge(self, file_paths: List[Union[str, Path]], output: Union[str, Path],
+               manifest_path: Optional[Union[str, Path]], pretty_print: bool,
+               hashes: Optional[List[str]]) -> MergeResult:
+        start_time = time.time()
+        if not file_paths:
+            raise ArxmlMergerException("No files provided for merging")
+        archives = [str(file_path) for file_path in file_paths if is_archive(file_path)]
+        if archives:
+            raise ArxmlMergerException(f"Incremental merge does not support archive inputs: {archives}")
+        if self.config.optimize_order:
+            raise ArxmlMergerException("Incremental merge does not support optimize_order: "
+                                       "it merges the inputs in the given order")
+
+        output = Path(output)
+        manifest_path = Path(manifest_path) if manifest_path else default_manifest_path(output)
+        compression = self.config.output_compression or compression_from_suffix(output)
+        if compression is not None:
+            try:
+                check_compression(compression, self.config.compression_level)
+            except ValueError as e:
+                raise ArxmlMergerException(str(e)) from e
+
+        file_paths = [Path(file_path) for file_path in file_paths]
+        if hashes is None:
+            try:
+                hashes = hash_files(file_paths)
+            except OSError as e:
+                raise InvalidArxmlFileError(f"Error loading file {e.filename}: {e}", str(e.filename)) from e
+        paths = [str(file_path.resolve()) for file_path in file_paths]
+
+        previous = self._load_previous(manifest_path, output, paths, hashes, pretty_print)
+        if previous is None:
+            self.logger.info("Incremental merge: no usable manifest, merging all packages")
+
+        self._models_from_cache = 0
+        records, parsed, touched = self._load_inputs(file_paths, paths, hashes, previous)
+        slots = _plan_slots(records)
+        reused = {}
+        if previous is not None:
+            reused = self._match_previous_slots(slots, touched, previous, paths)
+            if reused is None:
+                # Sollte nicht vorkommen; sicherheitshalber alles neu mergen
+                self.logger.info("Incremental merge: package layout changed, merging all packages")
+                previous, reused = None, {}
+                records, parsed, touched = self._load_inputs(file_paths, paths, hashes, None)
+                slots = _plan_slots(records)
+
+        if previous is not None and not touched and compression == previous.compression:
+            self.logger.info("Incremental merge: inputs unchanged, %s is up to date", output)
+            previous.files, previous.slots = records, slots
+            previous.save(manifest_path)
+            return self._result(None, output, previous, len(slots), start_time)
+
+        schema_handler = self.merger._get_schema_handler(records[0].schema_version)
+
+        if previous is None:
+            envelope_root, base_packages, marker = self._build_envelope(parsed[0])
+            envelope = etree.tostring(envelope_root, encoding="unicode")
+            envelope_elements = len(list(envelope_root.iter())) - len(base_packages)
+        else:
+            marker, envelope, envelope_elements = previous.marker, previous.envelope, previous.envelope_elements
+            envelope_root = etree.fromstring(envelope, get_parser(remove_blank_text=False, resolve_entities=False))
+            base_packages = None
+
+        if not supports_splicing(envelope_root, self.config.output_encoding):
+            raise ArxmlMergerException(
+                f"Incremental merge needs an ASCII-compatible output encoding, got '{self.config.output_encoding}'"
+            )
+
+        slot_nodes = self._merge_slots(envelope_root, marker, slots, reused, parsed, base_packages,
+                                       schema_handler)
+
+        size, mtime_ns = self._write_output(envelope_root, marker, output, compression, pretty_print,
+                                            slots, slot_nodes, reused)
+
+        from .. import __version__
+        manifest = MergeManifest(
+            version=__version__,
+            config_hash=self._config_hash(),
+            encoding=self.config.output_encoding,
+            pretty_print=pretty_print,
+            compression=compression,
+            output_size=size,
+            output_mtime_ns=mtime_ns,
+            marker=marker,
+            envelope=envelope,
+            envelope_elements=envelope_elements,
+            packages_path=get_element_path(self._packages_parent(envelope_root)),
+            files=records,
+            slots=slots,
+        )
+        manifest.save(manifest_path)
+
+        # Ohne wiederverwendete Packages ist der Baum vollständig
+        merged_tree = envelope_root if not reused else None
+        return self._result(merged_tree, output, manifest, len(reused), start_time)
+
+    def _config_hash(self) -> str:
+        fingerprint = json.dumps(config_fingerprint(self.config), sort_keys=True,
+                                 default=lambda value: getattr(value, "value", str(value)))
+        return hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()
+
+    def _load_previous(self, manifest_path: Path, output: Path, paths: List[str], hashes: List[str],
+                       pretty_print: bool) -> Optional[MergeManifest]:
+        """The previous run's manifest, if its result can be reused for these inputs"""
+        from .. import __version__
+
+        previous = MergeManifest.load(manifest_path)
+        if previous is None:
+            return None
+        try:
+            output_stat = output.stat()
+        except OSError:
+            return None
+
+        previous_paths = [record.path for record in previous.files]
+        current = set(paths)
+        kept = set(previous_paths)
+        reasons = [
+            (previous.version != __version__, "package version changed"),
+            (previous.config_hash != self._config_hash(), "configuration changed"),
+            (previous.encoding != self.config.output_encoding or previous.pretty_print != pretty_print,
+             "output format changed"),
+            ((output_stat.st_size, output_stat.st_mtime_ns) != (previous.output_size, previous.output_mtime_ns),
+             "output was modified"),
+            (len(current) != len(paths), "duplicate inputs"),
+            (not previous.files or previous_paths[0] != paths[0] or previous.files[0].hash != hashes[0],
+             "first input changed"),
+            ([path for path in paths if path in kept] != [path for path in previous_paths if path in current],
+             "inputs were reordered"),
+        ]
+        for failed, reason in reasons:
+            if failed:
+                self.logger.info("Incremental merge: previous result not reusable (%s)", reason)
+                return None
+        return previous
+
+    def _load_inputs(self, file_paths: List[Path], paths: List[str], hashes: List[str],
+                     previous: Optional[MergeManifest]
+                     ) -> Tuple[List[InputRecord], Dict[int, ArxmlFile], set]:
+        """
+        Parses the files needed for this run
+
+        Returns:
+            Input records of all files, parsed files by index and the touched package keys
+            (empty without a previous manifest: then every file is parsed)
+        """
+        previous_records = {record.path: record for record in previous.files} if previous else {}
+        changed = [index for index, (path, file_hash) in enumerate(zip(paths, hashes))
+                   if path not in previous_records or previous_records[path].hash != file_hash]
+        touched = set()
+        if previous is not None:
+            current = set(paths)
+            for record in previous.files:
+                if record.path not in current:
+                    touched.update(record.packages)
+        else:
+            changed = list(range(len(paths)))
+
+        parsed = self._parse(file_paths, hashes, changed)
+        # Die erste Datei ist bei einem inkrementellen Lauf unverändert
+        schema_version = parsed[0].schema_version if previous is None else previous.files[0].schema_version
+        schema_handler = self.merger._get_schema_handler(schema_version)
+        extract_key = self.merger._get_key_extractor(schema_handler, "AR-PACKAGE")
+
+        records: List[Optional[InputRecord]] = []
+        for index, (path, file_hash) in enumerate(zip(paths, hashes)):
+            arxml_file = parsed.get(index)
+            if arxml_file is None:
+                records.append(previous_records[path])
+                continue
+            packages = _package_children(arxml_file.root_element)
+            record = InputRecord(path, file_hash, arxml_file.schema_version, arxml_file.ignored_elements,
+                                 [extract_key(package) for package in packages],
+                                 [_package_hash(package) for package in packages])
+            records.append(record)
+            if previous is not None:
+                touched.update(_changed_packages(previous_records.get(path), record))
+
+        # Unveränderte Dateien nur parsen, wenn sie zu einem betroffenen Package beitragen
+        if previous is not None and touched:
+            contributors = [index for index, record in enumerate(records)
+                            if index not in parsed and touched.intersection(record.packages)]
+            parsed.update(self._parse(file_paths, hashes, contributors))
+        if previous is not None:
+            self.logger.info("Incremental merge: %d changed, %d parsed of %d files, %d packages touched",
+                             len(changed), len(parsed), len(paths), len(touched))
+        return records, parsed, touched
+
+    def _parse(self, file_paths: List[Path], hashes: List[str], indices: List[int]) -> Dict[int, ArxmlFile]:
+        if not indices:
+            return {}
+        arxml_files = self.merger._load_files([file_paths[index] for index in indices],
+                                              [hashes[index] for index in indices])
+        self.merger._validate_files(arxml_files)
+        self._models_from_cache += self.merger._context.models_from_cache
+        return dict(zip(indices, arxml_files))
+
+    def _match_previous_slots(self, slots: List[PackageSlot], touched: set, previous: MergeManifest,
+                              paths: List[str]) -> Optional[Dict[int, PackageSlot]]:
+        """Previous slots of the untouched packages, None if one cannot be found"""
+        previous_slots: Dict[Tuple[PackageKey, bool], List[PackageSlot]] = {}
+        for slot in previous.slots:
+            previous_slots.setdefault((slot.key, slot.merged), []).append(slot)
+        positions = {path: index for index, path in enumerate(paths)}
+        file_index = [positions.get(record.path) for record in previous.files]
+
+        reused = {}
+        occurrences: Dict[Tuple[PackageKey, bool], int] = {}
+        for index, slot in enumerate(slots):
+            group = (slot.key, slot.merged)
+            occurrence = occurrences.get(group, 0)
+            occurrences[group] = occurrence + 1
+            if slot.merged and slot.key in touched:
+                continue
+            candidates = previous_slots.get(group, [])
+            if occurrence >= len(candidates):
+                return None
+            old = candidates[occurrence]
+            if any(file_index[i] is None for i in old.files):
+                return None
+            # Dateiindizes des vorherigen Laufs auf die aktuelle Eingabeliste abbilden
+            reused[index] = old
+            slot.offset, slot.length = old.offset, old.length
+            slot.origin = file_index[old.origin]
+            slot.files = [file_index[i] for i in old.files]
+            slot.elements = old.elements
+            slot.subtrees_skipped = old.subtrees_skipped
+            slot.nodes_skipped = old.nodes_skipped
+            slot.conflicts = [(file_index[i], position, conflict) for i, position, conflict in old.conflicts]
+        return reused
+
+    @staticmethod
+    def _packages_parent(envelope_root: etree._Element) -> etree._Element:
+        return next(child for child in envelope_root if get_local_name(child) == "AR-PACKAGES")
+
+    @staticmethod
+    def _build_envelope(base_file: ArxmlFile) -> Tuple[etree._Element, List[etree._Element], str]:
+        """Copies the first input like a full merge does and swaps its packages for placeholders"""
+        marker = new_placeholder_marker()
+        envelope_root = deep_copy_element(base_file.root_element)
+        base_packages = _package_children(envelope_root)
+        for package in base_packages:
+            placeholder = etree.Comment(marker)
+            placeholder.tail = package.tail
+            package.getparent().replace(package, placeholder)
+        return envelope_root, base_packages, marker
+
+    def _merge_slots(self, envelope_root: etree._Element, marker: str, slots: List[PackageSlot],
+                     reused: Dict[int, PackageSlot], parsed: Dict[int, ArxmlFile],
+                     base_packages: Optional[List[etree._Element]], schema_handler) -> List[etree._Element]:
+        """Merges the touched packages into the envelope, returns the node of every slot"""
+        merger = self.merger
+        packages_parent = self._packages_parent(envelope_root)
+        package_path = get_element_path(packages_parent) + "/AR-PACKAGE"
+        slot_nodes = [node for node in packages_parent
+                      if node.tag is etree.Comment and node.text == marker]
+        for _ in range(len(slot_nodes), len(slots)):
+            # Neue Packages hängt der Merge ans Ende von AR-PACKAGES
+            placeholder = etree.Comment(marker)
+            packages_parent.append(placeholder)
+            slot_nodes.append(placeholder)
+        extract_key = merger._get_key_extractor(schema_handler, "AR-PACKAGE")
+        parsed_packages = {index: _package_children(arxml_file.root_element)
+                           for index, arxml_file in parsed.items()}
+
+        context = merger._context
+        for index, slot in enumerate(slots):
+            if index in reused:
+                continue
+            if slot.origin == 0:
+                position = index
+                package = (base_packages[position] if base_packages is not None
+                           else deep_copy_element(parsed_packages[0][position]))
+            else:
+                origin_packages = parsed_packages[slot.origin]
+                position = next(i for i, source in enumerate(origin_packages) if extract_key(source) == slot.key)
+                package = deep_copy_element(origin_packages[position])
+            placeholder = slot_nodes[index]
+            package.tail = placeholder.tail
+            packages_parent.replace(placeholder, package)
+            slot_nodes[index] = package
+            slot.conflicts = []
+            if not slot.merged:
+                slot.elements = len(list(package.iter()))
+                continue
+
+            subtrees_skipped, nodes_skipped = context.subtrees_skipped, context.nodes_skipped
+            for file_index in slot.files:
+                source_file = parsed[file_index]
+                context.source_digests = source_file.subtree_digests
+                for source_position, source_package in enumerate(parsed_packages[file_index]):
+                    if file_index == slot.origin and (file_index == 0 or source_position <= position):
+                        continue  # Basis-Package bzw. weitere Vorkommen in der ersten Datei
+                    if extract_key(source_package) != slot.key:
+                        continue
+                    if merger._observers:
+                        dispatch(merger._observers, ElementMerged(package, source_package,
+                                                                  str(source_file.file_path)))
+                    conflicts = merger._merge_elements(package, source_package, schema_handler,
+                                                       str(source_file.file_path))
+                    slot.conflicts.extend((file_index, source_position, _relative_conflict(conflict, package_path))
+                                          for conflict in conflicts)
+            slot.subtrees_skipped = context.subtrees_skipped - subtrees_skipped
+            slot.nodes_skipped = context.nodes_skipped - nodes_skipped
+            slot.elements = len(list(package.iter()))
+        context.source_digests = None
+        context.target_digests = {}
+        context.unique_matches = {}
+        return slot_nodes
+
+    def _write_output(self, envelope_root: etree._Element, marker: str, output: Path,
+                      compression: Optional[str], pretty_print: bool, slots: List[PackageSlot],
+                      slot_nodes: List[etree._Element], reused: Dict[int, PackageSlot]) -> Tuple[int, int]:
+        """Writes the output atomically, reused packages are copied from the previous output"""
+        slot_index = {node: index for index, node in enumerate(slot_nodes)}
+        output.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_name = tempfile.mkstemp(dir=output.parent, prefix=".tmp-", suffix=output.name)
+        os.chmod(temp_name, _FILE_MODE)
+        previous_output = open_input(output) if reused else None
+        try:
+            with os.fdopen(fd, "wb") as target:
+                stream = open_output(target, compression, self.config.compression_level) if compression else target
+                try:
+                    offset = 0
+                    for node, chunk in iter_serialized_slots(envelope_root, marker, self.config.output_encoding,
+                                                             pretty_print, workers=self.config.save_workers):
+                        if node is not None:
+                            index = slot_index[node]
+                            if index in reused:
+                                old = reused[index]
+                                previous_output.seek(old.offset)
+                                chunk = previous_output.read(old.length)
+                                if len(chunk) != old.length:
+                                    raise ArxmlMergerException(f"Previous output {output} is truncated")
+                            slots[index].offset, slots[index].length = offset, len(chunk)
+                        stream.write(chunk)
+                        offset += len(chunk)
+                finally:
+                    if stream is not target:
+                        stream.close()
+            os.replace(temp_name, output)
+        except BaseException:
+            try:
+                os.unlink(temp_name)
+            except OSError:
+                pass
+            raise
+        finally:
+            if previous_output is not None:
+                previous_output.close()
+
+        output_stat = output.stat()
+        return output_stat.st_size, output_stat.st_mtime_ns
+
+    def _result(self, merged_tree: Optional[etree._Element], output: Path, manifest: MergeManifest,
+                packages_reused: int, start_time: float) -> MergeResult:
+        """Builds the MergeResult from the manifest's per-package records"""
+        base_count = len(manifest.files[0].packages)
+        introduced = [(slot.origin, manifest.files[slot.origin].packages.index(slot.key))
+                      for slot in manifest.slots[base_count:]]
+        conflicts = _absolute_conflicts([slot.conflicts for slot in manifest.slots], base_count,
+                                        introduced, manifest.packages_path)
+        ignored_elements: Dict[str, Dict[str, int]] = {}
+        for record in manifest.files:
+            for tag, stats in record.ignored_elements.items():
+                totals = ignored_elements.setdefault(tag, {"nodes": 0, "bytes": 0})
+                totals["nodes"] += stats["nodes"]
+                totals["bytes"] += stats["bytes"]
+
+        statistics = MergeStatistics(
+            files_processed=len(manifest.files),
+            elements_merged=manifest.envelope_elements + sum(slot.elements for slot in manifest.slots),
+            conflicts_found=len(conflicts),
+            conflicts_resolved=len([c for c in conflicts if c.resolved_value is not None]),
+            processing_time=time.time() - start_time,
+            schema_version=manifest.files[0].schema_version,
+            ignored_elements=ignored_elements,
+            subtrees_skipped=sum(slot.subtrees_skipped for slot in manifest.slots),
+            nodes_skipped=sum(slot.nodes_skipped for slot in manifest.slots),
+            models_from_cache=self._models_from_cache,
+            packages_reused=packages_reused
+        )
+        self.logger.info("Incremental merge completed in %.2fs: %d of %d packages reused",
+                         statistics.processing_time, packages_reused, len(manifest.slots))
+        result = MergeResult(merged_tree, self.config, statistics, conflicts,
+                             cached_output=None if merged_tree is not None else output)
+        if not manifest.pretty_print:
+            result.load()  # save() kopiert nur pretty-printed Ausgaben, sonst Baum laden
+        return result
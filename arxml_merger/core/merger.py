@@ -2,8 +2,13 @@
 Hauptklasse für das Mergen von AUTOSAR ARXML-Dateien
 """
 
-from typing import List, Union, Optional, Dict
+from typing import Callable, Iterator, List, Union, Optional, Dict, Tuple, Type
+from concurrent.futures import Executor, Future
+from contextlib import contextmanager
 from pathlib import Path
+import gc
+import logging
+import threading
 import time
 
 from lxml import etree
@@ -12,15 +17,42 @@ from ..core.models import (
     MergeConfig, MergeResult, MergeStatistics, MergeConflict, 
     ConflictResolutionStrategy, ArxmlFile
 )
+from ..core.planner import MergePlan, MergePlanner
+from ..core.cache import MergeCache, ModelCache, ModelStore, hash_file
+from ..core.incremental import IncrementalMerger
+from ..core.external import ExternalMerger
+from ..core.parallel import PackageMergePool
+from ..core.context import MergeContext
 from ..core.exceptions import (
-    ArxmlMergerException, InvalidArxmlFileError
+    ArxmlMergerException, InvalidArxmlFileError, SplitKeyError
+)
+from ..core.events import (
+    MergeEvent, MergeObserver, ObserverEntry, ElementAdded, ElementMerged, ElementReplaced,
+    ElementKept, ConflictDetected, VerboseMergeLogger, dispatch
+)
+from ..core.progress import CancellationToken, ProgressCallback, ProgressTracker, input_size
+from ..core.worklist import MergeUnit, UnitTiming, run_worklist
+from ..core.ordering import (
+    ORDER_INSENSITIVE_STRATEGIES, InputStatistics, collect_statistics, plan_merge_order
+)
+from ..core.aio import MergeProgressStream, run_in_executor
+from ..schema.autosar_schema import (
+    SchemaDetector, AutosarSchemaHandler, SplitKeyExtractor,
+    validate_split_keys, compile_split_key_extractor
 )
-from ..schema.autosar_schema import SchemaDetector, AutosarSchemaHandler
 from ..utils.xml_utils import (
-    get_element_path, get_autosar_path, get_element_signature, find_matching_element,
+    get_local_name, get_element_path, get_autosar_path, get_element_signature,
     merge_attributes, validate_arxml_structure, deep_copy_element,
-    setup_logging
+    compute_subtree_digest, get_short_name, get_logger
 )
+from ..utils.serialization import resolve_workers
+from ..utils.memory import peak_rss, reset_peak_rss, suspended_gc
+from ..utils.compression import check_compression
+from ..utils.pruning import validate_ignore_elements
+from ..utils.archives import is_archive, load_archive, member_path
+
+# on_package(position, count, package) after each top-level package of a source file
+PackageCallback = Callable[[int, int, etree._Element], None]
 
 
 class ArxmlMerger:
@@ -34,19 +66,151 @@ class ArxmlMerger:
             config: Konfiguration für den Merge-Prozess
         """
         self.config = config or MergeConfig()
-        self.logger = setup_logging()
-        self.schema_handlers: Dict[str, AutosarSchemaHandler] = {}
+        self.logger = get_logger()
+        try:
+            self.config.get_parser_options()  # reject unknown parser profiles early
+            resolve_workers(self.config.save_workers)
+            resolve_workers(self.config.load_workers)
+            resolve_workers(self.config.package_workers)
+            validate_ignore_elements(self.config.ignore_elements)
+            if self.config.output_compression is not None or self.config.compression_level is not None:
+                check_compression(self.config.output_compression, self.config.compression_level)
+        except ValueError as e:
+            raise ArxmlMergerException(str(e)) from e
+        self.custom_split_keys, self.custom_key_extractors = self._compile_custom_split_keys(
+            self.config.custom_split_keys
+        )
+        # Parsed inputs kept in memory by long-running callers (merge server), shared by the merges
+        # of all threads; None disables it. A merge may use another store (see _merge_context)
+        self.models: Optional[ModelStore] = None
+        # Default progress callback and cancellation token of merges (see core.progress)
+        self.progress_callback: Optional[ProgressCallback] = None
+        self.cancel_token: Optional[CancellationToken] = None
+        # Observers of the element-level merge events (see core.events); the list is replaced,
+        # not changed, so running merges keep a consistent list
+        self._observers: List[ObserverEntry] = []
+        if self.config.verbose_merge:
+            self.add_observer(VerboseMergeLogger(self.logger))
+        # Merge units and their exclusive time per element type; None disables timing
+        self.unit_timings: Optional[Dict[str, UnitTiming]] = None
+        self._timings_lock = threading.Lock()
+        # State of the merge running in each thread (see core.context)
+        self._local = threading.local()
+        # Worker processes of config.package_workers, started by the first pooled merge and
+        # shared by all merges until close()
+        self._package_pool: Optional[PackageMergePool] = None
+        self._pool_lock = threading.Lock()
+    
+    def close(self) -> None:
+        """Stops the package worker processes; a later merge starts new ones"""
+        with self._pool_lock:
+            pool, self._package_pool = self._package_pool, None
+        if pool is not None:
+            pool.close()
+    
+    def __enter__(self) -> 'ArxmlMerger':
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+    
+    def add_observer(self, observer: MergeObserver,
+                     event_types: Optional[Tuple[Type[MergeEvent], ...]] = None) -> MergeObserver:
+        """
+        Registers an observer of the merge events
+        
+        Args:
+            observer: Called synchronously with every event, in the thread running the merge
+            event_types: Only pass events of these classes (default: all)
+            
+        Returns:
+            The observer, for remove_observer()
+        """
+        self._observers = self._observers + [(observer, tuple(event_types) if event_types is not None else None)]
+        return observer
+    
+    def remove_observer(self, observer: MergeObserver) -> None:
+        """Unregisters an observer (all its registrations)"""
+        self._observers = [entry for entry in self._observers if entry[0] != observer]
+    
+    @staticmethod
+    def _compile_custom_split_keys(custom_split_keys: Dict[str, List[str]]
+                                   ) -> Tuple[Dict[str, List[str]], Dict[str, SplitKeyExtractor]]:
+        """Validates and compiles MergeConfig.custom_split_keys (raises SplitKeyError)"""
+        if not isinstance(custom_split_keys, dict):
+            raise SplitKeyError(f"custom_split_keys must be a dict, got {type(custom_split_keys).__name__}")
         
-    def merge_files(self, file_paths: List[Union[str, Path]]) -> MergeResult:
+        split_keys = {}
+        extractors = {}
+        for element_name, keys in custom_split_keys.items():
+            split_keys[element_name] = validate_split_keys(element_name, keys)
+            extractors[element_name] = compile_split_key_extractor(split_keys[element_name])
+        return split_keys, extractors
+        
+    @property
+    def _context(self) -> MergeContext:
+        """State of the merge running in the calling thread (see _merge_context)"""
+        context = getattr(self._local, "context", None)
+        if context is None:
+            raise ArxmlMergerException("No merge running in this thread")
+        return context
+    
+    @contextmanager
+    def _merge_context(self, progress_callback: Optional[ProgressCallback] = None,
+                       cancel_token: Optional[CancellationToken] = None,
+                       models: Optional[ModelStore] = None) -> Iterator[MergeContext]:
+        """
+        Opens the state of a merge for the calling thread
+        
+        The context starts from the merger's defaults (progress callback, cancellation token,
+        in-memory models, unit timing). On exit its unit timings are added to unit_timings and
+        the previous context of the thread, if any, is restored.
+        """
+        context = MergeContext(
+            progress_callback=progress_callback or self.progress_callback,
+            cancel_token=cancel_token or self.cancel_token,
+            models=models if models is not None else self.models,
+            # Merkle-Digests werden erst beim Vergleich berechnet und zwischengespeichert;
+            # geänderte Zielelemente werden beim Mergen verworfen und bei Bedarf neu berechnet.
+            # Bei FAIL_ON_CONFLICT wird nichts übersprungen, damit jede Überschneidung als
+            # Konflikt gemeldet wird.
+            skip_identical=(self.config.skip_identical_subtrees and
+                            self.config.conflict_resolution != ConflictResolutionStrategy.FAIL_ON_CONFLICT),
+            unit_timings={} if self.unit_timings is not None else None
+        )
+        previous = getattr(self._local, "context", None)
+        self._local.context = context
+        try:
+            yield context
+        finally:
+            self._local.context = previous
+            if context.unit_timings and self.unit_timings is not None:
+                with self._timings_lock:
+                    for tag, timing in context.unit_timings.items():
+                        total = self.unit_timings.setdefault(tag, UnitTiming())
+                        total.units += timing.units
+                        total.seconds += timing.seconds
+    
+    def merge_files(self, file_paths: List[Union[str, Path]],
+                    progress_callback: Optional[ProgressCallback] = None,
+                    cancel_token: Optional[CancellationToken] = None) -> MergeResult:
         """
         Merged mehrere ARXML-Dateien
         
         Args:
             file_paths: Liste der zu mergenden Dateien
+            progress_callback: Receives MergeProgress events: files loaded, packages and files
+                merged, with byte counts and an ETA per stage
+            cancel_token: Checked between files and packages; cancel() aborts the merge with
+                MergeCancelledError
             
         Returns:
             MergeResult mit dem Ergebnis des Merge-Prozesses
         """
+        with self._merge_context(progress_callback, cancel_token) as context:
+            return self._merge_files(file_paths, context)
+        
+    def _merge_files(self, file_paths: List[Union[str, Path]], context: MergeContext) -> MergeResult:
         start_time = time.time()
         
         if not file_paths:
@@ -54,39 +218,268 @@ class ArxmlMerger:
         
         self.logger.info("Starting merge process for %d files", len(file_paths))
         
-        # Lade alle Dateien
-        arxml_files = []
-        for file_path in file_paths:
+        # Ergebnis-Cache: bei gleichen Eingaben und gleicher Konfiguration nichts parsen
+        cache = self._get_cache()
+        cache_key = None
+        if cache is not None:
             try:
-                arxml_file = ArxmlFile.from_file(file_path)
-                arxml_file.schema_version = SchemaDetector.detect_schema_version(arxml_file.root_element)
-                arxml_files.append(arxml_file)
-                self.logger.info("File loaded: %s (Schema: %s)", file_path, arxml_file.schema_version)
-            except Exception as e:
-                raise InvalidArxmlFileError(f"Error loading file {file_path}: {e}", str(file_path)) from e
-        
-        # Validiere Dateien
-        self._validate_files(arxml_files)
+                cache_key = cache.compute_key(file_paths, self.config)
+            except OSError:
+                cache_key = None  # fehlende Dateien meldet das Laden
+            cached_result = cache.load(cache_key, self.config) if cache_key else None
+            if cached_result is not None:
+                cached_result.statistics.processing_time = time.time() - start_time
+                self.logger.info("Merge result served from cache in %.2fs (key %s)",
+                                 cached_result.statistics.processing_time, cache_key[:12])
+                return cached_result
         
-        # Führe Merge durch
-        merged_tree, conflicts = self._merge_arxml_files(arxml_files)
+        reset_peak_rss()
+        with suspended_gc(self.config.gc_tuning):
+            if self.config.low_memory:
+                # Jede Datei wird geladen, gemergt und sofort wieder freigegeben
+                merged_tree, conflicts, arxml_files = self._merge_files_sequentially(
+                    self._order_paths(file_paths)
+                )
+            else:
+                # Lade und validiere alle Dateien
+                arxml_files = self._load_files(file_paths)
+                self._validate_files(arxml_files)
+                    
+                # Führe Merge durch
+                merged_tree, conflicts = self._merge_arxml_files(self._order_files(arxml_files))
         
         # Erstelle Statistiken
         processing_time = time.time() - start_time
         statistics = MergeStatistics(
-            files_processed=len(file_paths),
+            files_processed=len(arxml_files),
             elements_merged=self._count_elements(merged_tree),
             conflicts_found=len(conflicts),
             conflicts_resolved=len([c for c in conflicts if c.resolved_value is not None]),
             processing_time=processing_time,
-            schema_version=arxml_files[0].schema_version if arxml_files else None
+            schema_version=arxml_files[0].schema_version if arxml_files else None,
+            ignored_elements=self._sum_ignored_elements(arxml_files),
+            subtrees_skipped=context.subtrees_skipped,
+            nodes_skipped=context.nodes_skipped,
+            models_from_cache=context.models_from_cache,
+            peak_rss=peak_rss(),
+            largest_input=max((input_size(f.file_path) for f in arxml_files), default=0)
         )
         
         self.logger.info("Merge completed in %.2fs", processing_time)
         self.logger.info("Elements merged: %d", statistics.elements_merged)
         self.logger.info("Conflicts found: %d", statistics.conflicts_found)
+        if statistics.subtrees_skipped:
+            self.logger.info("Identical subtrees skipped: %d (%d nodes)",
+                             statistics.subtrees_skipped, statistics.nodes_skipped)
+        if statistics.peak_rss is not None:
+            self.logger.info("Peak RSS: %.1f MiB (largest input: %.1f MiB)",
+                             statistics.peak_rss / (1 << 20), statistics.largest_input / (1 << 20))
+        
+        result = MergeResult(merged_tree, self.config, statistics, conflicts)
+        if cache_key is not None:
+            cache.store(cache_key, result)
+        return result
+    
+    async def merge_files_async(self, file_paths: List[Union[str, Path]],
+                                progress: Optional[MergeProgressStream] = None,
+                                executor: Optional[Executor] = None) -> MergeResult:
+        """
+        Merged Dateien in einem Executor, ohne den Event-Loop zu blockieren
+        
+        Cancelling the awaiting task stops the merge at the next file or package boundary.
+        One merger can run several merges concurrently, each in its own executor thread.
+        
+        Args:
+            file_paths: Liste der zu mergenden Dateien
+            progress: Async iterator receiving the "load" and "merge" progress events
+            executor: Executor to run in, defaults to the event loop's
+            
+        Returns:
+            MergeResult mit dem Ergebnis des Merge-Prozesses
+        """
+        return await run_in_executor(
+            lambda progress_callback, cancel_token: self.merge_files(file_paths, progress_callback, cancel_token),
+            progress, executor
+        )
+    
+    def merge_incremental(self, file_paths: List[Union[str, Path]], output: Union[str, Path],
+                          manifest_path: Optional[Union[str, Path]] = None,
+                          pretty_print: bool = True) -> MergeResult:
+        """
+        Merged Dateien direkt in eine Ausgabedatei und schreibt ein Merge-Manifest
+        
+        With the manifest of a previous run, only the top-level packages touched by changed,
+        added or removed files are merged again; all other packages are copied from the
+        previous output. The output is identical to a full merge in the given input order
+        (optimize_order is not supported, see core.incremental).
+        
+        Args:
+            file_paths: Liste der zu mergenden Dateien (keine Archive)
+            output: Output path, compressed by extension or config.output_compression
+            manifest_path: Merge manifest, defaults to OUTPUT.manifest.json.gz
+            pretty_print: Indent the output
+            
+        Returns:
+            MergeResult; the output is already written, its tree is parsed on demand
+        """
+        return IncrementalMerger(self).merge(file_paths, output, manifest_path, pretty_print)
+    
+    def merge_external(self, file_paths: List[Union[str, Path]], output: Union[str, Path],
+                       pretty_print: bool = True,
+                       spill_dir: Optional[Union[str, Path]] = None) -> MergeResult:
+        """
+        Merged Dateien out-of-core direkt in eine Ausgabedatei
+        
+        Inputs are streamed and their top-level packages spilled to disk; each package is
+        then merged and written on its own, so memory is bounded by the largest package
+        instead of the whole model (see core.external). The output equals a full merge in the
+        given input order (optimize_order is not supported).
+        
+        Args:
+            file_paths: Liste der zu mergenden Dateien (keine Archive)
+            output: Output path, compressed by extension or config.output_compression
+            pretty_print: Indent the output
+            spill_dir: Directory for the spill files, defaults to config.spill_dir
+            
+        Returns:
+            MergeResult; the output is already written, its tree is parsed on demand
+        """
+        return ExternalMerger(self).merge(file_paths, output, pretty_print, spill_dir)
+    
+    def _get_cache(self) -> Optional[MergeCache]:
+        """Merge result cache of config.cache_dir, None if caching is disabled"""
+        if self.config.cache_dir is None:
+            return None
+        return MergeCache(self.config.cache_dir, self.config.cache_max_size)
+    
+    def plan_files(self, file_paths: List[Union[str, Path]]) -> MergePlan:
+        """
+        Plant einen Merge ohne den gemergten Baum aufzubauen (Dry-Run)
+        
+        Args:
+            file_paths: Liste der zu mergenden Dateien
+            
+        Returns:
+            MergePlan mit neuen, gemergten und ersetzten Elementen sowie Konflikten je Package
+        """
+        if not file_paths:
+            raise ArxmlMergerException("No files provided for merging")
+        
+        self.logger.info("Planning merge of %d files", len(file_paths))
+        with self._merge_context():
+            arxml_files = self._load_files(file_paths)
+        self._validate_files(arxml_files)
+        arxml_files = self._order_files(arxml_files)
+        
+        schema_handler = self._get_schema_handler(arxml_files[0].schema_version)
+        plan = MergePlanner(self, schema_handler).plan_files(arxml_files)
+        self.logger.info("Plan completed in %.2fs: %d new, %d merged, %d replaced, %d conflicts",
+                         plan.planning_time, plan.new_elements, plan.merged_elements,
+                         plan.replaced_elements, plan.conflicts)
+        return plan
+    
+    def _load_files(self, file_paths: List[Union[str, Path]],
+                    hashes: Optional[List[str]] = None) -> List[ArxmlFile]:
+        """Lädt alle Dateien und erkennt ihre Schema-Version; ZIP/TAR-Archive liefern ihre Member"""
+        context = self._context
+        arxml_files = []
+        model_cache = self._get_model_cache()
+        context.models_from_cache = 0
+        tracker = None
+        if context.progress_callback is not None:
+            sizes = [input_size(file_path) for file_path in file_paths]
+            tracker = ProgressTracker(context.progress_callback, "load", len(file_paths), sum(sizes))
+        for index, file_path in enumerate(file_paths):
+            if context.cancel_token is not None:
+                context.cancel_token.raise_if_cancelled()
+            if is_archive(file_path):
+                arxml_files.extend(self._load_archive(file_path))
+            else:
+                try:
+                    arxml_file = self._load_file(file_path, model_cache, hashes[index] if hashes else None)
+                    arxml_files.append(arxml_file)
+                    self.logger.info("File loaded: %s (Schema: %s)", file_path, arxml_file.schema_version)
+                except Exception as e:
+                    raise InvalidArxmlFileError(f"Error loading file {file_path}: {e}", str(file_path)) from e
+            if tracker is not None:
+                tracker.report(index + 1, sum(sizes[:index + 1]), str(file_path))
+        
+        if not arxml_files:
+            raise ArxmlMergerException("No ARXML files found in the given inputs")
+        if context.models_from_cache:
+            self.logger.info("Models loaded from cache: %d/%d", context.models_from_cache, len(arxml_files))
+        return arxml_files
+    
+    def _load_file(self, file_path: Union[str, Path], model_cache: Optional[ModelCache],
+                   file_hash: Optional[str] = None) -> ArxmlFile:
+        """Lädt eine Datei aus dem Speicher, dem Modell-Cache oder parst sie (und legt sie dort ab)"""
+        context = self._context
+        if context.models is not None:
+            # Der Merge kopiert aus den Eingaben, gespeicherte Modelle bleiben unverändert
+            path = str(Path(file_path).resolve())
+            file_hash = file_hash or hash_file(file_path)
+            arxml_file = context.models.get(path, file_hash)
+            if arxml_file is not None:
+                context.models_from_cache += 1
+                return arxml_file
+            arxml_file = self._read_file(file_path, model_cache)
+            if arxml_file.split_key_errors is None:
+                arxml_file.split_key_errors = self._validate_partial_model_constraints(arxml_file)
+            context.models.put(path, file_hash, arxml_file)
+            return arxml_file
+        return self._read_file(file_path, model_cache)
+    
+    def _read_file(self, file_path: Union[str, Path], model_cache: Optional[ModelCache]) -> ArxmlFile:
+        """Lädt eine Datei aus dem Modell-Cache oder parst sie (und legt sie im Cache ab)"""
+        cache_key = None
+        if model_cache is not None:
+            try:
+                cache_key = model_cache.compute_key(file_path, self.config)
+            except OSError:
+                cache_key = None  # fehlende Dateien meldet from_file
+            arxml_file = model_cache.load(cache_key, file_path, self.config) if cache_key else None
+            if arxml_file is not None:
+                self._context.models_from_cache += 1
+                return arxml_file
+        
+        arxml_file = ArxmlFile.from_file(file_path, self.config)
+        arxml_file.schema_version = SchemaDetector.detect_schema_version(arxml_file.root_element)
+        if cache_key is not None:
+            # Split-Key-Prüfung gleich mit speichern, ein Cache-Treffer überspringt sie
+            arxml_file.split_key_errors = self._validate_partial_model_constraints(arxml_file)
+            model_cache.store(cache_key, arxml_file)
+        return arxml_file
+    
+    def _get_model_cache(self) -> Optional[ModelCache]:
+        """Parsed-model cache of config.model_cache_dir, None if disabled"""
+        if self.config.model_cache_dir is None:
+            return None
+        return ModelCache(self.config.model_cache_dir, self.config.model_cache_max_size)
+    
+    def _load_archive(self, archive_path: Union[str, Path]) -> List[ArxmlFile]:
+        """
+        Streams the selected members of a ZIP/TAR bundle into the parser, sorted by member name
+        
+        Members bypass the model cache and the in-memory models: they are parsed on every load.
+        """
+        def load_member(name: str, stream) -> ArxmlFile:
+            arxml_file = ArxmlFile.from_stream(stream, member_path(archive_path, name), self.config)
+            arxml_file.schema_version = SchemaDetector.detect_schema_version(arxml_file.root_element)
+            return arxml_file
+        
+        try:
+            members = load_archive(archive_path, load_member,
+                                   include=self.config.archive_include,
+                                   exclude=self.config.archive_exclude,
+                                   workers=resolve_workers(self.config.load_workers))
+        except Exception as e:
+            raise InvalidArxmlFileError(f"Error loading archive {archive_path}: {e}", str(archive_path)) from e
         
-        return MergeResult(merged_tree, self.config, statistics, conflicts)
+        if not members:
+            self.logger.warning("No matching ARXML members in archive %s", archive_path)
+        for _, arxml_file in members:
+            self.logger.info("File loaded: %s (Schema: %s)", arxml_file.file_path, arxml_file.schema_version)
+        return [arxml_file for _, arxml_file in members]
     
     def _validate_files(self, files: List[ArxmlFile]) -> None:
         """Validates ARXML files before merge according to AUTOSAR standards"""
@@ -103,8 +496,10 @@ class ArxmlMerger:
                     str(arxml_file.file_path)
                 )
             
-            # Additional AUTOSAR Partial Model Merge validation
-            validation_errors = self._validate_partial_model_constraints(arxml_file)
+            # Additional AUTOSAR Partial Model Merge validation (cached models carry the result)
+            validation_errors = arxml_file.split_key_errors
+            if validation_errors is None:
+                validation_errors = self._validate_partial_model_constraints(arxml_file)
             if validation_errors:
                 self.logger.warning("Partial model constraints in %s: %s", 
                                   arxml_file.file_path, validation_errors)
@@ -117,7 +512,7 @@ class ArxmlMerger:
         # Check for required elements in partial models
         ar_packages = None
         for child in root:
-            if etree.QName(child).localname == "AR-PACKAGES":
+            if get_local_name(child) == "AR-PACKAGES":
                 ar_packages = child
                 break
         
@@ -127,18 +522,24 @@ class ArxmlMerger:
         
         # Validate that splitable elements have proper SHORT-NAME identifiers (like dSpace SystemDesk)
         schema_handler = self._get_schema_handler(arxml_file.schema_version)
+        errors.extend(self._find_unidentified_elements(root, schema_handler))
         
-        for element in root.iter():
-            tag_name = etree.QName(element).localname
+        return errors
+    
+    def _find_unidentified_elements(self, root: etree._Element,
+                                    schema_handler: AutosarSchemaHandler) -> List[str]:
+        """Splitable elements in a (sub)tree without any split key value"""
+        errors = []
+        
+        # libxml2 filtert die Tags, statt jedes Element in Python zu prüfen
+        splitable_tags = [f"{{*}}{tag}" for tag in sorted(schema_handler.splitable_elements)]
+        for element in root.iter(*splitable_tags):
+            tag_name = get_local_name(element)
             if schema_handler.is_splitable_element(tag_name):
-                split_keys = schema_handler.get_element_split_keys(tag_name)
+                extract_key = self._get_key_extractor(schema_handler, tag_name)
                 
                 # Check if element has at least one split key value (primarily SHORT-NAME)
-                has_identifier = False
-                for key in split_keys:
-                    if schema_handler.extract_split_key_value(element, key):
-                        has_identifier = True
-                        break
+                has_identifier = any(extract_key(element))
                 
                 if not has_identifier:
                     element_path = get_autosar_path(element)
@@ -146,6 +547,37 @@ class ArxmlMerger:
         
         return errors
     
+    def _order_files(self, files: List[ArxmlFile]) -> List[ArxmlFile]:
+        """Cost-based merge order of the loaded inputs if config.optimize_order applies (see core.ordering)"""
+        if not self._may_reorder(len(files)):
+            return files
+        
+        extract_key = self._get_key_extractor(self._get_schema_handler(files[0].schema_version), "AR-PACKAGE")
+        order = plan_merge_order([collect_statistics(f.root_element, extract_key) for f in files])
+        files = [files[index] for index in order]
+        self.logger.info("Merge order (base first): %s", ", ".join(str(f.file_path) for f in files))
+        return files
+    
+    def _order_paths(self, file_paths: List[Union[str, Path]]) -> List[Union[str, Path]]:
+        """_order_files for the low-memory merge: the inputs are not loaded yet, only file sizes count"""
+        if not self._may_reorder(len(file_paths)):
+            return file_paths
+        
+        order = plan_merge_order([InputStatistics(input_size(file_path)) for file_path in file_paths])
+        file_paths = [file_paths[index] for index in order]
+        self.logger.info("Merge order (base first): %s", ", ".join(str(p) for p in file_paths))
+        return file_paths
+    
+    def _may_reorder(self, count: int) -> bool:
+        """Whether config.optimize_order may reorder the inputs; logs if the strategy forbids it"""
+        if not self.config.optimize_order or count < 2:
+            return False
+        if self.config.conflict_resolution not in ORDER_INSENSITIVE_STRATEGIES:
+            self.logger.warning("Input order kept: conflict resolution '%s' depends on the order",
+                                self.config.conflict_resolution.value)
+            return False
+        return True
+    
     def _merge_arxml_files(self, files: List[ArxmlFile]) -> tuple[etree._Element, List[MergeConflict]]:
         """Führt den eigentlichen Merge der ARXML-Dateien durch"""
         if not files:
@@ -159,26 +591,199 @@ class ArxmlMerger:
         schema_handler = self._get_schema_handler(base_file.schema_version)
         
         conflicts = []
+        context = self._context
+        
+        tracker = None
+        if context.progress_callback is not None:
+            sizes = [input_size(source_file.file_path) for source_file in files[1:]]
+            tracker = ProgressTracker(context.progress_callback, "merge", len(files) - 1, sum(sizes))
         
         # Merge jede weitere Datei
         for i, source_file in enumerate(files[1:], 1):
+            if context.cancel_token is not None:
+                context.cancel_token.raise_if_cancelled()
             self.logger.info("Merging file %d/%d: %s", i+1, len(files), source_file.file_path)
             
-            source_conflicts = self._merge_single_file(
-                merged_root, 
-                source_file.root_element, 
+            on_package = None
+            if tracker is not None:
+                merged_bytes = sum(sizes[:i - 1])
+                
+                def on_package(position: int, count: int, package: etree._Element,
+                               done: int = i - 1, merged_bytes: int = merged_bytes, size: int = sizes[i - 1]) -> None:
+                    tracker.packages += 1
+                    tracker.report(done, merged_bytes + size * position // count, get_short_name(package))
+            
+            conflicts.extend(self._merge_source_file(merged_root, source_file, schema_handler, on_package))
+            if tracker is not None:
+                tracker.report(i, sum(sizes[:i]), str(source_file.file_path))
+        
+        return merged_root, conflicts
+    
+    def _merge_source_file(self, merged_root: etree._Element, source_file: ArxmlFile,
+                           schema_handler: AutosarSchemaHandler,
+                           on_package: Optional[PackageCallback] = None) -> List[MergeConflict]:
+        """Merged eine geladene Datei in den Zielbaum (mit ihren Merkle-Digests)"""
+        context = self._context
+        context.source_digests = source_file.subtree_digests
+        try:
+            return self._merge_single_file(
+                merged_root,
+                source_file.root_element,
                 schema_handler,
-                str(source_file.file_path)
+                str(source_file.file_path),
+                on_package
             )
-            conflicts.extend(source_conflicts)
+        finally:
+            context.source_digests = None
+            context.unique_matches = {}
+    
+    def _merge_files_sequentially(self, file_paths: List[Union[str, Path]]
+                                  ) -> Tuple[etree._Element, List[MergeConflict], List[ArxmlFile]]:
+        """
+        Low-memory merge: loads, validates and merges one input at a time and releases it
         
-        return merged_root, conflicts
+        Only the merged tree and the input being merged are held in memory; the first input
+        becomes the merged tree without a copy (unless parsed models are kept in memory).
+        Archives are loaded as a whole, member by member merged.
+        
+        Returns:
+            (merged root, conflicts, released inputs as ArxmlFile stubs for the statistics)
+        """
+        context = self._context
+        model_cache = self._get_model_cache()
+        
+        merged_root = None
+        schema_handler = None
+        schema_versions = set()
+        conflicts = []
+        summaries = []
+        tracker = None
+        if context.progress_callback is not None:
+            sizes = [input_size(file_path) for file_path in file_paths]
+            tracker = ProgressTracker(context.progress_callback, "merge", len(file_paths), sum(sizes))
+        
+        for index, file_path in enumerate(file_paths):
+            if context.cancel_token is not None:
+                context.cancel_token.raise_if_cancelled()
+            if is_archive(file_path):
+                sources = self._load_archive(file_path)
+            else:
+                try:
+                    sources = [self._load_file(file_path, model_cache, None)]
+                except Exception as e:
+                    raise InvalidArxmlFileError(f"Error loading file {file_path}: {e}", str(file_path)) from e
+                self.logger.info("File loaded: %s (Schema: %s)", file_path, sources[0].schema_version)
+            
+            while sources:
+                source_file = sources.pop(0)
+                if source_file.schema_version not in schema_versions and schema_versions:
+                    self.logger.warning("Different schema versions detected: %s",
+                                        schema_versions | {source_file.schema_version})
+                schema_versions.add(source_file.schema_version)
+                self._validate_files([source_file])
+                
+                if merged_root is None:
+                    # Basis: gespeicherte Modelle (Watch-Modus, Server) bleiben unverändert
+                    schema_handler = self._get_schema_handler(source_file.schema_version)
+                    if context.models is not None:
+                        merged_root = deep_copy_element(source_file.root_element)
+                    else:
+                        merged_root = source_file.root_element
+                else:
+                    self.logger.info("Merging file %d: %s", len(summaries) + 1, source_file.file_path)
+                    conflicts.extend(self._merge_source_file(merged_root, source_file, schema_handler))
+                
+                summaries.append(ArxmlFile(source_file.file_path, None, source_file.schema_version,
+                                           ignored_elements=source_file.ignored_elements))
+                del source_file
+                if self.config.gc_tuning:
+                    gc.collect()
+            
+            if tracker is not None:
+                tracker.report(index + 1, sum(sizes[:index + 1]), str(file_path))
+        
+        if merged_root is None:
+            raise ArxmlMergerException("No ARXML files found in the given inputs")
+        if context.models_from_cache:
+            self.logger.info("Models loaded from cache: %d/%d", context.models_from_cache, len(summaries))
+        return merged_root, conflicts, summaries
+    
+    def _is_identical_subtree(self, context: MergeContext, target_element: etree._Element,
+                              source_element: etree._Element,
+                              schema_handler: Optional[AutosarSchemaHandler] = None) -> bool:
+        """
+        Compares the Merkle digests of two subtrees and counts skipped nodes on a match
+        
+        With schema_handler the pair is merged rather than replaced, so it only counts as
+        identical if merging it is a no-op (see _has_unique_matches).
+        """
+        if context.source_digests is None:
+            return False
+        source_digest = compute_subtree_digest(source_element, context.source_digests)
+        if compute_subtree_digest(target_element, context.target_digests) != source_digest:
+            return False
+        if schema_handler is not None and not self._has_unique_matches(schema_handler, source_element,
+                                                                       context.unique_matches):
+            return False
+        context.subtrees_skipped += 1
+        context.nodes_skipped += source_digest[1]
+        return True
+    
+    def _has_unique_matches(self, schema_handler: AutosarSchemaHandler, element: etree._Element,
+                            cache: Dict[etree._Element, bool]) -> bool:
+        """
+        Checks that every child in the subtree of element has a match of its own
+        
+        Source children are matched to the first target child with the same split key (keyed)
+        or tag (unkeyed). Repeated matches under one parent merge later siblings into the first
+        one, so an identical copy of such a subtree is not merged as a no-op. Results are cached
+        per element (bottom-up, without recursion).
+        """
+        if len(element) == 0:
+            return True
+        cached = cache.get(element)
+        if cached is not None:
+            return cached
+        
+        stack = [(element, False)]
+        while stack:
+            node, children_done = stack.pop()
+            if not children_done:
+                stack.append((node, True))
+                for child in node:
+                    if len(child) and child not in cache:
+                        stack.append((child, False))
+                continue
+            cache[node] = (self._children_match_uniquely(schema_handler, node) and
+                           all(cache[child] for child in node if len(child)))
+        return cache[element]
+    
+    def _children_match_uniquely(self, schema_handler: AutosarSchemaHandler, element: etree._Element) -> bool:
+        """Checks that no two children of element match the same target child"""
+        splitable = schema_handler.is_splitable_element(get_local_name(element))
+        first_matches: Dict[tuple, etree._Element] = {}
+        for child in element:
+            tag = get_local_name(child)
+            if tag is None:
+                continue
+            if splitable or self._is_keyed_element(schema_handler, tag):
+                key = (tag, self._get_key_extractor(schema_handler, tag)(child))
+            else:
+                key = (tag,)
+            match = first_matches.setdefault(key, child)
+            if match is child:
+                continue
+            # Nur Blätter mit gleichen Attributen lassen den ersten Treffer unverändert
+            if splitable or len(child) or dict(child.attrib) != dict(match.attrib):
+                return False
+        return True
     
     def _merge_single_file(self, 
                           target_root: etree._Element, 
                           source_root: etree._Element,
                           schema_handler: AutosarSchemaHandler,
-                          source_file_path: str) -> List[MergeConflict]:
+                          source_file_path: str,
+                          on_package: Optional[PackageCallback] = None) -> List[MergeConflict]:
         """Merged eine einzelne Datei in den Zielbaum"""
         conflicts = []
         
@@ -187,12 +792,12 @@ class ArxmlMerger:
         source_packages = None
         
         for child in target_root:
-            if etree.QName(child).localname == "AR-PACKAGES":
+            if get_local_name(child) == "AR-PACKAGES":
                 target_packages = child
                 break
                 
         for child in source_root:
-            if etree.QName(child).localname == "AR-PACKAGES":
+            if get_local_name(child) == "AR-PACKAGES":
                 source_packages = child
                 break
         
@@ -202,7 +807,7 @@ class ArxmlMerger:
         
         # Merge Packages rekursiv
         package_conflicts = self._merge_packages(
-            target_packages, source_packages, schema_handler, source_file_path
+            target_packages, source_packages, schema_handler, source_file_path, on_package
         )
         conflicts.extend(package_conflicts)
         
@@ -212,25 +817,103 @@ class ArxmlMerger:
                        target_packages: etree._Element, 
                        source_packages: etree._Element,
                        schema_handler: AutosarSchemaHandler,
-                       source_file_path: str) -> List[MergeConflict]:
-        """Merged AR-PACKAGE Elemente"""
+                       source_file_path: str,
+                       on_package: Optional[PackageCallback] = None) -> List[MergeConflict]:
+        """Merged AR-PACKAGE Elemente; on_package(position, count, package) folgt auf jedes Package"""
         conflicts = []
         
-        # Alle AR-PACKAGE Elemente der Quelle - einfachere Suche
-        source_package_elements = []
-        for child in source_packages:
-            if etree.QName(child).localname == "AR-PACKAGE":
-                source_package_elements.append(child)
+        # Index der Ziel-Packages nach Split-Key; neue Packages werden nachgetragen
+        extract_key = self._get_key_extractor(schema_handler, "AR-PACKAGE")
+        target_index = self._build_key_index(target_packages, "AR-PACKAGE", extract_key)
+        
+        packages = [package for package in source_packages if get_local_name(package) == "AR-PACKAGE"]
+        pool = self._get_package_pool() if len(packages) > 1 else None
+        if pool is not None:
+            return self._merge_packages_pooled(pool, target_packages, target_index, packages, schema_handler,
+                                               source_file_path, on_package)
         
-        for source_package in source_package_elements:
+        cancel_token = self._context.cancel_token
+        for position, source_package in enumerate(packages, 1):
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
             conflicts.extend(self._merge_package(
-                target_packages, source_package, schema_handler, source_file_path
+                target_packages, target_index, source_package, schema_handler, source_file_path
             ))
+            if on_package is not None:
+                on_package(position, len(packages), source_package)
         
         return conflicts
     
+    def _merge_packages_pooled(self, 
+                               pool: PackageMergePool,
+                               target_packages: etree._Element,
+                               target_index: Dict[tuple, etree._Element],
+                               packages: List[etree._Element],
+                               schema_handler: AutosarSchemaHandler,
+                               source_file_path: str,
+                               on_package: Optional[PackageCallback] = None) -> List[MergeConflict]:
+        """_merge_packages with large matched packages merged in the package pool (see core.parallel)"""
+        context = self._context
+        extract_key = self._get_key_extractor(schema_handler, "AR-PACKAGE")
+        package_conflicts: List[List[MergeConflict]] = []
+        # Split-Key -> (Future, Position, Ziel-Package, Pfad des Ziel-Packages beim Absenden)
+        pending: Dict[tuple, Tuple[Future, int, etree._Element, str]] = {}
+        
+        def splice(key: tuple) -> None:
+            future, position, target_package, package_path = pending.pop(key)
+            if context.target_digests:
+                for element in target_package.iter():
+                    context.target_digests.pop(element, None)
+            package, conflicts, subtrees_skipped, nodes_skipped = pool.splice(future, target_package, package_path)
+            target_index[key] = package
+            package_conflicts[position - 1] = conflicts
+            context.subtrees_skipped += subtrees_skipped
+            context.nodes_skipped += nodes_skipped
+            if on_package is not None:
+                on_package(position, len(packages), packages[position - 1])
+        
+        try:
+            for position, source_package in enumerate(packages, 1):
+                if context.cancel_token is not None:
+                    context.cancel_token.raise_if_cancelled()
+                key = extract_key(source_package)
+                if key in pending:
+                    splice(key)  # Wiederholtes Package: erst das vorige Ergebnis einsetzen
+                matching_package = target_index.get(key)
+                if matching_package is not None and pool.accepts(matching_package, source_package):
+                    future = pool.submit(matching_package, source_package, schema_handler.version,
+                                         source_file_path)
+                    pending[key] = (future, position, matching_package, get_element_path(matching_package))
+                    package_conflicts.append([])
+                    continue
+                
+                package_conflicts.append(self._merge_package(
+                    target_packages, target_index, source_package, schema_handler, source_file_path
+                ))
+                if on_package is not None:
+                    on_package(position, len(packages), source_package)
+            
+            for key in list(pending):
+                splice(key)
+        finally:
+            # Nach einem Fehler: noch nicht gestartete Packages dieses Merges verwerfen
+            for future, _, _, _ in pending.values():
+                future.cancel()
+        return [conflict for conflicts in package_conflicts for conflict in conflicts]
+    
+    def _get_package_pool(self) -> Optional[PackageMergePool]:
+        """Process pool of config.package_workers, None if packages are merged inline"""
+        workers = resolve_workers(self.config.package_workers)
+        if workers <= 1 or self._observers or self._context.unit_timings is not None:
+            return None  # Events und Zeitmessung gibt es nur beim Inline-Merge
+        with self._pool_lock:
+            if self._package_pool is None:
+                self._package_pool = PackageMergePool(self.config, workers)
+            return self._package_pool
+    
     def _merge_package(self, 
                       target_packages: etree._Element, 
+                      target_index: Dict[tuple, etree._Element],
                       source_package: etree._Element,
                       schema_handler: AutosarSchemaHandler,
                       source_file_path: str) -> List[MergeConflict]:
@@ -238,29 +921,23 @@ class ArxmlMerger:
         conflicts = []
         
         # Finde passendes Package im Ziel
-        split_keys = schema_handler.get_element_split_keys("AR-PACKAGE")
-        target_package_elements = []
-        for child in target_packages:
-            if etree.QName(child).localname == "AR-PACKAGE":
-                target_package_elements.append(child)
-        
-        matching_package = find_matching_element(
-            source_package, target_package_elements, split_keys
-        )
+        package_key = self._get_key_extractor(schema_handler, "AR-PACKAGE")(source_package)
+        matching_package = target_index.get(package_key)
         
         if matching_package is None:
             # Neues Package hinzufügen
             new_package = deep_copy_element(source_package)
             target_packages.append(new_package)
-            package_path = get_autosar_path(source_package)
-            self.logger.debug("New package added: %s", get_element_signature(source_package, split_keys))
-            if self.config.verbose_merge:
-                self.logger.info("+ Added new package: %s (from %s)", package_path, source_file_path)
+            target_index[package_key] = new_package
+            if self.logger.isEnabledFor(logging.DEBUG):
+                split_keys = self._get_split_keys(schema_handler, "AR-PACKAGE")
+                self.logger.debug("New package added: %s", get_element_signature(source_package, split_keys))
+            if self._observers:
+                dispatch(self._observers, ElementAdded(new_package, source_package, source_file_path))
         else:
             # Package mergen
-            if self.config.verbose_merge:
-                package_path = get_autosar_path(matching_package)
-                self.logger.info("* Merging package: %s (from %s)", package_path, source_file_path)
+            if self._observers:
+                dispatch(self._observers, ElementMerged(matching_package, source_package, source_file_path))
             conflicts.extend(self._merge_elements(
                 matching_package, source_package, schema_handler, source_file_path
             ))
@@ -272,8 +949,29 @@ class ArxmlMerger:
                        source_element: etree._Element,
                        schema_handler: AutosarSchemaHandler,
                        source_file_path: str) -> List[MergeConflict]:
-        """Merged zwei Elemente rekursiv"""
-        conflicts = []
+        """Merged zwei Elemente samt Teilbäumen (iterativ über die Worklist, siehe core.worklist)"""
+        context = self._context
+        conflicts: List[MergeConflict] = []
+        
+        def expand(target: etree._Element, source: etree._Element) -> MergeUnit:
+            return self._merge_unit(target, source, schema_handler, source_file_path, conflicts, context)
+        
+        run_worklist(expand, target_element, source_element, context.unit_timings)
+        return conflicts
+    
+    def _merge_unit(self, 
+                    target_element: etree._Element, 
+                    source_element: etree._Element,
+                    schema_handler: AutosarSchemaHandler,
+                    source_file_path: str,
+                    conflicts: List[MergeConflict],
+                    context: MergeContext) -> MergeUnit:
+        """Merged Attribute und direkte Kinder zweier Elemente; liefert die rekursiv zu mergenden Paare"""
+        if context.skip_identical:
+            if self._is_identical_subtree(context, target_element, source_element, schema_handler):
+                return
+            # Der Zielbaum wird gleich verändert, sein Digest ist danach ungültig
+            context.target_digests.pop(target_element, None)
         
         # Merge Attribute
         attr_conflicts = merge_attributes(
@@ -288,128 +986,134 @@ class ArxmlMerger:
                 conflicting_values=[attr_conflict],
                 source_files=[source_file_path]
             ))
+            if self._observers:
+                dispatch(self._observers, ConflictDetected(
+                    target_element, source_element, source_file_path, conflicts[-1]
+                ))
         
         # Merge Kinder-Elemente
-        element_name = etree.QName(target_element).localname
+        element_name = get_local_name(target_element)
         
         if schema_handler.is_splitable_element(element_name):
             # Verwende Split-Keys für splitbare Elemente
-            split_keys = schema_handler.get_element_split_keys(element_name)
-            child_conflicts = self._merge_splitable_children(
-                target_element, source_element, split_keys, schema_handler, source_file_path
+            yield from self._merge_splitable_children(
+                target_element, source_element, schema_handler, source_file_path, conflicts, context
             )
-            conflicts.extend(child_conflicts)
         else:
             # Standard-Merge für andere Elemente
-            child_conflicts = self._merge_standard_children(
-                target_element, source_element, schema_handler, source_file_path
+            yield from self._merge_standard_children(
+                target_element, source_element, schema_handler, source_file_path, conflicts, context
             )
-            conflicts.extend(child_conflicts)
-        
-        return conflicts
     
     def _merge_splitable_children(self, 
                                  target_element: etree._Element, 
                                  source_element: etree._Element,
-                                 split_keys: List[str],
                                  schema_handler: AutosarSchemaHandler,
-                                 source_file_path: str) -> List[MergeConflict]:
+                                 source_file_path: str,
+                                 conflicts: List[MergeConflict],
+                                 context: MergeContext) -> MergeUnit:
         """Merges children of splitable elements using SHORT-NAME based approach like dSpace SystemDesk"""
-        conflicts = []
-        
         # Group children by tag name for efficient processing
         source_children_by_tag = {}
         for child in source_element:
-            tag = etree.QName(child).localname
+            tag = get_local_name(child)
+            if tag is None:
+                continue
             if tag not in source_children_by_tag:
                 source_children_by_tag[tag] = []
             source_children_by_tag[tag].append(child)
         
         for tag, source_children in source_children_by_tag.items():
-            target_children = [c for c in target_element if etree.QName(c).localname == tag]
-            
-            # Get split keys for this child element type (SHORT-NAME based)
-            child_split_keys = schema_handler.get_element_split_keys(tag)
+            # Index existing target children by their compiled split key (SHORT-NAME based).
+            # Elements appended below are not indexed, so source duplicates stay duplicates.
+            extract_key = self._get_key_extractor(schema_handler, tag)
+            target_index = self._build_key_index(target_element, tag, extract_key)
+            child_split_keys = self._get_split_keys(schema_handler, tag)
             
             for source_child in source_children:
-                matching_child = find_matching_element(source_child, target_children, child_split_keys)
+                matching_child = target_index.get(extract_key(source_child))
                 
                 if matching_child is None:
                     # Add new element - this is the core of partial model merging
                     new_child = deep_copy_element(source_child)
                     target_element.append(new_child)
-                    if self.config.verbose_merge:
-                        child_path = get_autosar_path(new_child)
-                        child_signature = get_element_signature(source_child, child_split_keys)
-                        self.logger.info("  + Added new splitable element: %s (%s) from %s", 
-                                       child_path, child_signature, source_file_path)
+                    if self._observers:
+                        dispatch(self._observers, ElementAdded(
+                            new_child, source_child, source_file_path, child_split_keys
+                        ))
                 else:
                     # Merge existing element
                     if schema_handler.is_splitable_element(tag):
                         # Recursive merge for splitable elements
-                        if self.config.verbose_merge:
-                            child_path = get_autosar_path(matching_child)
-                            child_signature = get_element_signature(source_child, child_split_keys)
-                            self.logger.info("  * Merging splitable element: %s (%s) from %s", 
-                                           child_path, child_signature, source_file_path)
-                        conflicts.extend(self._merge_elements(
-                            matching_child, source_child, schema_handler, source_file_path
-                        ))
+                        if self._observers:
+                            dispatch(self._observers, ElementMerged(
+                                matching_child, source_child, source_file_path, child_split_keys
+                            ))
+                        yield matching_child, source_child
                     else:
                         # For non-splitable children within splitable elements, apply conflict resolution
                         if self.config.conflict_resolution == ConflictResolutionStrategy.LAST_WINS:
                             # Replace with source content
                             parent = matching_child.getparent()
+                            if context.skip_identical and self._is_identical_subtree(context, matching_child,
+                                                                                     source_child):
+                                continue
                             if parent is not None:
                                 index = list(parent).index(matching_child)
                                 parent.remove(matching_child)
                                 new_child = deep_copy_element(source_child)
                                 parent.insert(index, new_child)
-                                if self.config.verbose_merge:
-                                    child_path = get_autosar_path(new_child)
-                                    self.logger.info("  ~ Replaced non-splitable element: %s from %s", 
-                                                   child_path, source_file_path)
+                                if self._observers:
+                                    dispatch(self._observers, ElementReplaced(new_child, source_child, source_file_path))
                         elif self.config.conflict_resolution == ConflictResolutionStrategy.FIRST_WINS:
-                            # Keep target content, log the action
-                            if self.config.verbose_merge:
-                                child_path = get_autosar_path(matching_child)
-                                self.logger.info("  = Kept target element: %s (ignoring %s)", 
-                                               child_path, source_file_path)
+                            # Keep target content, report the action
+                            if self._observers:
+                                dispatch(self._observers, ElementKept(matching_child, source_child, source_file_path))
                         else:
                             # Try to merge recursively
-                            conflicts.extend(self._merge_elements(
-                                matching_child, source_child, schema_handler, source_file_path
-                            ))
-        
-        return conflicts
+                            yield matching_child, source_child
     
     def _merge_standard_children(self, 
                                 target_element: etree._Element, 
                                 source_element: etree._Element,
                                 schema_handler: AutosarSchemaHandler,
-                                source_file_path: str) -> List[MergeConflict]:
+                                source_file_path: str,
+                                conflicts: List[MergeConflict],
+                                context: MergeContext) -> MergeUnit:
         """Merged Kinder von nicht-splitbaren Elementen"""
-        conflicts = []
-        
-        # Einfache Strategie: Füge alle Kinder hinzu, die nicht bereits existieren
+        # Einfache Strategie: Füge alle Kinder hinzu, die nicht bereits existieren.
+        # Splitbare Kinder (z.B. Ports in PORTS) werden über ihren Split-Key zugeordnet.
+        key_indexes: Dict[str, Dict[tuple, etree._Element]] = {}
         for source_child in source_element:
-            source_tag = etree.QName(source_child).localname
+            source_tag = get_local_name(source_child)
+            if source_tag is None:
+                continue
             
-            # Prüfe ob bereits ein Kind mit diesem Tag existiert
-            existing_child = None
-            for child in target_element:
-                if etree.QName(child).localname == source_tag:
-                    existing_child = child
-                    break
+            key = None
+            if self._is_keyed_element(schema_handler, source_tag):
+                extract_key = self._get_key_extractor(schema_handler, source_tag)
+                key_index = key_indexes.get(source_tag)
+                if key_index is None:
+                    key_index = self._build_key_index(target_element, source_tag, extract_key)
+                    key_indexes[source_tag] = key_index
+                key = extract_key(source_child)
+                existing_child = key_index.get(key)
+            else:
+                # Prüfe ob bereits ein Kind mit diesem Tag existiert
+                existing_child = None
+                for child in target_element:
+                    if get_local_name(child) == source_tag:
+                        existing_child = child
+                        break
             
             if existing_child is None:
                 # Neues Kind hinzufügen
                 new_child = deep_copy_element(source_child)
                 target_element.append(new_child)
-                if self.config.verbose_merge:
-                    child_path = get_autosar_path(new_child)
-                    self.logger.info("  + Added new child element: %s from %s", 
-                                   child_path, source_file_path)
+                if key is not None:
+                    key_indexes[source_tag][key] = new_child
+                if self._observers:
+                    dispatch(self._observers, ElementAdded(new_child, source_child, source_file_path))
             else:
                 # Konflikt oder rekursiver Merge
                 if self.config.conflict_resolution == ConflictResolutionStrategy.FAIL_ON_CONFLICT:
@@ -419,27 +1123,58 @@ class ArxmlMerger:
                         conflicting_values=[existing_child.text, source_child.text],
                         source_files=[source_file_path]
                     ))
-                    if self.config.verbose_merge:
-                        child_path = get_autosar_path(existing_child)
-                        self.logger.warning("  ! Conflict detected at: %s from %s", 
-                                          child_path, source_file_path)
+                    if self._observers:
+                        dispatch(self._observers, ConflictDetected(
+                            existing_child, source_child, source_file_path, conflicts[-1]
+                        ))
                 else:
                     # Rekursiver Merge
-                    if self.config.verbose_merge:
-                        child_path = get_autosar_path(existing_child)
-                        self.logger.info("  * Recursively merging: %s from %s", 
-                                       child_path, source_file_path)
-                    conflicts.extend(self._merge_elements(
-                        existing_child, source_child, schema_handler, source_file_path
-                    ))
-        
-        return conflicts
+                    if self._observers:
+                        dispatch(self._observers, ElementMerged(existing_child, source_child, source_file_path))
+                    yield existing_child, source_child
+    
+    def _is_keyed_element(self, schema_handler: AutosarSchemaHandler, element_name: str) -> bool:
+        """Checks if an element is matched by split key (splitable or custom split keys)"""
+        return element_name in self.custom_key_extractors or schema_handler.is_splitable_element(element_name)
+    
+    @staticmethod
+    def _build_key_index(parent: etree._Element, tag: str,
+                         extract_key: SplitKeyExtractor) -> Dict[tuple, etree._Element]:
+        """Indexes the children of parent with the given tag by split key (first match wins)"""
+        index: Dict[tuple, etree._Element] = {}
+        for child in parent:
+            if get_local_name(child) == tag:
+                index.setdefault(extract_key(child), child)
+        return index
+    
+    def _get_split_keys(self, schema_handler: AutosarSchemaHandler, element_name: str) -> List[str]:
+        """Returns the split keys for an element, custom split keys take precedence"""
+        split_keys = self.custom_split_keys.get(element_name)
+        if split_keys is None:
+            split_keys = schema_handler.get_element_split_keys(element_name)
+        return split_keys
+    
+    def _get_key_extractor(self, schema_handler: AutosarSchemaHandler, element_name: str) -> SplitKeyExtractor:
+        """Returns the compiled split key extractor for an element, custom split keys take precedence"""
+        extractor = self.custom_key_extractors.get(element_name)
+        if extractor is None:
+            extractor = schema_handler.get_key_extractor(element_name)
+        return extractor
     
     def _get_schema_handler(self, version: str) -> AutosarSchemaHandler:
-        """Holt oder erstellt einen Schema-Handler für die Version"""
-        if version not in self.schema_handlers:
-            self.schema_handlers[version] = SchemaDetector.create_schema_handler(version)
-        return self.schema_handlers[version]
+        """Holt den geteilten Schema-Handler für die Version"""
+        return SchemaDetector.get_schema_handler(version)
+    
+    @staticmethod
+    def _sum_ignored_elements(files: List[ArxmlFile]) -> Dict[str, Dict[str, int]]:
+        """Sums up the pruned nodes/bytes per ignored tag over all files"""
+        totals: Dict[str, Dict[str, int]] = {}
+        for arxml_file in files:
+            for tag, stats in arxml_file.ignored_elements.items():
+                tag_totals = totals.setdefault(tag, {"nodes": 0, "bytes": 0})
+                tag_totals["nodes"] += stats["nodes"]
+                tag_totals["bytes"] += stats["bytes"]
+        return totals
     
     def _count_elements(self, root: etree._Element) -> int:
         """Zählt alle Elemente im Baum"""
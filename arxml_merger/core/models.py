@@ -2,11 +2,26 @@
 Data models for the ARXML Merger
 """
 
-from typing import List, Dict, Optional, Union, Any
-from dataclasses import dataclass, field
+from typing import IO, Callable, List, Dict, Optional, Tuple, Union, Any
+from concurrent.futures import Executor
+from dataclasses import asdict, dataclass, field
 from pathlib import Path
 from enum import Enum
 from lxml import etree
+import marshal
+import shutil
+import struct
+import zlib
+
+from ..utils.xml_utils import get_local_name, parse_pruned, SubtreeDigest
+from ..utils.serialization import write_tree
+from ..utils.compression import (
+    check_compression, compression_from_suffix, detect_compression, open_input, open_output
+)
+from ..utils.parsing import resolve_parser_options, get_parser
+from .exceptions import ArxmlMergerException, MergeCancelledError
+from .progress import CancellationToken, ProgressCallback, ProgressTracker
+from .aio import MergeProgressStream, run_in_executor
 
 
 class ConflictResolutionStrategy(Enum):
@@ -30,6 +45,47 @@ class MergeConfig:
     namespace_prefixes: Dict[str, str] = field(default_factory=dict)
     custom_split_keys: Dict[str, List[str]] = field(default_factory=dict)
     ignore_elements: List[str] = field(default_factory=list)
+    # Parser profile: "fast", "faithful" or "huge"; None selects "faithful" if
+    # preserve_formatting is set, otherwise "fast"
+    parser_profile: Optional[str] = None
+    # Compare Merkle digests before recursing and skip identical subtrees
+    skip_identical_subtrees: bool = True
+    # Order-insensitive strategies (MERGE_ALL): largest input as base, the others in cost-based
+    # order (see core.ordering); other strategies keep the given order
+    optimize_order: bool = False
+    # Threads serializing top-level packages on save: 1 = sequential, 0 = one per CPU
+    save_workers: int = 1
+    # Output compression ("gzip", "xz", "zstd"); None selects it from the output file extension
+    output_compression: Optional[str] = None
+    # gzip compresslevel / xz preset / zstd level; None uses the compression's default
+    compression_level: Optional[int] = None
+    # Glob filters for members of ZIP/TAR inputs; an empty include list selects *.arxml
+    archive_include: List[str] = field(default_factory=list)
+    archive_exclude: List[str] = field(default_factory=list)
+    # Threads loading archive members: 1 = sequential, 0 = one per CPU
+    load_workers: int = 1
+    # Opt-in content-addressed result cache (see core.cache) and its size limit in bytes
+    cache_dir: Optional[str] = None
+    cache_max_size: int = 1 << 30
+    # Opt-in per-file cache of parsed models (see core.cache.ModelCache) and its size limit
+    model_cache_dir: Optional[str] = None
+    model_cache_max_size: int = 1 << 30
+    # Load, merge and release one input at a time instead of holding all inputs in memory
+    low_memory: bool = False
+    # Suspend the cyclic garbage collector while merging (one collection per released input)
+    gc_tuning: bool = False
+    # Directory for the spill files of out-of-core merges (None: system temp directory)
+    spill_dir: Optional[str] = None
+    # Processes merging matched top-level packages of a file concurrently: 1 = inline, 0 = one per CPU
+    package_workers: int = 1
+    # Packages with fewer elements (source side) are merged inline, the transfer would cost more
+    package_pool_threshold: int = 20000
+    
+    def get_parser_options(self) -> Dict[str, bool]:
+        """Returns the lxml parser options for the configured profile and preserve flags"""
+        return resolve_parser_options(
+            self.parser_profile, self.preserve_comments, self.preserve_formatting
+        )
 
 
 @dataclass
@@ -41,6 +97,21 @@ class MergeConflict:
     source_files: List[str]
     resolution_strategy: Optional[ConflictResolutionStrategy] = None
     resolved_value: Optional[Any] = None
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Dict form for JSON (merge cache, merge manifest)"""
+        data = asdict(self)
+        if self.resolution_strategy is not None:
+            data["resolution_strategy"] = self.resolution_strategy.value
+        return data
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'MergeConflict':
+        """Restores a conflict from to_dict's output"""
+        data = dict(data)
+        strategy = data.get("resolution_strategy")
+        data["resolution_strategy"] = ConflictResolutionStrategy(strategy) if strategy else None
+        return cls(**data)
 
 
 @dataclass
@@ -52,37 +123,163 @@ class MergeStatistics:
     conflicts_resolved: int = 0
     processing_time: float = 0.0
     schema_version: Optional[str] = None
+    # Pruned subtrees per ignored tag: {"ADMIN-DATA": {"nodes": ..., "bytes": ...}}
+    ignored_elements: Dict[str, Dict[str, int]] = field(default_factory=dict)
+    # Identical subtrees skipped via Merkle digest comparison
+    subtrees_skipped: int = 0
+    nodes_skipped: int = 0
+    # Result served from the merge cache without parsing the inputs
+    cache_hit: bool = False
+    # Inputs loaded from the parsed-model cache instead of being parsed
+    models_from_cache: int = 0
+    # Top-level packages copied from the previous output by an incremental merge
+    packages_reused: int = 0
+    # Peak resident set size of the process during the merge in bytes (None if unknown)
+    peak_rss: Optional[int] = None
+    # Size of the largest input in bytes (as stored on disk)
+    largest_input: int = 0
+
+
+# Binärformat des Modell-Caches: Magic, Länge + marshal-Metadaten, zlib-komprimiertes XML
+_MODEL_MAGIC = b"ARXMLMC\x01"
+_MODEL_HEADER = struct.Struct(">I")
 
 
 class MergeResult:
     """Result of a merge process"""
     
     def __init__(self, 
-                 merged_tree: etree._Element,
+                 merged_tree: Optional[etree._Element],
                  config: MergeConfig,
                  statistics: MergeStatistics,
-                 conflicts: List[MergeConflict] = None):
-        self.merged_tree = merged_tree
+                 conflicts: List[MergeConflict] = None,
+                 cached_output: Optional[Path] = None):
+        self._merged_tree = merged_tree
         self.config = config
         self.statistics = statistics
         self.conflicts = conflicts or []
+        # Serialized output of a merge cache hit or an incremental merge; the tree is parsed
+        # from it on demand
+        self.cached_output = cached_output
+    
+    @property
+    def merged_tree(self) -> etree._Element:
+        """Root of the merged model; cache hits parse their stored output on first access"""
+        return self.load()
+    
+    def load(self) -> etree._Element:
+        """Parses the stored output of a cache hit or incremental merge if not done yet"""
+        if self._merged_tree is None and self.cached_output is not None:
+            with open_input(self.cached_output) as stream:
+                tree = etree.parse(stream, get_parser(**self.config.get_parser_options()))
+            self._merged_tree = tree.getroot()
+        return self._merged_tree
         
-    def save(self, output_path: Union[str, Path], pretty_print: bool = True) -> None:
-        """Speichert das Merge-Ergebnis in eine Datei"""
-        output_path = Path(output_path)
+    def save(self, output: Union[str, Path, IO[bytes]], pretty_print: bool = True,
+             workers: Optional[int] = None, progress_callback: Optional[ProgressCallback] = None,
+             cancel_token: Optional[CancellationToken] = None) -> int:
+        """
+        Speichert das Merge-Ergebnis in eine Datei oder einen binären Stream
         
-        # Stelle sicher, dass das Verzeichnis existiert
-        output_path.parent.mkdir(parents=True, exist_ok=True)
+        The tree is written package by package (see utils.serialization), so any file-like
+        object works: files, pipes, sys.stdout.buffer or compressed streams. The output is
+        identical to ElementTree.write, also when packages are serialized in parallel.
+        Paths ending in .gz/.xz/.zst (or config.output_compression) are compressed on the fly.
+        Trees loaded without whitespace nodes (fast/huge profile) are re-indented by
+        pretty_print, faithful trees keep their original formatting.
         
-        # Schreibe XML-Datei
-        tree = etree.ElementTree(self.merged_tree)
-        tree.write(
-            str(output_path),
-            encoding=self.config.output_encoding,
-            xml_declaration=True,
-            pretty_print=pretty_print
+        Args:
+            output: Output path or binary file-like object
+            pretty_print: Indent the output
+            workers: Serialization threads, defaults to config.save_workers
+            progress_callback: Receives a "save" MergeProgress after every top-level package
+            cancel_token: Checked between packages; a cancelled save removes the output file
+            
+        Returns:
+            Number of (uncompressed) bytes written
+        """
+        compression = self.config.output_compression
+        if not hasattr(output, "write"):
+            output = Path(output)
+            # Stelle sicher, dass das Verzeichnis existiert
+            output.parent.mkdir(parents=True, exist_ok=True)
+            if compression is None:
+                compression = compression_from_suffix(output)
+        
+        if workers is None:
+            workers = self.config.save_workers
+        on_package = None
+        if progress_callback is not None or cancel_token is not None:
+            tracker = None
+            if progress_callback is not None:
+                # Cache-Treffer werden kopiert bzw. erst beim Schreiben geparst: Anzahl unbekannt
+                total = None
+                if self._merged_tree is not None:
+                    packages = next((child for child in self._merged_tree
+                                     if get_local_name(child) == "AR-PACKAGES"), [])
+                    total = sum(1 for child in packages if get_local_name(child) == "AR-PACKAGE")
+                tracker = ProgressTracker(progress_callback, "save", total)
+            
+            def on_package(written: int) -> None:
+                if cancel_token is not None:
+                    cancel_token.raise_if_cancelled()
+                if tracker is not None:
+                    tracker.packages += 1
+                    tracker.report(tracker.packages, written)
+        
+        try:
+            if compression is None:
+                return self._write(output, pretty_print, workers, on_package)
+            
+            try:
+                check_compression(compression, self.config.compression_level)
+            except ValueError as e:
+                raise ArxmlMergerException(str(e)) from e
+            with open_output(output, compression, self.config.compression_level) as stream:
+                return self._write(stream, pretty_print, workers, on_package)
+        except MergeCancelledError:
+            if isinstance(output, Path):
+                output.unlink()  # keine halb geschriebene Ausgabe zurücklassen
+            raise
+    
+    async def save_async(self, output: Union[str, Path, IO[bytes]], pretty_print: bool = True,
+                         workers: Optional[int] = None, progress: Optional[MergeProgressStream] = None,
+                         executor: Optional[Executor] = None) -> int:
+        """
+        Saves the result in an executor without blocking the event loop (see save)
+        
+        Cancelling the awaiting task stops the serialization at the next package boundary.
+        
+        Args:
+            output: Output path or binary file-like object
+            pretty_print: Indent the output
+            workers: Serialization threads, defaults to config.save_workers
+            progress: Async iterator receiving the "save" progress events
+            executor: Executor to run in, defaults to the event loop's
+            
+        Returns:
+            Number of (uncompressed) bytes written
+        """
+        return await run_in_executor(
+            lambda callback, token: self.save(output, pretty_print, workers, callback, token),
+            progress, executor
         )
     
+    def _write(self, output: Union[Path, IO[bytes]], pretty_print: bool, workers: Optional[int],
+               on_package: Optional[Callable[[int], None]] = None) -> int:
+        if (self._merged_tree is None and self.cached_output is not None and pretty_print
+                and detect_compression(self.cached_output) is None):
+            # Cache-Treffer: die gespeicherte (pretty-printed) Ausgabe unverändert kopieren
+            if hasattr(output, "write"):
+                with open(self.cached_output, "rb") as source:
+                    shutil.copyfileobj(source, output)
+            elif output.resolve() != self.cached_output.resolve():
+                shutil.copyfile(self.cached_output, output)
+            return self.cached_output.stat().st_size
+        
+        return write_tree(self.merged_tree, output, encoding=self.config.output_encoding,
+                          pretty_print=pretty_print, workers=workers, on_package=on_package)
+    
     def to_string(self, pretty_print: bool = True) -> str:
         """Gibt das Merge-Ergebnis als String zurück"""
         return etree.tostring(
@@ -108,25 +305,133 @@ class ArxmlFile:
     schema_version: Optional[str] = None
     namespace_map: Dict[str, str] = field(default_factory=dict)
     split_keys: Dict[str, List[str]] = field(default_factory=dict)
+    ignored_elements: Dict[str, Dict[str, int]] = field(default_factory=dict)
+    # Merkle-Digest-Cache, wird beim Mergen bei Bedarf gefüllt; None = Überspringen deaktiviert
+    subtree_digests: Optional[Dict[etree._Element, SubtreeDigest]] = field(default=None, repr=False)
+    # Splitable elements without split-key values; None = not yet checked
+    split_key_errors: Optional[List[str]] = None
     
     @classmethod
-    def from_file(cls, file_path: Union[str, Path]) -> 'ArxmlFile':
-        """Lädt eine ARXML-Datei"""
+    def from_file(cls, file_path: Union[str, Path], config: Optional[MergeConfig] = None) -> 'ArxmlFile':
+        """
+        Lädt eine ARXML-Datei
+        
+        gzip-, xz- and zstd-compressed files are recognized by their magic bytes and
+        decompressed while parsing.
+        
+        Args:
+            file_path: Pfad zur ARXML-Datei
+            config: Optionale Merge-Konfiguration; ignore_elements werden beim Parsen entfernt,
+                    Merkle-Digests werden bei skip_identical_subtrees berechnet
+        """
         file_path = Path(file_path)
         
         if not file_path.exists():
             raise FileNotFoundError(f"ARXML-Datei nicht gefunden: {file_path}")
         
-        # Parse XML
-        parser = etree.XMLParser(remove_blank_text=False, resolve_entities=False)
-        tree = etree.parse(str(file_path), parser)
-        root = tree.getroot()
+        # Unkomprimierte Dateien liest libxml2 direkt, komprimierte werden als Stream entpackt
+        if detect_compression(file_path) is None:
+            root, ignored_elements = cls._parse(str(file_path), config)
+        else:
+            with open_input(file_path) as stream:
+                root, ignored_elements = cls._parse(stream, config)
+        
+        return cls._from_root(file_path, root, ignored_elements, config)
+    
+    @classmethod
+    def from_stream(cls, stream: IO[bytes], name: Union[str, Path],
+                    config: Optional[MergeConfig] = None) -> 'ArxmlFile':
+        """
+        Lädt eine ARXML-Datei aus einem binären Stream (z.B. einem Archiv-Member)
+        
+        Args:
+            stream: Binary stream, read incrementally by the parser
+            name: Path reported as file_path
+            config: Optionale Merge-Konfiguration (wie bei from_file)
+        """
+        root, ignored_elements = cls._parse(stream, config)
+        return cls._from_root(Path(name), root, ignored_elements, config)
+    
+    @classmethod
+    def from_bytes(cls, data: bytes, file_path: Union[str, Path],
+                   config: Optional[MergeConfig] = None) -> 'ArxmlFile':
+        """
+        Lädt eine mit to_bytes gespeicherte Datei (Modell-Cache)
+        
+        The stored document is parsed again (an lxml tree cannot be restored without
+        parsing); only decompressing the original input, pruning ignored elements, schema
+        detection and the split-key check are skipped.
         
+        Args:
+            data: Output of to_bytes
+            file_path: Path reported as file_path
+            config: Merge-Konfiguration, mit der die Datei gespeichert wurde
+            
+        Raises:
+            ValueError: If data is not in the model cache format
+        """
+        if not data.startswith(_MODEL_MAGIC):
+            raise ValueError("Not an ARXML model cache entry")
+        offset = len(_MODEL_MAGIC) + _MODEL_HEADER.size
+        try:
+            (meta_size,) = _MODEL_HEADER.unpack_from(data, len(_MODEL_MAGIC))
+            meta = marshal.loads(data[offset:offset + meta_size])
+            document = zlib.decompress(data[offset + meta_size:])
+        except (struct.error, EOFError, TypeError, zlib.error) as e:
+            raise ValueError(f"Corrupt ARXML model cache entry: {e}") from e
+        
+        parser_options = config.get_parser_options() if config is not None else resolve_parser_options()
+        root = etree.fromstring(document, get_parser(**parser_options))
+        arxml_file = cls._from_root(Path(file_path), root, meta["ignored_elements"], config)
+        arxml_file.schema_version = meta["schema_version"]
+        arxml_file.split_key_errors = meta["split_key_errors"]
+        return arxml_file
+    
+    def to_bytes(self, compression_level: int = 1) -> bytes:
+        """
+        Serialisiert das geparste Modell für den Modell-Cache
+        
+        Stores the (pruned) document as zlib-compressed XML with schema version, ignored
+        element statistics and split-key check result; from_bytes restores it.
+        
+        Args:
+            compression_level: zlib level of the document
+        """
+        meta = marshal.dumps({
+            "schema_version": self.schema_version,
+            "ignored_elements": self.ignored_elements,
+            "split_key_errors": self.split_key_errors,
+        })
+        document = etree.tostring(self.root_element.getroottree(), encoding="utf-8", xml_declaration=True)
+        return b"".join((_MODEL_MAGIC, _MODEL_HEADER.pack(len(meta)), meta,
+                         zlib.compress(document, compression_level)))
+    
+    @classmethod
+    def _from_root(cls, file_path: Path, root: etree._Element,
+                   ignored_elements: Dict[str, Dict[str, int]],
+                   config: Optional[MergeConfig]) -> 'ArxmlFile':
         # Extrahiere Namespace-Map
         namespace_map = dict(root.nsmap)
         
+        subtree_digests = {} if config is not None and config.skip_identical_subtrees else None
+        
         return cls(
             file_path=file_path,
             root_element=root,
-            namespace_map=namespace_map
+            namespace_map=namespace_map,
+            ignored_elements=ignored_elements,
+            subtree_digests=subtree_digests
         )
+    
+    @staticmethod
+    def _parse(source: Union[str, IO[bytes]],
+               config: Optional[MergeConfig]) -> Tuple[etree._Element, Dict[str, Dict[str, int]]]:
+        """Parses a file name or binary stream, returns the root and the pruned ignored elements"""
+        # Ohne Konfiguration wird die Datei unverändert (faithful) geladen
+        parser_options = config.get_parser_options() if config is not None else resolve_parser_options()
+        if config is not None and config.ignore_elements:
+            # Ignorierte Teilbäume schon während des Parsens verwerfen
+            return parse_pruned(source, config.ignore_elements, **parser_options)
+        
+        tree = etree.parse(source, get_parser(**parser_options))
+        return tree.getroot(), {}
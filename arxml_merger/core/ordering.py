@@ -0,0 +1,89 @@
+"""
+Cost-based input order for order-insensitive merges
+
+With MERGE_ALL the merged model holds the union of all inputs whatever their order, but
+the cost does not: the base is deep-copied as a whole, every later input is matched
+element by element against the growing target and only its new packages are copied.
+Copying is much cheaper than matching, so the planner
+
+- takes the largest input as the base instead of the first one, and
+- merges next the input that adds the most elements in packages not yet in the target,
+  so large new content is copied while the overlap of the remaining inputs is matched.
+
+The statistics are cheap: element counts per top-level package split key, or only the
+file size where the inputs are not loaded yet (low-memory merge).
+"""
+
+from typing import Dict, List
+from dataclasses import dataclass, field
+import heapq
+
+from lxml import etree
+
+from .models import ConflictResolutionStrategy
+from ..schema.autosar_schema import SplitKeyExtractor
+from ..utils.xml_utils import get_local_name
+
+
+# Strategien, bei denen die Reihenfolge nur die Anordnung der Elemente bestimmt (und welcher
+# Wert eines gemeldeten Attributkonflikts bleibt), nicht welche Elemente gemergt werden
+ORDER_INSENSITIVE_STRATEGIES = frozenset({ConflictResolutionStrategy.MERGE_ALL})
+
+
+@dataclass
+class InputStatistics:
+    """Size of one input and the element counts of its top-level packages"""
+    size: int
+    packages: Dict[tuple, int] = field(default_factory=dict)
+
+
+def collect_statistics(root: etree._Element, extract_key: SplitKeyExtractor) -> InputStatistics:
+    """Counts the elements of a loaded input per top-level package split key"""
+    statistics = InputStatistics(size=0)
+    for child in root:
+        if get_local_name(child) != "AR-PACKAGES":
+            continue
+        for package in child:
+            if get_local_name(package) != "AR-PACKAGE":
+                continue
+            count = sum(1 for _ in package.iter())
+            key = extract_key(package)
+            statistics.packages[key] = statistics.packages.get(key, 0) + count
+            statistics.size += count
+    return statistics
+
+
+def plan_merge_order(statistics: List[InputStatistics]) -> List[int]:
+    """
+    Orders the inputs: the largest as base, then greedily by new package elements
+
+    Args:
+        statistics: Statistics of the inputs in their given order
+
+    Returns:
+        Indexes of the inputs in merge order; ties keep the given order
+    """
+    if not statistics:
+        return []
+
+    base = max(range(len(statistics)), key=lambda index: (statistics[index].size, -index))
+    order = [base]
+    present = set(statistics[base].packages)
+
+    def gain(index: int) -> int:
+        return sum(count for key, count in statistics[index].packages.items() if key not in present)
+
+    # Lazy greedy: der Gewinn einer Datei sinkt nur, wenn der Zielbaum wächst; ein
+    # veralteter Eintrag wird neu bewertet und nur genommen, wenn er vorne bleibt
+    heap = [(-gain(index), -statistics[index].size, index)
+            for index in range(len(statistics)) if index != base]
+    heapq.heapify(heap)
+    while heap:
+        _, size, index = heapq.heappop(heap)
+        entry = (-gain(index), size, index)
+        if heap and entry > heap[0]:
+            heapq.heappush(heap, entry)
+            continue
+        order.append(index)
+        present.update(statistics[index].packages)
+    return order
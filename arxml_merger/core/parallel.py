@@ -0,0 +1,136 @@
+"""
+Process pool merging matched top-level packages of one file pair concurrently
+
+Top-level packages are independent of each other, so the matched pairs of a source file
+can be merged in worker processes: both packages are sent serialized, merged there with
+the regular element merge and the merged package is sent back. The parent splices the
+merged packages back in place and keeps the conflicts in source order, so the result is
+the same as an inline merge. Conflict paths are made absolute with the package's path
+at submit time, which is the path the inline merge would have seen.
+
+Small packages cost more to transfer than to merge; packages below
+MergeConfig.package_pool_threshold elements are merged inline, as are small packages
+merged into much larger ones (the target travels to the worker and back). The pool belongs
+to its ArxmlMerger and is shared by all its merges until ArxmlMerger.close(). The workers
+are started with "spawn", so scripts using the pool need the usual if __name__ == "__main__"
+guard.
+"""
+
+from typing import List, Tuple
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import replace
+import multiprocessing
+
+from lxml import etree
+
+from .models import MergeConfig, MergeConflict
+from .exceptions import ArxmlMergerException
+from ..utils.parsing import get_parser
+from ..utils.xml_utils import compute_subtree_digests
+
+
+# Merger des Worker-Prozesses, siehe _init_worker
+_worker_merger = None
+
+# Das Ziel-Package wird hin und zurück übertragen, die Merge-Arbeit wächst mit der Quelle
+_MAX_TARGET_RATIO = 4
+
+
+def _init_worker(config: MergeConfig) -> None:
+    global _worker_merger
+    from .merger import ArxmlMerger
+    _worker_merger = ArxmlMerger(replace(config, package_workers=1, verbose_merge=False))
+
+
+def _parse_package(data: bytes) -> etree._Element:
+    # Bereits mit den Optionen der Konfiguration geparst, siehe ExternalMerger._read_fragment
+    return etree.fromstring(data, get_parser(remove_blank_text=False, resolve_entities=False, huge_tree=True))
+
+
+def _merge_in_worker(target_data: bytes, source_data: bytes, schema_version: str,
+                     source_file_path: str) -> Tuple[bytes, List[MergeConflict], int, int]:
+    """Merges one package pair; conflict paths are relative to the package"""
+    merger = _worker_merger
+    target, source = _parse_package(target_data), _parse_package(source_data)
+    with merger._merge_context() as context:
+        context.source_digests = compute_subtree_digests(source) if context.skip_identical else None
+        conflicts = merger._merge_elements(target, source, merger._get_schema_handler(schema_version),
+                                           source_file_path)
+    return (etree.tostring(target, with_tail=False), conflicts,
+            context.subtrees_skipped, context.nodes_skipped)
+
+
+def _count_elements(element: etree._Element, limit: int) -> int:
+    """Number of elements of a subtree, counted up to limit"""
+    count = 0
+    for _ in element.iter():
+        count += 1
+        if count >= limit:
+            break
+    return count
+
+
+class PackageMergePool:
+    """Worker processes merging matched top-level packages; safe to share between threads"""
+
+    def __init__(self, config: MergeConfig, workers: int):
+        """
+        Args:
+            config: Merge configuration of the workers
+            workers: Number of worker processes
+        """
+        self.threshold = config.package_pool_threshold
+        # spawn: kein fork eines Prozesses mit laufenden Threads (Server, Watch-Modus)
+        self.executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                            initializer=_init_worker, initargs=(config,))
+
+    def accepts(self, target_package: etree._Element, source_package: etree._Element) -> bool:
+        """
+        Whether a package pair is worth the transfer: the source package has at least threshold
+        elements and the target package at most _MAX_TARGET_RATIO times as many
+        """
+        source_count = sum(1 for _ in source_package.iter())
+        if source_count < self.threshold:
+            return False
+        limit = _MAX_TARGET_RATIO * source_count
+        return _count_elements(target_package, limit + 1) <= limit
+
+    def submit(self, target_package: etree._Element, source_package: etree._Element, schema_version: str,
+               source_file_path: str) -> Future:
+        """Sends a matched package pair to a worker"""
+        return self.executor.submit(_merge_in_worker, etree.tostring(target_package, with_tail=False),
+                                    etree.tostring(source_package, with_tail=False), schema_version,
+                                    source_file_path)
+
+    def splice(self, future: Future, target_package: etree._Element,
+               package_path: str) -> Tuple[etree._Element, List[MergeConflict], int, int]:
+        """
+        Replaces the target package by the worker's merged package
+
+        Args:
+            future: Result of submit
+            target_package: The package the future was submitted for
+            package_path: Element path of target_package at submit time
+
+        Returns:
+            (merged package, conflicts with absolute paths, subtrees skipped, nodes skipped)
+        """
+        try:
+            data, conflicts, subtrees_skipped, nodes_skipped = future.result()
+        except BrokenProcessPool as e:
+            raise ArxmlMergerException(f"Package worker process failed: {e}") from e
+        package = _parse_package(data)
+        package.tail = target_package.tail
+        target_package.clear()  # Leeren vor dem Umhängen, siehe ExternalMerger._spill_file
+        target_package.getparent().replace(target_package, package)
+        conflicts = [
+            replace(conflict, element_path=package_path + ("" if conflict.element_path == "/"
+                                                           else conflict.element_path))
+            for conflict in conflicts
+        ]
+        return package, conflicts, subtrees_skipped, nodes_skipped
+
+    def close(self) -> None:
+        """Stops the workers after the submitted packages are merged"""
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,352 @@
+"""
+Dry-run merge planner
+
+Predicts what a merge would do (new, merged, replaced and kept elements, conflicts)
+per AR-PACKAGE without deep copies and without building a merged tree. The inputs
+are compared through their split-key indexes; the evolving merge target is modelled
+by lightweight plan nodes that reference the input elements.
+"""
+
+from typing import TYPE_CHECKING, Dict, List, Optional
+from dataclasses import dataclass, field
+import time
+
+from lxml import etree
+
+from .models import ArxmlFile, ConflictResolutionStrategy
+from ..schema.autosar_schema import AutosarSchemaHandler
+from ..utils.xml_utils import (SubtreeDigest, compute_subtree_digest, combine_digest, digest_part,
+                               get_local_name, leaf_digest, leaf_part, node_key)
+
+if TYPE_CHECKING:
+    from .merger import ArxmlMerger
+
+
+@dataclass
+class PackagePlan:
+    """Planned changes of a single AR-PACKAGE (nested packages get their own entry)"""
+    path: str
+    is_new: bool = False
+    new_elements: List[str] = field(default_factory=list)
+    replaced_elements: List[str] = field(default_factory=list)
+    conflicts: List[str] = field(default_factory=list)
+    merged_elements: int = 0
+    kept_elements: int = 0
+    identical_subtrees: int = 0
+
+    def has_changes(self) -> bool:
+        """Checks if the merge would change anything in this package"""
+        return bool(self.is_new or self.new_elements or self.replaced_elements or self.conflicts)
+
+
+@dataclass
+class MergePlan:
+    """Result of a dry-run merge"""
+    files: List[str]
+    conflict_resolution: ConflictResolutionStrategy
+    packages: Dict[str, PackagePlan] = field(default_factory=dict)
+    planning_time: float = 0.0
+
+    @property
+    def new_elements(self) -> int:
+        return sum(len(p.new_elements) for p in self.packages.values())
+
+    @property
+    def merged_elements(self) -> int:
+        return sum(p.merged_elements for p in self.packages.values())
+
+    @property
+    def replaced_elements(self) -> int:
+        return sum(len(p.replaced_elements) for p in self.packages.values())
+
+    @property
+    def conflicts(self) -> int:
+        return sum(len(p.conflicts) for p in self.packages.values())
+
+    def format_report(self, max_paths: int = 10) -> str:
+        """Formats a compact plan report with counts per package and the affected paths"""
+        lines = [
+            f"Merge plan for {len(self.files)} files ({self.conflict_resolution.value}, "
+            f"{self.planning_time:.2f}s)",
+            f"  New elements: {self.new_elements}, merged: {self.merged_elements}, "
+            f"replaced: {self.replaced_elements}, conflicts: {self.conflicts}",
+        ]
+        for package in self.packages.values():
+            if not package.has_changes():
+                continue
+            status = " (new package)" if package.is_new else ""
+            lines.append(
+                f"  {package.path}{status}: {len(package.new_elements)} new, "
+                f"{package.merged_elements} merged, {len(package.replaced_elements)} replaced, "
+                f"{package.kept_elements} kept, {len(package.conflicts)} conflicts, "
+                f"{package.identical_subtrees} identical"
+            )
+            for marker, paths in (("+", package.new_elements), ("~", package.replaced_elements),
+                                  ("!", package.conflicts)):
+                for path in paths[:max_paths]:
+                    lines.append(f"      {marker} {path}")
+                if len(paths) > max_paths:
+                    lines.append(f"      {marker} ... {len(paths) - max_paths} more")
+        return "\n".join(lines)
+
+
+class _PlanNode:
+    """Element of the virtual merge target: an input element plus the planned changes"""
+
+    __slots__ = ("element", "tag", "digests", "attrib", "children", "modified", "digest")
+
+    def __init__(self, element: etree._Element, digests: Optional[Dict[etree._Element, SubtreeDigest]]):
+        self.element = element
+        self.tag = get_local_name(element)  # None for comments and processing instructions
+        self.digests = digests
+        self.attrib: Optional[Dict[str, str]] = None   # copied on first change
+        self.children: Optional[List["_PlanNode"]] = None  # built on first access
+        self.modified = False
+        self.digest: Optional[SubtreeDigest] = None  # cached digest of the planned state
+
+    def get_children(self) -> List["_PlanNode"]:
+        if self.children is None:
+            self.children = [_PlanNode(child, self.digests) for child in self.element]
+        return self.children
+
+    def invalidate(self) -> None:
+        """Marks the node as changed by the plan"""
+        self.modified = True
+        self.digest = None
+
+    def get_attrib(self):
+        return self.attrib if self.attrib is not None else self.element.attrib
+
+    def set_attrib(self, name: str, value: str) -> None:
+        if self.attrib is None:
+            self.attrib = dict(self.element.attrib)
+        self.attrib[name] = value
+
+    def get_digest(self) -> Optional[SubtreeDigest]:
+        """Merkle digest of the planned subtree state, None without input digests"""
+        if self.digests is None:
+            return None
+        if not self.modified:
+            return compute_subtree_digest(self.element, self.digests)
+        if self.digest is None:
+            children = self.get_children()
+            key = node_key(self.element, self.get_attrib())
+            if not children:
+                self.digest = (leaf_digest(key), 1)
+                return self.digest
+            parts = []
+            count = 1
+            for child in children:
+                if child.modified or len(child.element):
+                    child_digest = child.get_digest()
+                    if child_digest is None:
+                        return None
+                    if child.children == []:
+                        parts.append(leaf_part(node_key(child.element, child.get_attrib())))
+                    else:
+                        parts.append(digest_part(child_digest[0]))
+                    count += child_digest[1]
+                else:
+                    parts.append(leaf_part(node_key(child.element)))
+                    count += 1
+            self.digest = (combine_digest(key, parts), count)
+        return self.digest
+
+
+def _child_path(parent_path: str, element: etree._Element) -> str:
+    """AUTOSAR-style path segment: SHORT-NAME if present, tag name otherwise"""
+    for child in element:
+        if get_local_name(child) == "SHORT-NAME":
+            if child.text and child.text.strip():
+                return f"{parent_path}/{child.text.strip()}"
+            break
+    return f"{parent_path}/{get_local_name(element)}"
+
+
+class MergePlanner:
+    """Plans a merge with the matching rules and configuration of an ArxmlMerger"""
+
+    def __init__(self, merger: "ArxmlMerger", schema_handler: AutosarSchemaHandler):
+        self.merger = merger
+        self.config = merger.config
+        self.schema_handler = schema_handler
+        self.skip_identical = (self.config.skip_identical_subtrees and
+                               self.config.conflict_resolution != ConflictResolutionStrategy.FAIL_ON_CONFLICT)
+        self.plan: Optional[MergePlan] = None
+        self._source_digests: Optional[Dict[etree._Element, SubtreeDigest]] = None
+        self._unique_matches: Dict[etree._Element, bool] = {}
+
+    def plan_files(self, files: List[ArxmlFile]) -> MergePlan:
+        """Plans the merge of the loaded files (the first file is the base)"""
+        start_time = time.time()
+        self.plan = MergePlan(files=[str(f.file_path) for f in files],
+                              conflict_resolution=self.config.conflict_resolution)
+
+        base_packages = self._find_packages(files[0].root_element)
+        if base_packages is None:
+            return self.plan
+        target = _PlanNode(base_packages, files[0].subtree_digests)
+
+        extract_key = self.merger._get_key_extractor(self.schema_handler, "AR-PACKAGE")
+        target_index = self._build_key_index(target, "AR-PACKAGE")
+        for package_node in target_index.values():
+            self._get_package(_child_path("", package_node.element))
+
+        for source_file in files[1:]:
+            source_packages = self._find_packages(source_file.root_element)
+            if source_packages is None:
+                continue
+            self._source_digests = source_file.subtree_digests
+            self._unique_matches = {}
+
+            for source_package in source_packages:
+                if get_local_name(source_package) != "AR-PACKAGE":
+                    continue
+                key = extract_key(source_package)
+                path = _child_path("", source_package)
+                matching = target_index.get(key)
+                if matching is None:
+                    target_index[key] = self._add_child(target, source_package, source_file.subtree_digests)
+                    self._get_package(path).is_new = True
+                else:
+                    self._plan_elements(matching, source_package, path, self._get_package(path))
+
+        self.plan.planning_time = time.time() - start_time
+        return self.plan
+
+    @staticmethod
+    def _find_packages(root: etree._Element) -> Optional[etree._Element]:
+        for child in root:
+            if get_local_name(child) == "AR-PACKAGES":
+                return child
+        return None
+
+    def _get_package(self, path: str) -> PackagePlan:
+        package = self.plan.packages.get(path)
+        if package is None:
+            package = self.plan.packages[path] = PackagePlan(path=path)
+        return package
+
+    def _build_key_index(self, node: _PlanNode, tag: str) -> Dict[tuple, _PlanNode]:
+        extract_key = self.merger._get_key_extractor(self.schema_handler, tag)
+        index: Dict[tuple, _PlanNode] = {}
+        for child in node.get_children():
+            if child.tag == tag:
+                index.setdefault(extract_key(child.element), child)
+        return index
+
+    @staticmethod
+    def _add_child(node: _PlanNode, source: etree._Element,
+                   digests: Optional[Dict[etree._Element, SubtreeDigest]]) -> _PlanNode:
+        child = _PlanNode(source, digests)
+        node.get_children().append(child)
+        node.invalidate()
+        return child
+
+    def _is_identical(self, node: _PlanNode, source: etree._Element, merged: bool = False) -> bool:
+        if self._source_digests is None:
+            return False
+        if node.get_digest() != compute_subtree_digest(source, self._source_digests):
+            return False
+        return not merged or self.merger._has_unique_matches(self.schema_handler, source, self._unique_matches)
+
+    def _plan_elements(self, node: _PlanNode, source: etree._Element,
+                       path: str, package: PackagePlan) -> None:
+        """Plans the merge of source into node, mirrors ArxmlMerger._merge_elements"""
+        if self.skip_identical and self._is_identical(node, source, merged=True):
+            package.identical_subtrees += 1
+            return
+        node.invalidate()
+
+        attrib = node.get_attrib()
+        for name, value in source.attrib.items():
+            current = attrib.get(name)
+            if current is None:
+                node.set_attrib(name, value)
+            elif current != value:
+                package.conflicts.append(f"{path}@{name}")
+                if self.config.conflict_resolution == ConflictResolutionStrategy.LAST_WINS:
+                    node.set_attrib(name, value)
+
+        if self.schema_handler.is_splitable_element(node.tag):
+            self._plan_splitable_children(node, source, path, package)
+        else:
+            self._plan_standard_children(node, source, path, package)
+
+    def _plan_splitable_children(self, node: _PlanNode, source: etree._Element,
+                                 path: str, package: PackagePlan) -> None:
+        """Mirrors ArxmlMerger._merge_splitable_children"""
+        source_children_by_tag: Dict[str, List[etree._Element]] = {}
+        for child in source:
+            tag = get_local_name(child)
+            if tag is not None:
+                source_children_by_tag.setdefault(tag, []).append(child)
+
+        strategy = self.config.conflict_resolution
+        for tag, source_children in source_children_by_tag.items():
+            extract_key = self.merger._get_key_extractor(self.schema_handler, tag)
+            target_index = self._build_key_index(node, tag)
+            splitable = self.schema_handler.is_splitable_element(tag)
+
+            for source_child in source_children:
+                matching = target_index.get(extract_key(source_child))
+                child_path = _child_path(path, source_child)
+                if matching is None:
+                    self._add_child(node, source_child, self._source_digests)
+                    package.new_elements.append(child_path)
+                elif splitable:
+                    package.merged_elements += 1
+                    self._plan_elements(matching, source_child, child_path,
+                                        self._child_package(tag, child_path, package))
+                elif strategy == ConflictResolutionStrategy.LAST_WINS:
+                    if not (self.skip_identical and self._is_identical(matching, source_child)):
+                        package.replaced_elements.append(child_path)
+                        self._replace(node, matching, source_child)
+                    else:
+                        package.identical_subtrees += 1
+                elif strategy == ConflictResolutionStrategy.FIRST_WINS:
+                    package.kept_elements += 1
+                else:
+                    self._plan_elements(matching, source_child, child_path, package)
+
+    def _plan_standard_children(self, node: _PlanNode, source: etree._Element,
+                                path: str, package: PackagePlan) -> None:
+        """Mirrors ArxmlMerger._merge_standard_children"""
+        key_indexes: Dict[str, Dict[tuple, _PlanNode]] = {}
+        for source_child in source:
+            tag = get_local_name(source_child)
+            if tag is None:
+                continue
+
+            key = None
+            if self.merger._is_keyed_element(self.schema_handler, tag):
+                key_index = key_indexes.get(tag)
+                if key_index is None:
+                    key_index = key_indexes[tag] = self._build_key_index(node, tag)
+                key = self.merger._get_key_extractor(self.schema_handler, tag)(source_child)
+                existing = key_index.get(key)
+            else:
+                existing = next((c for c in node.get_children() if c.tag == tag), None)
+
+            child_path = _child_path(path, source_child)
+            if existing is None:
+                new_node = self._add_child(node, source_child, self._source_digests)
+                if key is not None:
+                    key_indexes[tag][key] = new_node
+                package.new_elements.append(child_path)
+            elif self.config.conflict_resolution == ConflictResolutionStrategy.FAIL_ON_CONFLICT:
+                package.conflicts.append(child_path)
+            else:
+                self._plan_elements(existing, source_child, child_path,
+                                    self._child_package(tag, child_path, package))
+
+    def _child_package(self, tag: str, child_path: str, package: PackagePlan) -> PackagePlan:
+        """Nested AR-PACKAGEs are reported as packages of their own"""
+        if tag == "AR-PACKAGE":
+            return self._get_package(child_path)
+        return package
+
+    def _replace(self, node: _PlanNode, old: _PlanNode, source: etree._Element) -> None:
+        children = node.get_children()
+        children[children.index(old)] = _PlanNode(source, self._source_digests)
+        node.invalidate()
@@ -0,0 +1,93 @@
+"""
+Progress events and cooperative cancellation of merges
+
+The merge engine creates progress events only when a callback is set and checks the
+cancellation token only between files and top-level packages, so both cost nothing
+measurable otherwise. The ETA of a stage extrapolates the rate observed so far, weighted by
+input file sizes (load, merge) or by packages (save).
+"""
+
+from typing import Callable, Optional, Union
+from dataclasses import dataclass
+from pathlib import Path
+import os
+import threading
+import time
+
+from .exceptions import MergeCancelledError
+
+
+@dataclass
+class MergeProgress:
+    """Progress of one stage of a running merge"""
+    stage: str  # "load", "merge" oder "save"
+    done: int  # geladene bzw. gemergte Dateien, geschriebene Packages
+    total: Optional[int] = None  # None, wenn unbekannt
+    item: Optional[str] = None  # Datei bzw. Package, das gerade fertig wurde
+    bytes_done: int = 0  # geladene/gemergte Eingabe-Bytes bzw. geschriebene Ausgabe-Bytes
+    bytes_total: Optional[int] = None
+    packages: int = 0  # bisher gemergte bzw. geschriebene Top-Level-Packages
+    elapsed: float = 0.0  # Sekunden seit Beginn der Phase
+    eta: Optional[float] = None  # geschätzte Restdauer der Phase in Sekunden
+
+    @property
+    def fraction(self) -> Optional[float]:
+        """Completed share of the stage (by bytes if known), None if unknown"""
+        if self.bytes_total:
+            return min(self.bytes_done / self.bytes_total, 1.0)
+        if self.total:
+            return min(self.done / self.total, 1.0)
+        return None
+
+
+ProgressCallback = Callable[[MergeProgress], None]
+
+
+class ProgressTracker:
+    """Creates the progress events of one stage and estimates its remaining time"""
+
+    def __init__(self, callback: ProgressCallback, stage: str, total: Optional[int] = None,
+                 bytes_total: Optional[int] = None):
+        self.callback = callback
+        self.stage = stage
+        self.total = total
+        self.bytes_total = bytes_total
+        self.packages = 0
+        self.start = time.perf_counter()
+
+    def report(self, done: int, bytes_done: int = 0, item: Optional[str] = None) -> None:
+        elapsed = time.perf_counter() - self.start
+        event = MergeProgress(self.stage, done, self.total, item, bytes_done, self.bytes_total,
+                              self.packages, elapsed)
+        fraction = event.fraction
+        if fraction:
+            event.eta = elapsed * (1 - fraction) / fraction
+        self.callback(event)
+
+
+def input_size(path: Union[str, Path]) -> int:
+    """Size of an input file for progress weighting, 0 if unknown (e.g. archive members)"""
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+class CancellationToken:
+    """Cooperative cancellation; may be cancelled from any thread"""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self) -> None:
+        """Requests cancellation; the merge stops at the next file or package boundary"""
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def raise_if_cancelled(self) -> None:
+        """Raises MergeCancelledError once cancellation was requested"""
+        if self._event.is_set():
+            raise MergeCancelledError("Merge cancelled")
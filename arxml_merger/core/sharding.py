@@ -0,0 +1,518 @@
+"""
+Sharded merge: one merge spread over several processes or machines sharing a filesystem
+
+Top-level packages are merged independently of each other (see core.external), so the
+output packages can be distributed over shards that are merged on different nodes:
+
+1. shard: every input is spilled package by package into the work directory and the
+   output's top-level packages are distributed over the shards, balanced by spilled size.
+   plan.json records the envelope, the package order and the shard assignment. A journal
+   written after every input lets an interrupted run continue with the next input.
+2. merge-shard: merges and serializes the packages of one shard into shards/NNNN.part;
+   shards/NNNN.json, written last, marks the shard as done. Done shards are skipped.
+3. stitch: writes the envelope and copies the shard outputs into it in package order.
+
+Every file is written atomically, so each step can simply be run again after an
+interruption. The output, its conflicts and statistics equal a single-node merge_files
+in the given input order (optimize_order is not supported).
+The merge configuration is stored in the plan; merge-shard and stitch only take the
+execution settings (logging, compression of the output) from their own configuration.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple, Union
+from dataclasses import dataclass, replace
+from pathlib import Path
+import heapq
+import json
+import logging
+import os
+import tempfile
+import time
+
+from lxml import etree
+
+from .models import (
+    ConflictResolutionStrategy, MergeConfig, MergeConflict, MergeResult, MergeStatistics
+)
+from .cache import _json_value, config_fingerprint
+from .exceptions import ArxmlMergerException
+from .external import ExternalMerger, Fragment, SpilledPackage
+from .incremental import PackageKey, _FILE_MODE, _absolute_conflicts
+from .progress import CancellationToken, ProgressCallback, ProgressTracker
+from ..utils.archives import is_archive
+from ..utils.compression import check_compression, compression_from_suffix, open_output
+from ..utils.parsing import get_parser
+from ..utils.serialization import iter_serialized_slots
+from ..utils.xml_utils import get_element_path
+
+
+SHARD_FORMAT_VERSION = 1
+
+PLAN_FILE = "plan.json"
+
+_JOURNAL_FILE = "journal.json"
+_SPILL_DIR = "spill"
+_SHARDS_DIR = "shards"
+
+# (key, origin file, occurrence), see ExternalMerger._plan_slots
+Slot = Tuple[PackageKey, int, Optional[int]]
+
+
+def _write_json(path: Path, data: Dict[str, Any]) -> None:
+    """Writes JSON atomically: readers see the old file or the complete new one"""
+    fd, temp_name = tempfile.mkstemp(dir=path.parent, prefix=".tmp-", suffix=path.name)
+    os.chmod(temp_name, _FILE_MODE)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as stream:
+            json.dump(data, stream, separators=(",", ":"), default=_json_value)
+        os.replace(temp_name, path)
+    except BaseException:
+        try:
+            os.unlink(temp_name)
+        except OSError:
+            pass
+        raise
+
+
+def _read_json(path: Path) -> Optional[Dict[str, Any]]:
+    """Reads a file written by _write_json, None if it is missing, unreadable or of another format"""
+    try:
+        with open(path, encoding="utf-8") as stream:
+            data = json.load(stream)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict) or data.get("format") != SHARD_FORMAT_VERSION:
+        return None
+    return data
+
+
+def _config_data(config: MergeConfig) -> Dict[str, Any]:
+    """MergeConfig fields that influence the merged model, in JSON form"""
+    return json.loads(json.dumps(config_fingerprint(config), default=_json_value))
+
+
+@dataclass
+class ShardPlan:
+    """Work items of a sharded merge (plan.json in the work directory)"""
+    config: Dict[str, Any]
+    # (path, size, mtime_ns) per input; the journal of an interrupted shard step lists the spilled inputs
+    inputs: List[Tuple[str, int, int]]
+    pretty_print: bool
+    marker: str
+    # First input without its packages, with placeholder comments (marker) in their place
+    envelope: str
+    schema_versions: List[str]
+    ignored_elements: Dict[str, Dict[str, int]]
+    file_keys: List[List[PackageKey]]
+    # Spill file name (in spill/) and fragments per package key
+    packages: Dict[PackageKey, SpilledPackage]
+    # Output packages in document order and the slot indices of every shard
+    slots: List[Slot]
+    shards: List[List[int]]
+
+    def save(self, path: Path) -> None:
+        """Writes the plan as JSON (atomically)"""
+        _write_json(path, {
+            "format": SHARD_FORMAT_VERSION,
+            "config": self.config,
+            "inputs": self.inputs,
+            "pretty_print": self.pretty_print,
+            "marker": self.marker,
+            "envelope": self.envelope,
+            "schema_versions": self.schema_versions,
+            "ignored_elements": self.ignored_elements,
+            "file_keys": self.file_keys,
+            "packages": [
+                [key, package.spill_file.name, package.size,
+                 [[f.file_index, f.position, f.offset, f.length] for f in package.fragments]]
+                for key, package in self.packages.items()
+            ],
+            "slots": self.slots,
+            "shards": self.shards,
+        })
+
+    @classmethod
+    def load(cls, path: Path) -> Optional['ShardPlan']:
+        """Reads a plan, None if it is missing, unreadable or of another format"""
+        data = _read_json(path)
+        if data is None:
+            return None
+        spill_dir = path.parent / _SPILL_DIR
+        try:
+            return cls(
+                config=data["config"],
+                inputs=[tuple(record) for record in data["inputs"]],
+                pretty_print=data["pretty_print"],
+                marker=data["marker"],
+                envelope=data["envelope"],
+                schema_versions=data["schema_versions"],
+                ignored_elements=data["ignored_elements"],
+                file_keys=[[tuple(key) for key in keys] for keys in data["file_keys"]],
+                packages={
+                    tuple(key): SpilledPackage(spill_dir / name, [Fragment(*fragment) for fragment in fragments],
+                                               size)
+                    for key, name, size, fragments in data["packages"]
+                },
+                slots=[(tuple(key), origin, occurrence) for key, origin, occurrence in data["slots"]],
+                shards=data["shards"],
+            )
+        except (KeyError, TypeError, ValueError):
+            return None
+
+
+class ShardedMerge:
+    """The shard, merge-shard and stitch steps on a shared work directory"""
+
+    def __init__(self, work_dir: Union[str, Path], config: Optional[MergeConfig] = None):
+        """
+        Args:
+            work_dir: Work directory shared by all nodes
+            config: Merge configuration of the shard step; merge_shard and stitch use the
+                configuration stored in the plan and only this config's execution settings
+        """
+        self.work_dir = Path(work_dir)
+        self.config = config or MergeConfig()
+        self.logger = logging.getLogger("arxml_merger")
+        self.progress_callback: Optional[ProgressCallback] = None
+        self.cancel_token: Optional[CancellationToken] = None
+
+    @property
+    def plan_path(self) -> Path:
+        return self.work_dir / PLAN_FILE
+
+    def _shard_file(self, index: int, suffix: str) -> Path:
+        return self.work_dir / _SHARDS_DIR / f"{index:04d}{suffix}"
+
+    def shard(self, file_paths: List[Union[str, Path]], shards: Optional[int] = None,
+              pretty_print: bool = True) -> ShardPlan:
+        """
+        Spills the inputs into the work directory and distributes the packages over shards
+
+        Args:
+            file_paths: Files to merge (ARXML, optionally compressed; no archives)
+            shards: Number of shards (default: one per CPU); at most one per output package
+            pretty_print: Indent the output
+
+        Returns:
+            The plan; an existing plan of the same inputs and configuration is returned as it is
+        """
+        if not file_paths:
+            raise ArxmlMergerException("No files provided for merging")
+        archives = [str(file_path) for file_path in file_paths if is_archive(file_path)]
+        if archives:
+            raise ArxmlMergerException(f"Sharded merge does not support archive inputs: {archives}")
+        if self.config.optimize_order:
+            raise ArxmlMergerException("Sharded merge does not support optimize_order: "
+                                       "it merges the inputs in the given order")
+        if shards is not None and shards < 1:
+            raise ArxmlMergerException(f"Number of shards must be positive, got {shards}")
+
+        inputs = []
+        for file_path in file_paths:
+            try:
+                stat = os.stat(file_path)
+            except OSError as e:
+                raise ArxmlMergerException(f"Cannot read input {file_path}: {e}") from e
+            inputs.append((str(file_path), stat.st_size, stat.st_mtime_ns))
+        config = _config_data(self.config)
+
+        def same_merge(plan: ShardPlan) -> bool:
+            return (plan.config == config and plan.pretty_print == pretty_print
+                    and plan.inputs == inputs[:len(plan.inputs)])
+
+        plan = ShardPlan.load(self.plan_path)
+        if plan is not None:
+            if not same_merge(plan) or len(plan.inputs) != len(inputs):
+                raise ArxmlMergerException(f"{self.work_dir} already holds the plan of another merge")
+            if shards is not None and min(shards, max(len(plan.slots), 1)) != len(plan.shards):
+                raise ArxmlMergerException(f"{self.work_dir} is already split into {len(plan.shards)} shards")
+            self.logger.info("Shard plan %s already complete", self.plan_path)
+            return plan
+
+        from .merger import ArxmlMerger
+        merger = ArxmlMerger(self.config)
+        merger.progress_callback = self.progress_callback
+        merger.cancel_token = self.cancel_token
+        external = ExternalMerger(merger)
+        spill_dir = self.work_dir / _SPILL_DIR
+        spill_dir.mkdir(parents=True, exist_ok=True)
+        journal_path = self.work_dir / _JOURNAL_FILE
+
+        journal = ShardPlan.load(journal_path)
+        if journal is not None and same_merge(journal):
+            self._restore(external, journal)
+            for package in external.packages.values():
+                # Fragmente nach dem letzten Journal-Eintrag verwerfen
+                with open(package.spill_file, "r+b") as stream:
+                    stream.truncate(package.size)
+            self.logger.info("Resuming shard step after %d of %d inputs", len(journal.inputs), len(inputs))
+        else:
+            external._reset_state(spill_dir, file_paths)
+        # Spill-Dateien, die das Journal nicht kennt, stammen aus einem abgebrochenen Lauf
+        known = {package.spill_file.name for package in external.packages.values()}
+        for name in os.listdir(spill_dir):
+            if name not in known:
+                os.unlink(spill_dir / name)
+
+        def record_input(index: int) -> None:
+            self._plan(external, inputs[:index + 1], pretty_print, [], []).save(journal_path)
+
+        with merger._merge_context():
+            external._spill_inputs([Path(file_path) for file_path in file_paths], len(external.file_keys),
+                                   record_input)
+        external._check_splicing()
+
+        slots = external._plan_slots()
+        plan = self._plan(external, inputs, pretty_print, slots, self._assign(external, slots, shards))
+        plan.save(self.plan_path)
+        try:
+            os.unlink(journal_path)
+        except OSError:
+            pass
+        self.logger.info("Sharded %d packages into %d shards in %s", len(slots), len(plan.shards), self.work_dir)
+        return plan
+
+    def _plan(self, external: ExternalMerger, inputs: List[Tuple[str, int, int]], pretty_print: bool,
+              slots: List[Slot], shards: List[List[int]]) -> ShardPlan:
+        return ShardPlan(
+            config=_config_data(self.config),
+            inputs=inputs,
+            pretty_print=pretty_print,
+            marker=external.marker,
+            envelope=etree.tostring(external.envelope_root, encoding="unicode"),
+            schema_versions=external.schema_versions,
+            ignored_elements=external.ignored_elements,
+            file_keys=external.file_keys,
+            packages=external.packages,
+            slots=slots,
+            shards=shards,
+        )
+
+    def _restore(self, external: ExternalMerger, plan: ShardPlan) -> None:
+        """Puts the spill state of a plan or journal into an ExternalMerger"""
+        external._reset_state(self.work_dir / _SPILL_DIR, [path for path, _, _ in plan.inputs])
+        external.marker = plan.marker
+        external.envelope_root = etree.fromstring(plan.envelope, get_parser(remove_blank_text=False,
+                                                                             resolve_entities=False))
+        external.base_version = plan.schema_versions[0]
+        external.schema_versions = list(plan.schema_versions)
+        external.ignored_elements = plan.ignored_elements
+        external.file_keys = plan.file_keys
+        external.packages = plan.packages
+
+    @staticmethod
+    def _assign(external: ExternalMerger, slots: List[Slot], shards: Optional[int]) -> List[List[int]]:
+        """Distributes the slots over the shards, largest first onto the least loaded shard"""
+        count = max(1, min(shards or os.cpu_count() or 1, len(slots)))
+        sizes = []
+        for key, _, occurrence in slots:
+            fragments = external.packages[key].fragments
+            if occurrence is not None:
+                sizes.append([f for f in fragments if f.file_index == 0][occurrence].length)
+            else:
+                sizes.append(fragments[0].length + sum(f.length for f in fragments[1:] if f.file_index != 0))
+        loads = [(0, shard) for shard in range(count)]
+        assignment: List[List[int]] = [[] for _ in range(count)]
+        for index in sorted(range(len(slots)), key=lambda index: -sizes[index]):
+            load, shard = heapq.heappop(loads)
+            assignment[shard].append(index)
+            heapq.heappush(loads, (load + sizes[index], shard))
+        return [sorted(indices) for indices in assignment]
+
+    def load_plan(self) -> ShardPlan:
+        """The plan of the work directory; raises ArxmlMergerException before the shard step"""
+        plan = ShardPlan.load(self.plan_path)
+        if plan is None:
+            raise ArxmlMergerException(f"No shard plan in {self.work_dir}, run the shard step first")
+        return plan
+
+    def _merger(self, plan: ShardPlan):
+        """ArxmlMerger with the plan's merge configuration and this configuration's execution settings"""
+        from .merger import ArxmlMerger
+        values = dict(plan.config)
+        values["conflict_resolution"] = ConflictResolutionStrategy(values["conflict_resolution"])
+        merger = ArxmlMerger(replace(self.config, **values))
+        merger.progress_callback = self.progress_callback
+        merger.cancel_token = self.cancel_token
+        return merger
+
+    def _load_shard(self, plan: ShardPlan, index: int) -> Optional[Dict[str, Any]]:
+        """Result record of a merged shard, None if the shard is not done (for this plan)"""
+        record = _read_json(self._shard_file(index, ".json"))
+        if record is None or record.get("plan") != plan.marker or record.get("slots") is None:
+            return None
+        try:
+            if os.path.getsize(self._shard_file(index, ".part")) != record["size"]:
+                return None
+        except OSError:
+            return None
+        return record
+
+    def pending_shards(self) -> List[int]:
+        """Indices of the shards not merged yet"""
+        plan = self.load_plan()
+        return [index for index in range(len(plan.shards)) if self._load_shard(plan, index) is None]
+
+    def merge_shard(self, index: int) -> bool:
+        """
+        Merges the packages of one shard
+
+        Args:
+            index: Shard index (0-based)
+
+        Returns:
+            False if the shard was already merged
+        """
+        plan = self.load_plan()
+        if not 0 <= index < len(plan.shards):
+            raise ArxmlMergerException(f"Shard {index} out of range, the plan has {len(plan.shards)} shards")
+        if self._load_shard(plan, index) is not None:
+            self.logger.info("Shard %d already merged", index)
+            return False
+
+        start_time = time.time()
+        merger = self._merger(plan)
+        external = ExternalMerger(merger)
+        self._restore(external, plan)
+        slot_nodes, _ = external._slot_nodes(len(plan.slots))
+        tracker = None
+        if merger.progress_callback is not None:
+            tracker = ProgressTracker(merger.progress_callback, "save", len(plan.shards[index]))
+
+        part = self._shard_file(index, ".part")
+        part.parent.mkdir(parents=True, exist_ok=True)
+        records = []
+        offset = 0
+        fd, temp_name = tempfile.mkstemp(dir=part.parent, prefix=".tmp-", suffix=part.name)
+        try:
+            with merger._merge_context() as context, os.fdopen(fd, "wb") as stream:
+                for slot_index in plan.shards[index]:
+                    if context.cancel_token is not None:
+                        context.cancel_token.raise_if_cancelled()
+                    subtrees_skipped, nodes_skipped = context.subtrees_skipped, context.nodes_skipped
+                    chunk, elements, conflicts = external._merge_package(plan.slots[slot_index],
+                                                                         slot_nodes[slot_index], plan.pretty_print)
+                    stream.write(chunk)
+                    records.append([slot_index, offset, len(chunk), elements,
+                                    context.subtrees_skipped - subtrees_skipped,
+                                    context.nodes_skipped - nodes_skipped,
+                                    [[file_index, position, conflict.to_dict()]
+                                     for file_index, position, conflict in conflicts]])
+                    offset += len(chunk)
+                    if tracker is not None:
+                        tracker.packages += 1
+                        tracker.report(tracker.packages, offset,
+                                       "/".join(name for name in plan.slots[slot_index][0] if name))
+            os.replace(temp_name, part)
+        except BaseException:
+            try:
+                os.unlink(temp_name)
+            except OSError:
+                pass
+            raise
+        # Der Datensatz kommt zuletzt: erst mit ihm gilt der Shard als fertig
+        _write_json(self._shard_file(index, ".json"),
+                    {"format": SHARD_FORMAT_VERSION, "plan": plan.marker, "size": offset, "slots": records})
+        self.logger.info("Shard %d merged in %.2fs: %d packages, %d bytes",
+                         index, time.time() - start_time, len(records), offset)
+        return True
+
+    def stitch(self, output: Union[str, Path]) -> MergeResult:
+        """
+        Writes the output from the envelope and the merged shards
+
+        Args:
+            output: Output path, replaced atomically; compressed by extension or
+                config.output_compression
+
+        Returns:
+            MergeResult; its tree is parsed from the output on demand
+        """
+        start_time = time.time()
+        plan = self.load_plan()
+        records = {}
+        missing = []
+        for index in range(len(plan.shards)):
+            record = self._load_shard(plan, index)
+            if record is None:
+                missing.append(index)
+                continue
+            for slot_index, offset, length, elements, subtrees, nodes, conflicts in record["slots"]:
+                records[slot_index] = (index, offset, length, elements, subtrees, nodes,
+                                       [(file_index, position, MergeConflict.from_dict(conflict))
+                                        for file_index, position, conflict in conflicts])
+        if missing:
+            raise ArxmlMergerException(f"Shards not merged yet: {', '.join(str(index) for index in missing)}")
+
+        merger = self._merger(plan)
+        output = Path(output)
+        compression = merger.config.output_compression or compression_from_suffix(output)
+        if compression is not None:
+            try:
+                check_compression(compression, merger.config.compression_level)
+            except ValueError as e:
+                raise ArxmlMergerException(str(e)) from e
+        external = ExternalMerger(merger)
+        self._restore(external, plan)
+        slot_nodes, elements = external._slot_nodes(len(plan.slots))
+        slot_index = {node: index for index, node in enumerate(slot_nodes)}
+        tracker = None
+        if merger.progress_callback is not None:
+            tracker = ProgressTracker(merger.progress_callback, "save", len(plan.slots))
+
+        parts = {}
+        written = 0
+        output.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_name = tempfile.mkstemp(dir=output.parent, prefix=".tmp-", suffix=output.name)
+        os.chmod(temp_name, _FILE_MODE)
+        try:
+            with os.fdopen(fd, "wb") as target:
+                stream = open_output(target, compression, merger.config.compression_level) if compression else target
+                try:
+                    for node, chunk in iter_serialized_slots(external.envelope_root, plan.marker,
+                                                             merger.config.output_encoding, plan.pretty_print):
+                        if node is not None:
+                            shard, offset, length = records[slot_index[node]][:3]
+                            if shard not in parts:
+                                parts[shard] = open(self._shard_file(shard, ".part"), "rb")
+                            parts[shard].seek(offset)
+                            chunk = parts[shard].read(length)
+                        stream.write(chunk)
+                        written += len(chunk)
+                        if node is not None and tracker is not None:
+                            tracker.packages += 1
+                            tracker.report(tracker.packages, written)
+                finally:
+                    if stream is not target:
+                        stream.close()
+            os.replace(temp_name, output)
+        except BaseException:
+            try:
+                os.unlink(temp_name)
+            except OSError:
+                pass
+            raise
+        finally:
+            for part in parts.values():
+                part.close()
+
+        slots = [records[index] for index in range(len(plan.slots))]
+        base_count = len(plan.file_keys[0])
+        introduced = [(origin, plan.file_keys[origin].index(key)) for key, origin, _ in plan.slots[base_count:]]
+        packages_path = get_element_path(external._packages_parent(external.envelope_root))
+        conflicts = _absolute_conflicts([slot[6] for slot in slots], base_count, introduced, packages_path)
+        statistics = MergeStatistics(
+            files_processed=len(plan.inputs),
+            elements_merged=elements + sum(slot[3] for slot in slots),
+            conflicts_found=len(conflicts),
+            conflicts_resolved=len([c for c in conflicts if c.resolved_value is not None]),
+            processing_time=time.time() - start_time,
+            schema_version=plan.schema_versions[0],
+            ignored_elements=plan.ignored_elements,
+            subtrees_skipped=sum(slot[4] for slot in slots),
+            nodes_skipped=sum(slot[5] for slot in slots),
+            largest_input=max(size for _, size, _ in plan.inputs)
+        )
+        self.logger.info("Stitched %d shards into %s in %.2fs", len(plan.shards), output,
+                         statistics.processing_time)
+        return MergeResult(None, merger.config, statistics, conflicts, cached_output=output)
@@ -0,0 +1,170 @@
+"""
+Watch mode: re-merges whenever an input file is saved
+
+Inputs are polled with os.stat, so no platform-specific notification API is needed. Only a
+file whose size or modification time changed is hashed, and only a changed hash starts a merge
+cycle (saving a file unchanged does not). Every cycle is an incremental merge (see
+core.incremental): the output is replaced atomically and only the top-level packages touched
+by the change are merged again. Parsed models of unchanged files stay in the watcher's own
+ModelStore, so files that contribute to a touched package are not parsed again either; the
+given merger is not changed.
+"""
+
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+from dataclasses import dataclass, field
+from pathlib import Path
+import os
+import threading
+import time
+
+from .models import MergeResult
+from .cache import ModelStore, hash_file
+from .exceptions import ArxmlMergerException
+from .incremental import IncrementalMerger
+
+
+DEFAULT_POLL_INTERVAL = 0.5
+
+InputSource = Union[Sequence[Union[str, Path]], Callable[[], Sequence[Union[str, Path]]]]
+
+
+@dataclass
+class WatchCycle:
+    """One merge cycle of the watch mode"""
+    number: int
+    changed: List[Path] = field(default_factory=list)
+    removed: List[Path] = field(default_factory=list)
+    latency: float = 0.0  # Sekunden von der Erkennung bis zur geschriebenen Ausgabe
+    result: Optional[MergeResult] = None
+    error: Optional[Exception] = None
+
+    @property
+    def succeeded(self) -> bool:
+        return self.error is None
+
+
+class MergeWatcher:
+    """Polls the inputs and re-merges them into an output file on every change"""
+
+    def __init__(self, merger, inputs: InputSource, output: Union[str, Path],
+                 manifest_path: Optional[Union[str, Path]] = None, pretty_print: bool = True,
+                 interval: float = DEFAULT_POLL_INTERVAL):
+        """
+        Args:
+            merger: ArxmlMerger used for every cycle
+            inputs: Files to merge, or a callable returning them (re-evaluated on every poll,
+                e.g. to pick up files added to an input directory)
+            output: Output path, replaced atomically by every cycle
+            manifest_path: Merge manifest, defaults to OUTPUT.manifest.json.gz
+            pretty_print: Indent the output
+            interval: Seconds between two polls
+        """
+        if merger.config.optimize_order:
+            raise ArxmlMergerException("Watch mode does not support optimize_order: "
+                                       "it merges the inputs in the given order")
+        self.merger = merger
+        self.inputs = inputs
+        self.output = Path(output)
+        self.manifest_path = manifest_path
+        self.pretty_print = pretty_print
+        self.interval = interval
+        self.logger = merger.logger
+        self.cycles = 0
+        self._stop = threading.Event()
+        # Stand der letzten Abfrage: Pfad -> ((mtime_ns, size), hash)
+        self._state: Dict[str, Tuple[Tuple[int, int], str]] = {}
+        self._order: Optional[List[str]] = None
+        # Geparste Modelle bleiben über Zyklen hinweg im Speicher (eigener Speicher des Watchers)
+        self.models = ModelStore()
+
+    def _resolve_inputs(self) -> List[Path]:
+        inputs = self.inputs() if callable(self.inputs) else self.inputs
+        return [Path(file_path) for file_path in inputs]
+
+    def poll(self) -> Optional[Tuple[List[Path], Dict[str, Tuple[Tuple[int, int], str]], List[Path]]]:
+        """
+        Checks the inputs for changes
+
+        Returns:
+            (inputs, their new state, changed inputs) if a cycle is due, otherwise None
+        """
+        file_paths = self._resolve_inputs()
+        paths = [str(file_path.resolve()) for file_path in file_paths]
+        state = {}
+        changed = []
+        for file_path, path in zip(file_paths, paths):
+            if path in state:
+                continue
+            stat = os.stat(path)
+            signature = (stat.st_mtime_ns, stat.st_size)
+            previous = self._state.get(path)
+            if previous is not None and previous[0] == signature:
+                state[path] = previous
+                continue
+            file_hash = hash_file(path)
+            state[path] = (signature, file_hash)
+            if previous is None or previous[1] != file_hash:
+                changed.append(file_path)
+
+        if not changed and paths == self._order:
+            self._state = state  # nur Zeitstempel geändert
+            return None
+        return file_paths, state, changed
+
+    def check(self) -> Optional[WatchCycle]:
+        """Polls once and runs a merge cycle if an input changed; the first call always merges"""
+        detected = time.perf_counter()
+        try:
+            polled = self.poll()
+        except (OSError, ValueError) as e:
+            # z.B. eine Datei, die der Editor gerade ersetzt; beim nächsten Poll erneut versuchen
+            self.logger.warning("Watch: cannot read inputs: %s", e)
+            return None
+        if polled is None:
+            return None
+        file_paths, state, changed = polled
+
+        self.cycles += 1
+        removed = [Path(path) for path in self._state if path not in state]
+        cycle = WatchCycle(self.cycles, changed, removed)
+        # Der Zustand gilt auch bei Fehlern: eine fehlerhafte Datei wird erst nach dem nächsten Speichern erneut gemergt
+        self._state, self._order = state, [str(file_path.resolve()) for file_path in file_paths]
+        try:
+            cycle.result = IncrementalMerger(self.merger, self.models).merge(
+                file_paths, self.output, self.manifest_path, self.pretty_print,
+                hashes=[state[path][1] for path in self._order]
+            )
+        except (ArxmlMergerException, OSError) as e:
+            cycle.error = e
+            self.logger.error("Watch cycle %d failed: %s", cycle.number, e)
+        cycle.latency = time.perf_counter() - detected
+
+        # Modelle entfernter oder geänderter Dateien freigeben
+        self.models.retain({path: file_hash for path, (_, file_hash) in state.items()})
+        if cycle.succeeded:
+            self.logger.info("Watch cycle %d: %d changed, %d packages reused, %.3fs",
+                             cycle.number, len(changed), cycle.result.statistics.packages_reused, cycle.latency)
+        return cycle
+
+    def run(self, on_cycle: Optional[Callable[[WatchCycle], None]] = None,
+            max_cycles: Optional[int] = None) -> None:
+        """
+        Merges, then polls until stop() is called (or max_cycles cycles have run)
+
+        Args:
+            on_cycle: Called after every cycle, e.g. to report its latency
+            max_cycles: Stop after this many cycles (default: run until stopped)
+        """
+        self._stop.clear()
+        while not self._stop.is_set():
+            cycle = self.check()
+            if cycle is not None:
+                if on_cycle is not None:
+                    on_cycle(cycle)
+                if max_cycles is not None and self.cycles >= max_cycles:
+                    break
+            self._stop.wait(self.interval)
+
+    def stop(self) -> None:
+        """Ends run() after the current cycle; may be called from another thread"""
+        self._stop.set()
@@ -0,0 +1,81 @@
+"""
+Worklist driver of the element merge
+
+ArxmlMerger merges an element pair in a merge unit: a generator that merges the pair's
+attributes and direct children and yields the (target, source) pairs of the children that
+need a merge of their own. A unit only changes its target and the target's direct
+children; the worklist decides when the yielded pairs run.
+
+run_worklist runs the units depth-first on an explicit stack, so the merge keeps the order
+of the former recursive merge (conflicts, events, element paths) while the nesting depth
+is bounded by memory instead of the recursion limit. Optionally the units are timed per
+element type; a unit's time excludes the time spent in the units it yielded.
+"""
+
+from typing import Callable, Dict, Iterator, Optional, Tuple
+from dataclasses import dataclass
+import time
+
+from lxml import etree
+
+from ..utils.xml_utils import get_local_name
+
+
+MergeUnit = Iterator[Tuple[etree._Element, etree._Element]]
+
+UnitFactory = Callable[[etree._Element, etree._Element], MergeUnit]
+
+
+@dataclass
+class UnitTiming:
+    """Merge units of one element type and their exclusive time"""
+    units: int = 0
+    seconds: float = 0.0
+
+
+def run_worklist(expand: UnitFactory, target: etree._Element, source: etree._Element,
+                 timings: Optional[Dict[str, UnitTiming]] = None) -> None:
+    """
+    Merges source into target and all yielded child pairs, depth-first
+
+    Args:
+        expand: Creates the merge unit of an element pair
+        target: Element of the merged tree
+        source: Element of the source tree
+        timings: If given, unit counts and times are added per target tag
+    """
+    if timings is not None:
+        _run_timed(expand, target, source, timings)
+        return
+
+    stack = [expand(target, source)]
+    push, pop = stack.append, stack.pop
+    while stack:
+        pair = next(stack[-1], None)
+        if pair is None:
+            pop()
+        else:
+            push(expand(*pair))
+
+
+def _run_timed(expand: UnitFactory, target: etree._Element, source: etree._Element,
+               timings: Dict[str, UnitTiming]) -> None:
+    def timing(element: etree._Element) -> UnitTiming:
+        tag = get_local_name(element)
+        entry = timings.get(tag)
+        if entry is None:
+            entry = timings[tag] = UnitTiming()
+        entry.units += 1
+        return entry
+
+    clock = time.perf_counter
+    stack = [(expand(target, source), timing(target))]
+    while stack:
+        unit, entry = stack[-1]
+        start = clock()
+        pair = next(unit, None)
+        entry.seconds += clock() - start
+        if pair is None:
+            stack.pop()
+        else:
+            stack.append((expand(*pair), timing(pair[0])))
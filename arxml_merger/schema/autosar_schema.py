@@ -11,10 +11,88 @@ Note: AUTOSAR 4.5 does not exist. The series jumped from 4.4 to the new
 year-month naming convention starting with 20-11.
 """
 
-from typing import Dict, List, Set, Optional, Tuple
+from typing import Callable, Dict, List, Set, Optional, Sequence, Tuple
 from abc import ABC, abstractmethod
 from lxml import etree
 import re
+import threading
+
+from ..core.exceptions import SplitKeyError
+
+
+SplitKeyValue = Tuple[Optional[str], ...]
+SplitKeyExtractor = Callable[[etree._Element], SplitKeyValue]
+
+# Split keys are attribute or child element names, so they must be valid XML names
+_SPLIT_KEY_PATTERN = re.compile(r'^[A-Za-z_][A-Za-z0-9._-]*$')
+
+
+def validate_split_keys(element_name: str, split_keys: Sequence[str]) -> List[str]:
+    """Validates a split key specification and returns it as a list"""
+    if not isinstance(element_name, str) or not _SPLIT_KEY_PATTERN.match(element_name):
+        raise SplitKeyError(f"Invalid element name in split key specification: {element_name!r}",
+                            element_path=str(element_name))
+    if isinstance(split_keys, str) or not isinstance(split_keys, (list, tuple)):
+        raise SplitKeyError(f"Split keys for {element_name} must be a list of names, got {split_keys!r}",
+                            element_path=element_name)
+    if not split_keys:
+        raise SplitKeyError(f"Empty split key list for {element_name}", element_path=element_name)
+
+    for key in split_keys:
+        if not isinstance(key, str) or not _SPLIT_KEY_PATTERN.match(key):
+            raise SplitKeyError(f"Invalid split key {key!r} for {element_name}",
+                                split_key=str(key), element_path=element_name)
+    if len(set(split_keys)) != len(split_keys):
+        raise SplitKeyError(f"Duplicate split keys for {element_name}: {list(split_keys)}",
+                            element_path=element_name)
+    return list(split_keys)
+
+
+def compile_split_key_extractor(split_keys: Sequence[str]) -> SplitKeyExtractor:
+    """
+    Compiles split keys into a function returning a hashable key tuple for an element
+
+    Each key is looked up as attribute first and then as direct child element,
+    exactly like get_element_signature. Missing or empty values are None, so two
+    elements match if and only if their signatures are equal.
+    """
+    keys = tuple(split_keys)
+
+    if len(keys) == 1:
+        key = keys[0]
+        suffix = "}" + key
+
+        def extract_single(element: etree._Element) -> SplitKeyValue:
+            value = element.get(key)
+            if value:
+                return (value,)
+            for child in element:
+                tag = child.tag
+                if tag.__class__ is str and (tag == key or tag.endswith(suffix)):
+                    text = child.text
+                    return ((text.strip() or None) if text else None,)
+            return (None,)
+
+        return extract_single
+
+    wanted = frozenset(keys)
+
+    def extract_composite(element: etree._Element) -> SplitKeyValue:
+        # One pass over the children collects all child-element keys
+        found: Dict[str, Optional[str]] = {}
+        for child in element:
+            tag = child.tag
+            if tag.__class__ is not str:
+                continue
+            name = tag[tag.rfind("}") + 1:]
+            if name in wanted and name not in found:
+                text = child.text
+                found[name] = (text.strip() or None) if text else None
+                if len(found) == len(wanted):
+                    break
+        return tuple(element.get(key) or found.get(key) for key in keys)
+
+    return extract_composite
 
 
 class AutosarSchemaHandler(ABC):
@@ -25,6 +103,13 @@ class AutosarSchemaHandler(ABC):
         self.namespace_uri = self._get_namespace_uri()
         self.split_keys = self._get_split_keys()
         self.splitable_elements = self._get_splitable_elements()
+        # Alle Extraktoren vorab kompiliert: der Handler wird danach nicht mehr verändert
+        # und kann von parallelen Merges geteilt werden
+        self._key_extractors: Dict[str, SplitKeyExtractor] = {
+            element_name: compile_split_key_extractor(split_keys)
+            for element_name, split_keys in self.split_keys.items()
+        }
+        self._default_key_extractor = compile_split_key_extractor(["SHORT-NAME"])
     
     @abstractmethod
     def _get_namespace_uri(self) -> str:
@@ -50,6 +135,10 @@ class AutosarSchemaHandler(ABC):
         # Return split keys without UUID prioritization - use SHORT-NAME based matching like dSpace SystemDesk
         return self.split_keys.get(element_name, ["SHORT-NAME"])
     
+    def get_key_extractor(self, element_name: str) -> SplitKeyExtractor:
+        """Returns the compiled split key extractor for an element (SHORT-NAME if it has no split keys)"""
+        return self._key_extractors.get(element_name, self._default_key_extractor)
+    
     def extract_split_key_value(self, element: etree._Element, split_key: str) -> Optional[str]:
         """Extracts the value of a split key from an element using SHORT-NAME based approach like dSpace SystemDesk"""
         # Try as direct attribute first
@@ -275,6 +364,11 @@ class Autosar2411SchemaHandler(Autosar2311SchemaHandler):
         return "http://autosar.org/schema/r4.0"
 
 
+# Schema-Handler je Version, prozessweit geteilt (siehe SchemaDetector.get_schema_handler)
+_shared_handlers: Dict[str, AutosarSchemaHandler] = {}
+_shared_handlers_lock = threading.Lock()
+
+
 class SchemaDetector:
     """Detects AUTOSAR schema versions from ARXML files"""
     
@@ -330,6 +424,22 @@ class SchemaDetector:
         # Default to earliest supported version
         return "4.3.1"
     
+    @staticmethod
+    def get_schema_handler(version: str) -> AutosarSchemaHandler:
+        """Returns the shared schema handler for the given version (created once per process)"""
+        handler = _shared_handlers.get(version)
+        if handler is None:
+            with _shared_handlers_lock:
+                handler = _shared_handlers.get(version)
+                if handler is None:
+                    handler = _shared_handlers[version] = SchemaDetector.create_schema_handler(version)
+        return handler
+    
+    @staticmethod
+    def shared_schema_versions() -> List[str]:
+        """Versions of the shared schema handlers created so far"""
+        return sorted(_shared_handlers)
+    
     @staticmethod
     def create_schema_handler(version: str) -> AutosarSchemaHandler:
         """Creates a schema handler for the given version"""
@@ -0,0 +1,454 @@
+"""
+Local merge service: JSON-RPC 2.0 over localhost HTTP or a Unix socket
+
+A long-running MergeService keeps what a new CLI process would have to rebuild for every
+request: imported modules, parsed inputs (by path and content hash, per parser
+configuration), the schema handler tables and the most recent merge results. Requests are
+executed by a bounded worker pool; per-method latency metrics are kept in memory.
+
+Methods (params as JSON object, "files" is a list of input paths, "config" overrides
+MergeConfig fields of the service's default configuration):
+
+    merge     {files, config?, output?, pretty_print?, incremental?, manifest?}
+    plan      {files, config?}
+    query     {files, config?, reference}
+    validate  {files, config?}
+    metrics   {}
+
+POST a request to / (or to the socket); GET /metrics returns the metrics as JSON.
+"""
+
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, fields
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+import json
+import logging
+import os
+import socketserver
+import threading
+import time
+
+from lxml import etree
+
+from .core.cache import ModelStore, config_fingerprint, hash_files
+from .core.exceptions import ArxmlMergerException
+from .core.merger import ArxmlMerger
+from .core.models import ConflictResolutionStrategy, MergeConfig, MergeResult
+from .schema.autosar_schema import SchemaDetector
+from .utils.serialization import resolve_workers
+from .utils.xml_utils import find_by_reference, get_autosar_path, validate_arxml_structure
+
+
+DEFAULT_ADDRESS = "127.0.0.1:8765"
+
+# Zuletzt gemergte Ergebnisse für query (und wiederholte merge-Anfragen ohne Ausgabe)
+DEFAULT_RESULT_CACHE_SIZE = 4
+
+# Geparste Eingaben je Parser-Konfiguration; Modelle und Konfigurationen werden LRU verdrängt
+DEFAULT_MODEL_STORE_SIZE = 256
+_MAX_MODEL_STORES = 4
+
+_LATENCY_WINDOW = 1000
+
+# JSON-RPC 2.0 error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+MERGE_ERROR = -32000
+
+
+class RpcError(Exception):
+    """Error returned to the client as JSON-RPC error object"""
+    def __init__(self, code: int, message: str, data: Any = None):
+        super().__init__(message)
+        self.code = code
+        self.data = data
+
+
+class _MethodMetrics:
+    """Request count, errors and a sliding window of latencies of one method"""
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.total_time = 0.0
+        self.latencies = deque(maxlen=_LATENCY_WINDOW)
+
+    def record(self, latency: float, failed: bool) -> None:
+        self.requests += 1
+        self.errors += failed
+        self.total_time += latency
+        self.latencies.append(latency)
+
+    def to_dict(self) -> Dict[str, Any]:
+        latencies = sorted(self.latencies)
+
+        def percentile(fraction: float) -> float:
+            return latencies[min(len(latencies) - 1, int(fraction * len(latencies)))] if latencies else 0.0
+
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "mean": self.total_time / self.requests if self.requests else 0.0,
+            "p50": percentile(0.5),
+            "p95": percentile(0.95),
+            "max": latencies[-1] if latencies else 0.0,
+        }
+
+
+class MergeService:
+    """ArxmlMerger operations with warm state shared between requests"""
+
+    def __init__(self, config: Optional[MergeConfig] = None, workers: int = 0,
+                 result_cache_size: int = DEFAULT_RESULT_CACHE_SIZE,
+                 max_models: int = DEFAULT_MODEL_STORE_SIZE):
+        """
+        Args:
+            config: Default configuration; requests override single fields
+            workers: Requests executed concurrently, 0 = one per CPU
+            result_cache_size: Merge results kept for query requests
+            max_models: Parsed inputs kept in memory per parser configuration (LRU)
+        """
+        self.config = config or MergeConfig()
+        ArxmlMerger(self.config)  # ungültige Standardkonfiguration sofort melden
+        self.workers = resolve_workers(workers)
+        self.result_cache_size = result_cache_size
+        self.max_models = max_models
+        self.logger = logging.getLogger("arxml_merger")
+        self.started = time.time()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="arxml-server")
+        self._lock = threading.Lock()
+        # Geparste Eingaben je Parser-Konfiguration, die zuletzt benutzte zuletzt
+        self._models: "OrderedDict[str, ModelStore]" = OrderedDict()
+        self._results: "OrderedDict[Tuple, MergeResult]" = OrderedDict()
+        self._result_hits = 0
+        self._metrics: Dict[str, _MethodMetrics] = {}
+        self._active = 0
+        self._methods: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+            "merge": self.merge,
+            "plan": self.plan,
+            "query": self.query,
+            "validate": self.validate,
+            "metrics": lambda params: self.metrics(),
+        }
+
+    def close(self) -> None:
+        """Waits for running requests and stops the worker pool"""
+        self._executor.shutdown(wait=True)
+
+    # --- Request handling ---
+
+    def handle(self, request: Any) -> Optional[Dict[str, Any]]:
+        """
+        Executes one JSON-RPC request in the worker pool
+
+        Returns:
+            The response object, None for notifications (requests without id)
+        """
+        request_id = request.get("id") if isinstance(request, dict) else None
+        try:
+            if (not isinstance(request, dict) or request.get("jsonrpc") != "2.0"
+                    or not isinstance(request.get("method"), str)):
+                raise RpcError(INVALID_REQUEST, "Invalid JSON-RPC 2.0 request")
+            method = self._methods.get(request["method"])
+            if method is None:
+                raise RpcError(METHOD_NOT_FOUND, f"Unknown method: {request['method']}")
+            params = request.get("params", {})
+            if not isinstance(params, dict):
+                raise RpcError(INVALID_PARAMS, "params must be an object")
+            result = self._executor.submit(self._call, request["method"], method, params).result()
+        except RpcError as e:
+            error = {"code": e.code, "message": str(e)}
+            if e.data is not None:
+                error["data"] = e.data
+            return {"jsonrpc": "2.0", "error": error, "id": request_id}
+        if isinstance(request, dict) and "id" not in request:
+            return None
+        return {"jsonrpc": "2.0", "result": result, "id": request_id}
+
+    def _call(self, name: str, method: Callable[[Dict[str, Any]], Any], params: Dict[str, Any]) -> Any:
+        with self._lock:
+            self._active += 1
+        start = time.perf_counter()
+        failed = True
+        try:
+            result = method(params)
+            failed = False
+            return result
+        except RpcError:
+            raise
+        except (ArxmlMergerException, OSError) as e:
+            raise RpcError(MERGE_ERROR, str(e), {"type": type(e).__name__})
+        except Exception as e:
+            self.logger.exception("%s failed", name)
+            raise RpcError(INTERNAL_ERROR, str(e), {"type": type(e).__name__})
+        finally:
+            latency = time.perf_counter() - start
+            with self._lock:
+                self._active -= 1
+                self._metrics.setdefault(name, _MethodMetrics()).record(latency, failed)
+            self.logger.info("%s: %.3fs%s", name, latency, " (failed)" if failed else "")
+
+    # --- Warm state ---
+
+    def _request_config(self, params: Dict[str, Any]) -> MergeConfig:
+        """Default configuration with the request's overrides"""
+        overrides = params.get("config") or {}
+        if not isinstance(overrides, dict):
+            raise RpcError(INVALID_PARAMS, "config must be an object")
+        overrides = dict(overrides)
+        known = {config_field.name for config_field in fields(MergeConfig)}
+        unknown = sorted(set(overrides) - known)
+        if unknown:
+            raise RpcError(INVALID_PARAMS, f"Unknown config fields: {unknown}")
+        if "conflict_resolution" in overrides:
+            try:
+                overrides["conflict_resolution"] = ConflictResolutionStrategy(overrides["conflict_resolution"])
+            except ValueError as e:
+                raise RpcError(INVALID_PARAMS, str(e))
+        values = {config_field.name: getattr(self.config, config_field.name)
+                  for config_field in fields(MergeConfig)}
+        values.update(overrides)
+        return MergeConfig(**values)
+
+    def _merger(self, config: MergeConfig) -> ArxmlMerger:
+        """A merger for one request, sharing parsed inputs with the others (schema tables are process-wide)"""
+        try:
+            merger = ArxmlMerger(config)
+            parser_key = json.dumps([config.get_parser_options(), sorted(config.ignore_elements),
+                                     config.custom_split_keys], sort_keys=True)
+        except (ArxmlMergerException, TypeError, ValueError) as e:
+            # Ungültige Werte der config-Überschreibungen
+            raise RpcError(INVALID_PARAMS, f"Invalid config: {e}")
+        with self._lock:
+            models = self._models.get(parser_key)
+            if models is None:
+                models = self._models[parser_key] = ModelStore(self.max_models)
+                while len(self._models) > _MAX_MODEL_STORES:
+                    self._models.popitem(last=False)
+            self._models.move_to_end(parser_key)
+        merger.models = models
+        return merger
+
+    @staticmethod
+    def _files(params: Dict[str, Any]) -> List[Path]:
+        files = params.get("files")
+        if not isinstance(files, list) or not files or not all(isinstance(f, str) for f in files):
+            raise RpcError(INVALID_PARAMS, "files must be a non-empty list of paths")
+        return [Path(file_path) for file_path in files]
+
+    def _merge_result(self, params: Dict[str, Any]) -> MergeResult:
+        """Merges the request's files, reusing a recent result for unchanged inputs"""
+        config = self._request_config(params)
+        files = self._files(params)
+        key = (
+            json.dumps(config_fingerprint(config), sort_keys=True, default=lambda value: getattr(value, "value", str(value))),
+            tuple(str(file_path.resolve()) for file_path in files),
+            tuple(hash_files(files)),
+        )
+        with self._lock:
+            result = self._results.get(key)
+            if result is not None:
+                self._results.move_to_end(key)
+                self._result_hits += 1
+                return result
+
+        with self._merger(config) as merger:
+            result = merger.merge_files(files)
+        with self._lock:
+            self._results[key] = result
+            while len(self._results) > self.result_cache_size:
+                self._results.popitem(last=False)
+        return result
+
+    # --- Methods ---
+
+    def merge(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Merges files; writes params['output'] if given, otherwise returns the merged XML"""
+        output = params.get("output")
+        pretty_print = params.get("pretty_print", True)
+        manifest = params.get("manifest")
+        if not all(value is None or isinstance(value, str) for value in (output, manifest)):
+            raise RpcError(INVALID_PARAMS, "output and manifest must be paths")
+        if not isinstance(pretty_print, bool):
+            raise RpcError(INVALID_PARAMS, "pretty_print must be a boolean")
+        if params.get("incremental"):
+            if not output:
+                raise RpcError(INVALID_PARAMS, "incremental merge needs an output")
+            config = self._request_config(params)
+            if config.optimize_order:
+                raise RpcError(INVALID_PARAMS, "incremental merge does not support optimize_order")
+            merger = self._merger(config)
+            result = merger.merge_incremental(self._files(params), output, manifest, pretty_print=pretty_print)
+        else:
+            result = self._merge_result(params)
+            if output:
+                Path(output).parent.mkdir(parents=True, exist_ok=True)
+                # Das Ergebnis kann von parallelen Anfragen geteilt sein, save ändert den Baum nicht
+                result.save(output, pretty_print=pretty_print)
+
+        response = {
+            "statistics": asdict(result.statistics),
+            "conflicts": [conflict.to_dict() for conflict in result.conflicts],
+        }
+        if output:
+            response["output"] = str(output)
+        else:
+            response["xml"] = result.to_string(pretty_print=pretty_print)
+        return response
+
+    def plan(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Dry-run plan of a merge"""
+        plan = self._merger(self._request_config(params)).plan_files(self._files(params))
+        return {
+            "files": plan.files,
+            "conflict_resolution": plan.conflict_resolution.value,
+            "planning_time": plan.planning_time,
+            "new_elements": plan.new_elements,
+            "merged_elements": plan.merged_elements,
+            "replaced_elements": plan.replaced_elements,
+            "conflicts": plan.conflicts,
+            "packages": [asdict(package) for package in plan.packages.values()],
+            "report": plan.format_report(),
+        }
+
+    def query(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Looks up an element of the merged model by its AUTOSAR reference"""
+        reference = params.get("reference")
+        if not isinstance(reference, str) or not reference.strip("/"):
+            raise RpcError(INVALID_PARAMS, "reference must be an AUTOSAR path like /Package/Element")
+        result = self._merge_result(params)
+        element = find_by_reference(result.merged_tree, reference)
+        if element is None:
+            return {"reference": reference, "found": False}
+        return {
+            "reference": reference,
+            "found": True,
+            "tag": etree.QName(element).localname,
+            "path": get_autosar_path(element),
+            "xml": etree.tostring(element, encoding="unicode", with_tail=False),
+        }
+
+    def validate(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Structure and split-key checks of every file, without merging"""
+        merger = self._merger(self._request_config(params))
+        reports = []
+        for file_path in self._files(params):
+            report: Dict[str, Any] = {"file": str(file_path)}
+            try:
+                with merger._merge_context():
+                    arxml_file = merger._load_files([file_path])[0]
+            except ArxmlMergerException as e:
+                report["error"] = str(e)
+                reports.append(report)
+                continue
+            split_key_errors = arxml_file.split_key_errors
+            if split_key_errors is None:
+                split_key_errors = merger._validate_partial_model_constraints(arxml_file)
+            report.update(schema_version=arxml_file.schema_version,
+                          structure_errors=validate_arxml_structure(arxml_file.root_element),
+                          split_key_errors=split_key_errors)
+            reports.append(report)
+        valid = all(not report.get("error") and not report["structure_errors"] for report in reports)
+        return {"valid": valid, "files": reports}
+
+    def metrics(self) -> Dict[str, Any]:
+        """Latency per method (seconds) and the size of the warm state"""
+        with self._lock:
+            return {
+                "uptime": time.time() - self.started,
+                "workers": self.workers,
+                "active_requests": self._active,
+                "methods": {name: metrics.to_dict() for name, metrics in self._metrics.items()},
+                "models_in_memory": sum(len(models) for models in self._models.values()),
+                "results_in_memory": len(self._results),
+                "result_hits": self._result_hits,
+                "schema_versions": SchemaDetector.shared_schema_versions(),
+            }
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    """HTTP transport of the JSON-RPC requests"""
+
+    server_version = "arxml-merger"
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length))
+        except ValueError as e:
+            self._send_json({"jsonrpc": "2.0", "error": {"code": PARSE_ERROR, "message": str(e)}, "id": None})
+            return
+        response = self.server.service.handle(request)
+        if response is None:
+            self.send_response(204)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self._send_json(response)
+
+    def do_GET(self):
+        if self.path.rstrip("/") != "/metrics":
+            self.send_error(404)
+            return
+        self._send_json(self.server.service.metrics())
+
+    def _send_json(self, body: Dict[str, Any]) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def address_string(self) -> str:
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def log_message(self, format: str, *args) -> None:
+        logging.getLogger("arxml_merger").debug("%s %s", self.address_string(), format % args)
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def server_bind(self):
+        socketserver.UnixStreamServer.server_bind(self)
+        self.server_name, self.server_port = "localhost", 0
+
+    def server_close(self):
+        socketserver.UnixStreamServer.server_close(self)
+        try:
+            os.unlink(self.server_address)
+        except OSError:
+            pass
+
+
+def create_server(service: MergeService, address: str = DEFAULT_ADDRESS) -> socketserver.BaseServer:
+    """
+    Creates the HTTP server of a merge service
+
+    Args:
+        service: Service executing the requests
+        address: "HOST:PORT" (port 0 picks a free port) or "unix:/path/to/socket"
+
+    Returns:
+        Server; call serve_forever() to run it and shutdown() from another thread to stop it
+    """
+    if address.startswith("unix:"):
+        socket_path = address[len("unix:"):]
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)  # Überbleibsel eines beendeten Servers
+        server = _UnixHTTPServer(socket_path, _RequestHandler)
+    else:
+        host, _, port = address.rpartition(":")
+        if host not in ("localhost", "127.0.0.1", "::1"):
+            raise ValueError(f"merge server only listens on localhost, got '{host}'")
+        server = ThreadingHTTPServer((host, int(port)), _RequestHandler)
+    server.service = service
+    return server
@@ -3,31 +3,122 @@ __init__.py für utils Modul
 """
 
 from .xml_utils import (
+    get_local_name,
+    remove_element,
+    parse_pruned,
+    prune_element,
     get_element_path,
     get_element_signature,
     find_matching_element,
     merge_attributes,
     normalize_whitespace,
     create_element_hash,
+    compute_subtree_digest,
+    compute_subtree_digests,
     validate_arxml_structure,
     setup_logging,
+    get_logger,
     deep_copy_element,
     get_namespace_prefix,
     remove_empty_elements,
-    format_xml_pretty
+    format_xml_pretty,
+    get_short_name,
+    find_by_reference
+)
+from .serialization import (
+    iter_serialized_chunks,
+    iter_serialized_slots,
+    new_placeholder_marker,
+    resolve_workers,
+    serialize_package,
+    supports_splicing,
+    write_tree
+)
+from .compression import (
+    COMPRESSIONS,
+    compression_from_suffix,
+    strip_compression_suffix,
+    detect_compression,
+    check_compression,
+    open_input,
+    open_output
+)
+from .archives import (
+    is_archive,
+    member_path,
+    matches_any,
+    select_members,
+    load_archive
+)
+from .discovery import (
+    DEFAULT_INPUT_PATTERNS,
+    discovery_cache_file,
+    discover_files,
+    read_manifest
+)
+from .parsing import (
+    PARSER_PROFILES,
+    resolve_parser_options,
+    get_parser
+)
+from .pruning import PruningReader, validate_ignore_elements
+from .memory import (
+    peak_rss,
+    reset_peak_rss,
+    suspended_gc
 )
 
 __all__ = [
+    "get_local_name",
+    "remove_element",
+    "parse_pruned",
+    "prune_element",
+    "PruningReader",
+    "validate_ignore_elements",
     "get_element_path",
     "get_element_signature", 
     "find_matching_element",
     "merge_attributes",
     "normalize_whitespace",
     "create_element_hash",
+    "compute_subtree_digest",
+    "compute_subtree_digests",
     "validate_arxml_structure",
     "setup_logging",
+    "get_logger",
     "deep_copy_element",
     "get_namespace_prefix",
     "remove_empty_elements",
-    "format_xml_pretty"
+    "format_xml_pretty",
+    "get_short_name",
+    "find_by_reference",
+    "iter_serialized_chunks",
+    "iter_serialized_slots",
+    "new_placeholder_marker",
+    "resolve_workers",
+    "serialize_package",
+    "supports_splicing",
+    "write_tree",
+    "COMPRESSIONS",
+    "compression_from_suffix",
+    "strip_compression_suffix",
+    "detect_compression",
+    "check_compression",
+    "open_input",
+    "open_output",
+    "is_archive",
+    "member_path",
+    "matches_any",
+    "select_members",
+    "load_archive",
+    "DEFAULT_INPUT_PATTERNS",
+    "discovery_cache_file",
+    "discover_files",
+    "read_manifest",
+    "PARSER_PROFILES",
+    "resolve_parser_options",
+    "get_parser",
+    "peak_rss",
+    "reset_peak_rss",
+    "suspended_gc"
 ]
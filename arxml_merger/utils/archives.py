@@ -0,0 +1,135 @@
+"""
+ZIP and TAR model bundles as merge inputs
+
+Members are streamed straight into the parser without extracting them to disk. ZIP members
+can be read in parallel, TAR archives are read in one sequential pass (compressed TARs are
+not seekable). Either way the loaded members are returned sorted by member name, so the merge
+order does not depend on how the bundle was packed.
+"""
+
+from typing import IO, Callable, Iterable, List, Optional, Tuple, TypeVar, Union
+from concurrent.futures import ThreadPoolExecutor
+from fnmatch import fnmatchcase
+from pathlib import Path
+import tarfile
+import threading
+import zipfile
+
+
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.xz", ".txz", ".tar.bz2", ".tbz2")
+
+# Default include filter for archive members
+DEFAULT_MEMBER_PATTERNS = ("*.arxml",)
+
+T = TypeVar("T")
+MemberLoader = Callable[[str, IO[bytes]], T]
+
+
+def is_archive(path: Union[str, Path]) -> bool:
+    """Checks by file extension whether a path is a ZIP or TAR bundle"""
+    return str(path).lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def member_path(archive: Union[str, Path], member: str) -> Path:
+    """Display path of an archive member: bundle.zip!/models/a.arxml"""
+    return Path(f"{archive}!/{member}")
+
+
+def matches_any(name: str, patterns: Iterable[str]) -> bool:
+    """Case-insensitive glob match of a name (*.arxml also matches MODEL.ARXML)"""
+    name = name.lower()
+    return any(fnmatchcase(name, pattern.lower()) for pattern in patterns)
+
+
+def select_members(names: Iterable[str],
+                   include: Optional[Iterable[str]] = None,
+                   exclude: Optional[Iterable[str]] = None) -> List[str]:
+    """
+    Filters member names with glob patterns (case-insensitive) and sorts them
+
+    Args:
+        names: Member names inside the archive
+        include: Patterns a member must match (default: DEFAULT_MEMBER_PATTERNS)
+        exclude: Patterns that drop a member
+
+    Returns:
+        Selected member names in sorted order
+    """
+    include = list(include) if include else list(DEFAULT_MEMBER_PATTERNS)
+    exclude = list(exclude or [])
+    return sorted(
+        name for name in names
+        if matches_any(name, include) and not matches_any(name, exclude)
+    )
+
+
+def load_archive(path: Union[str, Path],
+                 load: MemberLoader,
+                 include: Optional[Iterable[str]] = None,
+                 exclude: Optional[Iterable[str]] = None,
+                 workers: int = 1) -> List[Tuple[str, T]]:
+    """
+    Streams the selected members of a ZIP or TAR archive into a loader
+
+    Args:
+        path: Archive path
+        load: Called with member name and binary stream, returns the loaded member
+        include: Glob patterns for member names (default: *.arxml)
+        exclude: Glob patterns for member names to skip
+        workers: Threads loading ZIP members in parallel
+
+    Returns:
+        (member name, loaded member) pairs sorted by member name
+    """
+    if zipfile.is_zipfile(path):
+        return _load_zip(path, load, include, exclude, workers)
+    return _load_tar(path, load, include, exclude)
+
+
+def _load_zip(path: Union[str, Path], load: MemberLoader,
+              include: Optional[Iterable[str]], exclude: Optional[Iterable[str]],
+              workers: int) -> List[Tuple[str, T]]:
+    with zipfile.ZipFile(path) as archive:
+        names = select_members([info.filename for info in archive.infolist() if not info.is_dir()],
+                               include, exclude)
+        if workers <= 1 or len(names) <= 1:
+            results = []
+            for name in names:
+                with archive.open(name) as stream:
+                    results.append((name, load(name, stream)))
+            return results
+
+    # Jeder Thread liest über ein eigenes ZipFile-Handle
+    local = threading.local()
+    handles = []
+    handles_lock = threading.Lock()
+
+    def load_member(name: str) -> Tuple[str, T]:
+        handle = getattr(local, "archive", None)
+        if handle is None:
+            handle = local.archive = zipfile.ZipFile(path)
+            with handles_lock:
+                handles.append(handle)
+        with handle.open(name) as stream:
+            return name, load(name, stream)
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="arxml-archive") as executor:
+            return list(executor.map(load_member, names))
+    finally:
+        for handle in handles:
+            handle.close()
+
+
+def _load_tar(path: Union[str, Path], load: MemberLoader,
+              include: Optional[Iterable[str]], exclude: Optional[Iterable[str]]) -> List[Tuple[str, T]]:
+    results = []
+    # Streaming-Modus: ein Durchlauf, auch für gz/xz/bz2-komprimierte TARs
+    with tarfile.open(path, "r|*") as archive:
+        for member in archive:
+            if not member.isfile() or not select_members([member.name], include, exclude):
+                continue
+            stream = archive.extractfile(member)
+            results.append((member.name, load(member.name, stream)))
+    results.sort(key=lambda item: item[0])
+    return results
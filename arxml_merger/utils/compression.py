@@ -0,0 +1,133 @@
+"""
+Transparent compression for ARXML input and output
+
+Inputs are recognized by their magic bytes, outputs by their file extension or an explicit
+compression name. Data is always (de)compressed as a stream, never via a temporary file.
+zstd needs the optional 'zstandard' package.
+"""
+
+from typing import IO, Optional, Union
+from pathlib import Path
+import gzip
+import lzma
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+
+COMPRESSIONS = ("gzip", "xz", "zstd")
+
+COMPRESSION_SUFFIXES = {
+    ".gz": "gzip",
+    ".gzip": "gzip",
+    ".xz": "xz",
+    ".zst": "zstd",
+    ".zstd": "zstd",
+}
+
+# gzip compresslevel, xz preset, zstd level
+DEFAULT_COMPRESSION_LEVELS = {"gzip": 6, "xz": 6, "zstd": 3}
+
+# Gültige Level je Codec (zstd: negative Level sind schnelle Modi)
+COMPRESSION_LEVEL_RANGES = {"gzip": (0, 9), "xz": (0, 9), "zstd": (-(1 << 17), 22)}
+
+_MAGIC_BYTES = (
+    (b"\x1f\x8b", "gzip"),
+    (b"\xfd7zXZ\x00", "xz"),
+    (b"\x28\xb5\x2f\xfd", "zstd"),
+)
+
+
+def compression_from_suffix(path: Union[str, Path]) -> Optional[str]:
+    """Returns the compression implied by the file extension (model.arxml.gz -> gzip)"""
+    return COMPRESSION_SUFFIXES.get(Path(path).suffix.lower())
+
+
+def strip_compression_suffix(path: Union[str, Path]) -> Path:
+    """Removes a compression extension: model.arxml.xz -> model.arxml"""
+    path = Path(path)
+    if path.suffix.lower() in COMPRESSION_SUFFIXES:
+        return path.with_suffix("")
+    return path
+
+
+def detect_compression(path: Union[str, Path]) -> Optional[str]:
+    """Detects the compression of a file from its magic bytes, None for uncompressed files"""
+    with open(path, "rb") as stream:
+        header = stream.read(6)
+    for magic, compression in _MAGIC_BYTES:
+        if header.startswith(magic):
+            return compression
+    return None
+
+
+def check_compression(compression: Optional[str], level: Optional[int] = None) -> None:
+    """
+    Raises ValueError for unknown or unavailable compressions and invalid levels
+
+    Args:
+        compression: Codec; None checks only that level is valid for at least one codec
+            (the codec is chosen later, e.g. by the output file extension)
+        level: Compression level, None for the codec's default
+    """
+    if compression is not None:
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unknown compression '{compression}', expected one of {list(COMPRESSIONS)}")
+        if compression == "zstd" and zstandard is None:
+            raise ValueError("zstd compression requires the 'zstandard' package")
+    if level is None:
+        return
+    if not isinstance(level, int) or isinstance(level, bool):
+        raise ValueError(f"Compression level must be an integer, got {level!r}")
+    codecs = [compression] if compression is not None else list(COMPRESSIONS)
+    if not any(low <= level <= high for low, high in (COMPRESSION_LEVEL_RANGES[codec] for codec in codecs)):
+        ranges = ", ".join(f"{codec} {COMPRESSION_LEVEL_RANGES[codec][0]}..{COMPRESSION_LEVEL_RANGES[codec][1]}"
+                           for codec in codecs)
+        raise ValueError(f"Invalid compression level {level} ({ranges})")
+
+
+def open_input(path: Union[str, Path]) -> IO[bytes]:
+    """Opens a file for reading and decompresses it on the fly if it is compressed"""
+    compression = detect_compression(path)
+    if compression is None:
+        return open(path, "rb")
+
+    check_compression(compression)
+    if compression == "gzip":
+        return gzip.open(path, "rb")
+    if compression == "xz":
+        return lzma.open(path, "rb")
+    return zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), read_across_frames=True,
+                                                      closefd=True)
+
+
+def open_output(output: Union[str, Path, IO[bytes]], compression: str,
+                level: Optional[int] = None) -> IO[bytes]:
+    """
+    Opens a compressing binary stream on a path or an existing stream
+
+    Args:
+        output: Output path or binary stream; a stream is not closed with the returned one
+        compression: "gzip", "xz" or "zstd"
+        level: Compression level, DEFAULT_COMPRESSION_LEVELS if None
+
+    Returns:
+        Writable binary stream; closing it flushes the compressor
+    """
+    check_compression(compression)
+    if level is None:
+        level = DEFAULT_COMPRESSION_LEVELS[compression]
+
+    if compression == "gzip":
+        if hasattr(output, "write"):
+            return gzip.GzipFile(fileobj=output, mode="wb", compresslevel=level)
+        return gzip.open(output, "wb", compresslevel=level)
+    if compression == "xz":
+        return lzma.open(output, "wb", preset=level)
+
+    compressor = zstandard.ZstdCompressor(level=level)
+    if hasattr(output, "write"):
+        return compressor.stream_writer(output, closefd=False)
+    return compressor.stream_writer(open(output, "wb"), closefd=True)
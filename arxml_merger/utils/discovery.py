@@ -0,0 +1,190 @@
+"""
+Input discovery for very large file sets: directory scans and manifest files
+
+Directories are scanned concurrently and the result is sorted, so the merge order does not
+depend on the file system. The resolved file list is cached together with the modification
+times of all scanned directories; a repeated run only stats the directories instead of
+listing them again. Adding, removing or renaming a file changes its directory's mtime and
+invalidates the cache.
+"""
+
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+import hashlib
+import json
+import os
+import re
+import tempfile
+
+from .archives import matches_any
+
+
+DEFAULT_INPUT_PATTERNS = ("*.arxml", "*.arxml.gz", "*.arxml.xz", "*.arxml.zst")
+
+_CACHE_FORMAT_VERSION = 1
+
+# Manifest line: "[priority] path", e.g. "10 supplier/overrides.arxml"
+_MANIFEST_LINE = re.compile(r"^(-?\d+)\s+(.+)$")
+
+
+def discovery_cache_file(cache_dir: Union[str, Path], directories: Iterable[Union[str, Path]],
+                         patterns: Sequence[str] = DEFAULT_INPUT_PATTERNS) -> Path:
+    """Cache file for a set of input directories and patterns below a configured cache directory"""
+    key = json.dumps([sorted(str(Path(d).resolve()) for d in directories), list(patterns)])
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+    return Path(cache_dir) / "discovery" / f"{digest}.json"
+
+
+def _scan_directory(directory: str) -> Tuple[int, List[str], List[str]]:
+    """Lists one directory: (mtime_ns, files, subdirectories)"""
+    files, subdirectories = [], []
+    mtime_ns = os.stat(directory).st_mtime_ns
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                subdirectories.append(entry.path)
+            elif entry.is_file():
+                files.append(entry.path)
+    return mtime_ns, files, subdirectories
+
+
+def _scan_tree(roots: List[str], executor: ThreadPoolExecutor) -> Tuple[Dict[str, int], List[str]]:
+    """Scans directory trees concurrently, one task per directory"""
+    directories: Dict[str, int] = {}
+    files: List[str] = []
+    pending = {executor.submit(_scan_directory, root): root for root in roots}
+    while pending:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            directory = pending.pop(future)
+            mtime_ns, directory_files, subdirectories = future.result()
+            directories[directory] = mtime_ns
+            files.extend(directory_files)
+            for subdirectory in subdirectories:
+                if subdirectory not in directories:
+                    pending[executor.submit(_scan_directory, subdirectory)] = subdirectory
+    return directories, files
+
+
+def _directory_mtime(directory: str) -> Optional[int]:
+    try:
+        return os.stat(directory).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _load_cached_files(cache_file: Path, roots: List[str], patterns: Sequence[str],
+                       executor: ThreadPoolExecutor) -> Optional[List[Path]]:
+    """Returns the cached file list if no scanned directory has changed since"""
+    try:
+        cache = json.loads(cache_file.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if (cache.get("version") != _CACHE_FORMAT_VERSION or cache.get("roots") != roots
+            or cache.get("patterns") != list(patterns)):
+        return None
+
+    directories = cache.get("directories", {})
+    mtimes = executor.map(_directory_mtime, directories)
+    if any(mtime != directories[directory] for directory, mtime in zip(directories, mtimes)):
+        return None
+    return [Path(file_path) for file_path in cache.get("files", [])]
+
+
+def _store_cached_files(cache_file: Path, roots: List[str], patterns: Sequence[str],
+                        directories: Dict[str, int], files: List[Path]) -> None:
+    cache = {
+        "version": _CACHE_FORMAT_VERSION,
+        "roots": roots,
+        "patterns": list(patterns),
+        "directories": directories,
+        "files": [str(file_path) for file_path in files],
+    }
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        # Atomar ersetzen, damit parallele Läufe keinen halben Cache lesen
+        fd, temp_name = tempfile.mkstemp(dir=cache_file.parent, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as stream:
+            json.dump(cache, stream)
+        os.replace(temp_name, cache_file)
+    except OSError:
+        pass  # ein fehlender Cache kostet nur den nächsten Scan
+
+
+def discover_files(directories: Iterable[Union[str, Path]],
+                   patterns: Sequence[str] = DEFAULT_INPUT_PATTERNS,
+                   cache_file: Optional[Union[str, Path]] = None,
+                   workers: Optional[int] = None) -> List[Path]:
+    """
+    Recursively discovers input files below one or more directories
+
+    Args:
+        directories: Root directories to scan
+        patterns: Case-insensitive glob patterns for file names (default: ARXML files, also compressed)
+        cache_file: File caching the resolved list between runs, None disables caching
+        workers: Threads listing and stat-ing directories (default: ThreadPoolExecutor's)
+
+    Returns:
+        Matching files sorted by path
+    """
+    roots = [str(Path(directory).resolve()) for directory in directories]
+    for root in roots:
+        if not os.path.isdir(root):
+            raise NotADirectoryError(f"Input directory not found: {root}")
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="arxml-discovery") as executor:
+        if cache_file is not None:
+            cached = _load_cached_files(Path(cache_file), roots, patterns, executor)
+            if cached is not None:
+                return cached
+
+        scanned_directories, scanned_files = _scan_tree(roots, executor)
+
+    files = sorted(
+        Path(file_path) for file_path in scanned_files
+        if matches_any(os.path.basename(file_path), patterns)
+    )
+    if cache_file is not None:
+        _store_cached_files(Path(cache_file), roots, patterns, scanned_directories, files)
+    return files
+
+
+def read_manifest(manifest_path: Union[str, Path], workers: Optional[int] = None) -> List[Path]:
+    """
+    Reads a manifest listing input files, one per line
+
+    Lines have the form "path" or "priority path"; blank lines and lines starting with '#'
+    are ignored. Relative paths are resolved against the manifest's directory. Files are
+    ordered by ascending priority (default 0) and keep their manifest order within a
+    priority, so higher priorities are merged later. All files are stat-ed concurrently.
+
+    Args:
+        manifest_path: Manifest file
+        workers: Threads checking the listed files
+
+    Returns:
+        Files in merge order
+    """
+    manifest_path = Path(manifest_path)
+    base_dir = manifest_path.parent
+    entries = []
+    for line_number, line in enumerate(manifest_path.read_text(encoding="utf-8").splitlines(), 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        priority = 0
+        match = _MANIFEST_LINE.match(line)
+        if match:
+            priority, line = int(match.group(1)), match.group(2).strip()
+        entries.append((priority, line_number, base_dir / line))
+
+    entries.sort(key=lambda entry: (entry[0], entry[1]))
+    files = [file_path for _, _, file_path in entries]
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="arxml-discovery") as executor:
+        missing = [str(file_path) for file_path, exists in zip(files, executor.map(os.path.isfile, files))
+                   if not exists]
+    if missing:
+        raise FileNotFoundError(f"Files listed in manifest {manifest_path} not found: {missing}")
+    return files
@@ -0,0 +1,79 @@
+"""
+Process memory measurement and garbage collector control for the merge
+
+Peak RSS is read from /proc/self/status (VmHWM) on Linux, where it can be reset per merge
+via /proc/self/clear_refs; elsewhere resource.getrusage reports the peak of the whole
+process. lxml trees are freed by reference counting, so suspending the cyclic garbage
+collector during a merge only saves the collector's passes over the Python-side objects.
+"""
+
+from typing import Iterator, Optional
+from contextlib import contextmanager
+import gc
+import sys
+import threading
+
+try:
+    import resource
+except ImportError:  # nicht auf Windows
+    resource = None
+
+
+_PROC_STATUS = "/proc/self/status"
+_PROC_CLEAR_REFS = "/proc/self/clear_refs"
+
+# Laufende suspended_gc-Blöcke aller Threads und ob der Collector davor aktiv war
+_gc_lock = threading.Lock()
+_gc_suspensions = 0
+_gc_was_enabled = False
+
+
+def reset_peak_rss() -> bool:
+    """Resets the peak RSS of the process (Linux only), returns whether it was reset"""
+    try:
+        with open(_PROC_CLEAR_REFS, "w") as stream:
+            stream.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss() -> Optional[int]:
+    """Peak resident set size in bytes since start or the last reset_peak_rss(), None if unknown"""
+    try:
+        with open(_PROC_STATUS) as stream:
+            for line in stream:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss if sys.platform == "darwin" else max_rss * 1024  # macOS: Bytes, sonst KiB
+
+
+@contextmanager
+def suspended_gc(enabled: bool = True) -> Iterator[None]:
+    """
+    Disables the cyclic garbage collector inside the block (no-op if not enabled)
+
+    Blocks of merges running in several threads are counted: the collector is enabled again
+    when the last block ends, and only if it was enabled when the first one started.
+    """
+    global _gc_suspensions, _gc_was_enabled
+    if not enabled:
+        yield
+        return
+    with _gc_lock:
+        if _gc_suspensions == 0:
+            _gc_was_enabled = gc.isenabled()
+            gc.disable()
+        _gc_suspensions += 1
+    try:
+        yield
+    finally:
+        with _gc_lock:
+            _gc_suspensions -= 1
+            if _gc_suspensions == 0 and _gc_was_enabled:
+                gc.enable()
@@ -0,0 +1,63 @@
+"""
+Parser profiles for loading ARXML files
+
+Profiles map the MergeConfig flags onto lxml parser options:
+
+- fast:     drops whitespace-only text nodes, no ID collection; output is re-indented on save
+- faithful: keeps whitespace and comments exactly as in the source files
+- huge:     like fast, but lifts libxml2's size and depth limits for very large models
+"""
+
+from typing import Dict, Optional
+import threading
+
+from lxml import etree
+
+
+PARSER_PROFILES: Dict[str, Dict[str, bool]] = {
+    "fast": {"remove_blank_text": True, "collect_ids": False},
+    "faithful": {"remove_blank_text": False},
+    "huge": {"remove_blank_text": True, "collect_ids": False, "huge_tree": True},
+}
+
+_thread_local = threading.local()
+
+
+def resolve_parser_options(profile: Optional[str] = None,
+                           preserve_comments: bool = True,
+                           preserve_formatting: bool = True) -> Dict[str, bool]:
+    """
+    Resolves the lxml parser options for a profile and the preserve flags
+
+    Args:
+        profile: Profile name; None selects "faithful" if formatting is preserved, otherwise "fast"
+        preserve_comments: Keep XML comments
+        preserve_formatting: Keep whitespace-only text nodes (overrides the profile)
+
+    Returns:
+        Keyword arguments for etree.XMLParser / etree.iterparse
+    """
+    if profile is None:
+        profile = "faithful" if preserve_formatting else "fast"
+    if profile not in PARSER_PROFILES:
+        raise ValueError(f"Unknown parser profile '{profile}', expected one of {sorted(PARSER_PROFILES)}")
+
+    options = {"resolve_entities": False}
+    options.update(PARSER_PROFILES[profile])
+    options["remove_comments"] = not preserve_comments
+    if preserve_formatting:
+        options["remove_blank_text"] = False
+    return options
+
+
+def get_parser(**options: bool) -> etree.XMLParser:
+    """Returns a parser with the given options, reused per thread (lxml parsers are not thread-safe)"""
+    parsers = getattr(_thread_local, "parsers", None)
+    if parsers is None:
+        parsers = _thread_local.parsers = {}
+
+    key = tuple(sorted(options.items()))
+    parser = parsers.get(key)
+    if parser is None:
+        parser = parsers[key] = etree.XMLParser(**options)
+    return parser
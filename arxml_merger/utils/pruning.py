@@ -0,0 +1,359 @@
+"""
+Byte-level pruning of ignored elements before the XML parser sees them
+
+PruningReader wraps a binary input stream and drops the subtrees of MergeConfig.ignore_elements
+from the bytes passed on to libxml2, so the parser never builds them: parse time and peak
+memory only cover the kept document. The skipped nodes and bytes per tag are counted from
+the positions in the source.
+
+The scanner only looks for the names of the ignored elements and for comments, CDATA
+sections and processing instructions, in which a name is only text; everything else is
+passed through unchanged. Whitespace around a dropped element is joined like
+remove_element does, or dropped if the parser removes blank text anyway. An ignored element
+inside another one is counted with the outer element. Inputs in an encoding that is not
+ASCII compatible (UTF-16) are passed through unpruned; the caller prunes those after parsing.
+"""
+
+from typing import Dict, IO, Iterable, List, Optional, Tuple
+import re
+
+
+_CHUNK_SIZE = 1 << 20
+
+_PROLOG = re.compile(rb"\xef\xbb\xbf|\s+|<\?.*?\?>|<!--.*?-->|<!DOCTYPE(?:[^\[>]|\[.*?\])*>", re.S)
+_START_TAG_END = re.compile(rb"""(?:\s+[^\s=/>]+\s*=\s*(?:"[^"]*"|'[^']*'))*\s*(/?)>""")
+_END_TAG_END = re.compile(rb"\s*>")
+_UTF16_STARTS = (b"\xff\xfe", b"\xfe\xff", b"\x00<", b"<\x00")
+_NAME_END = frozenset(b" \t\r\n/>")
+_PREFIX_CHARS = frozenset(b"abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_.-")
+_WHITESPACE = frozenset(b" \t\r\n")
+
+# Tokens, in denen ein Tag-Name nur Text ist: Anfang, Ende, Art ("node" wird als Knoten gezählt)
+_OPAQUE = ((b"<!--", b"-->", "node"), (b"<![CDATA[", b"]]>", "text"), (b"<?", b"?>", "node"))
+
+# Ignorierte Elemente werden über ihren lokalen Namen in den Rohbytes gesucht: nur ASCII-XML-Namen
+_ELEMENT_NAME = re.compile(r"[A-Za-z_][A-Za-z0-9._-]*")
+
+# Token des Scanners: Art ("tag", "node", "text" oder "more"), Start, Ende, Name, End-Tag, leeres Element
+Token = Tuple[str, int, int, Optional[bytes], bool, bool]
+
+
+def validate_ignore_elements(ignore_elements: Iterable[str]) -> List[str]:
+    """Validates MergeConfig.ignore_elements; raises ValueError naming the first invalid entry"""
+    if isinstance(ignore_elements, str):
+        raise ValueError(f"ignore_elements must be a list of element names, got {ignore_elements!r}")
+    names = list(ignore_elements)
+    for name in names:
+        if not isinstance(name, str) or not _ELEMENT_NAME.fullmatch(name):
+            raise ValueError(f"Invalid element name in ignore_elements: {name!r}")
+    return names
+
+
+class PruningReader:
+    """Binary stream without the subtrees of the ignored elements"""
+
+    def __init__(self, raw: IO[bytes], ignore_elements: Iterable[str], remove_blank_text: bool = False,
+                 chunk_size: int = _CHUNK_SIZE):
+        """
+        Args:
+            raw: Binary input stream
+            ignore_elements: Local names of the elements to drop (any namespace)
+            remove_blank_text: Whether the parser drops whitespace-only text
+            chunk_size: Bytes read from raw at a time
+        """
+        self.raw = raw
+        self.remove_blank_text = remove_blank_text
+        self.chunk_size = chunk_size
+        # Übersprungene Knoten/Bytes je Tag
+        self.skipped: Dict[str, Dict[str, int]] = {}
+        self._names = [name.encode("ascii") for name in sorted(set(ignore_elements))]
+        # True, wenn die Eingabe nicht ASCII-kompatibel kodiert ist und unverändert durchgeht
+        self.passthrough = not self._names
+
+        self._buffer = b""
+        self._offset = 0  # Position von _buffer[0] in der Quelle
+        self._eof = False
+        self._started = False
+        self._in_prolog = True
+        self._out = bytearray()
+        self._last_out = b""
+        # Letzte Suche je Suchbegriff im aktuellen Puffer: (gesucht ab, gefunden bei)
+        self._found: Dict[bytes, Tuple[int, int]] = {}
+        # Ignoriertes Element, in dem der Scanner steht: Name, Verschachtelung, Startposition
+        self._ignored: Optional[bytes] = None
+        self._depth = 0
+        self._ignored_start = 0
+        # Zurückgehaltener Leerraum vor einem verworfenen Element, siehe _join_whitespace
+        self._pending: Optional[bytes] = None
+        self._after_ignored = False
+
+    def read(self, size: int = -1) -> bytes:
+        """Reads up to size bytes of the pruned document (all if size is negative)"""
+        while (size < 0 or len(self._out) < size) and not (self._eof and not self._buffer):
+            self._fill()
+            self._scan()
+        if size < 0 or size >= len(self._out):
+            data = bytes(self._out)
+            self._out.clear()
+        else:
+            data = bytes(self._out[:size])
+            del self._out[:size]
+        return data
+
+    def _fill(self) -> None:
+        chunk = self.raw.read(self.chunk_size) if not self._eof else b""
+        if not chunk:
+            self._eof = True
+        else:
+            self._buffer += chunk
+        if not self._started and (len(self._buffer) >= 2 or self._eof):
+            self._started = True
+            if self._buffer.startswith(_UTF16_STARTS):
+                self.passthrough = True
+
+    def _emit(self, data: bytes) -> None:
+        if data:
+            self._out += data
+            self._last_out = (self._last_out + data)[-3:]
+
+    def _scan(self) -> None:
+        """Passes on or drops the complete tokens of the buffer, keeps an incomplete rest"""
+        buffer = self._buffer
+        self._found = {}
+        if self.passthrough:
+            self._emit(buffer)
+            self._offset += len(buffer)
+            self._buffer = b""
+            return
+
+        pos = 0
+        if self._in_prolog:
+            pos = self._skip_prolog(buffer)
+            if pos is None:
+                return
+        # Bytes ab mark sind übernommen, aber noch nicht ausgegeben; verarbeitet ist alles vor pos
+        mark = 0
+        while True:
+            if self._ignored is not None:
+                done, pos = self._skip(buffer, pos)
+                if not done:
+                    break
+                mark = pos
+
+            if self._after_ignored:
+                joined = self._join_whitespace(buffer, pos)
+                if joined is None:
+                    break
+                pos = mark = joined
+
+            token = self._next_token(buffer, pos, self._names)
+            if token is None or token[0] == "more":
+                if token is not None:
+                    pos = token[1]
+                elif self._eof:
+                    pos = len(buffer)
+                else:
+                    # Ab dem letzten "<" kann ein unvollständiger Tag beginnen
+                    last = buffer.rfind(b"<", pos)
+                    pos = last if last >= 0 else len(buffer)
+                if not self._eof:
+                    # Leerraum davor bleibt zurück, falls dort ein verworfenes Element beginnt
+                    pos = max(_strip_end(buffer, pos), mark)
+                break
+            kind, start, end, name, closing, empty = token
+            if kind != "tag" or closing:
+                pos = end  # Kommentar usw. oder End-Tag der Wurzel
+                continue
+
+            self._emit(self._hold_indentation(buffer, mark, start))
+            stats = self.skipped.setdefault(name.decode("ascii"), {"nodes": 0, "bytes": 0})
+            stats["nodes"] += 1
+            self._after_ignored = True
+            if empty:
+                stats["bytes"] += end - start
+            else:
+                self._ignored, self._depth = name, 1
+                self._ignored_start = self._offset + start
+            pos = mark = end
+
+        if self._ignored is None:
+            self._emit(buffer[mark:pos])
+        self._offset += pos
+        self._buffer = buffer[pos:]
+
+    def _skip_prolog(self, buffer: bytes) -> Optional[int]:
+        """Returns the position after the "<" of the root element, which is never dropped"""
+        pos = 0
+        while True:
+            match = _PROLOG.match(buffer, pos)
+            if match is None or match.end() == pos:
+                break
+            pos = match.end()
+        if not self._eof and (len(buffer) - pos < 2 or buffer.startswith((b"<?", b"<!"), pos)):
+            return None  # unvollständiger Prolog-Token
+        self._in_prolog = False
+        return min(pos + 1, len(buffer))
+
+    def _hold_indentation(self, buffer: bytes, mark: int, start: int) -> bytes:
+        """Returns the kept bytes before a dropped element without its indentation, which is held back"""
+        kept = buffer[mark:start]
+        text = kept[kept.rfind(b">") + 1:]
+        before = kept[:len(kept) - len(text)] if len(text) < len(kept) else self._last_out
+        if not text.strip() and before.endswith(b">") and not before.endswith(b"]]>"):
+            # Nur Einrückung davor: erst nach dem Element entscheiden, ob sie bleibt
+            self._pending = text
+            return kept[:len(kept) - len(text)]
+        return kept
+
+    def _skip(self, buffer: bytes, pos: int) -> Tuple[bool, int]:
+        """Drops the buffer up to the end of the ignored element; returns (done, position)"""
+        name = self._ignored
+        stats = self.skipped[name.decode("ascii")]
+        while True:
+            token = self._next_token(buffer, pos, [name])
+            if token is None or token[0] == "more":
+                if token is not None:
+                    end = token[1]
+                elif self._eof:
+                    end = len(buffer)
+                else:
+                    end = buffer.rfind(b"<", pos)
+                    if end < 0:
+                        end = len(buffer)
+                stats["nodes"] += _count_elements(buffer, pos, end)
+                return False, end
+
+            kind, start, end, _, closing, empty = token
+            stats["nodes"] += _count_elements(buffer, pos, start)
+            pos = end
+            if kind != "tag":
+                stats["nodes"] += kind == "node"
+                continue
+            if not closing:
+                stats["nodes"] += 1
+                if not empty:
+                    self._depth += 1
+                continue
+            self._depth -= 1
+            if self._depth == 0:
+                self._ignored = None
+                stats["bytes"] += self._offset + end - self._ignored_start
+                return True, end
+
+    def _join_whitespace(self, buffer: bytes, pos: int) -> Optional[int]:
+        """
+        Joins the text around a dropped element like remove_element
+
+        Indentation before the element stays only if non-whitespace text follows; with
+        remove_blank_text whitespace-only text on either side is dropped, as the parser would
+        have done with the element in place. Returns where to continue, None if more data
+        is needed.
+        """
+        end = buffer.find(b"<", pos)
+        if end < 0 and not self._eof:
+            return None
+        if end < 0:
+            end = len(buffer)
+        pending, self._pending, self._after_ignored = self._pending, None, False
+        if buffer[pos:end].strip():
+            if pending and not self.remove_blank_text:
+                self._emit(pending)
+        elif self.remove_blank_text:
+            return end
+        return pos
+
+    def _find(self, buffer: bytes, needle: bytes, pos: int) -> int:
+        """buffer.find(needle, pos), reusing the last result while it still lies ahead"""
+        searched, found = self._found.get(needle, (-1, -1))
+        if searched < 0 or searched > pos or 0 <= found < pos:
+            found = buffer.find(needle, pos)
+            self._found[needle] = (pos, found)
+        return found
+
+    def _next_token(self, buffer: bytes, pos: int, names: List[bytes]) -> Optional[Token]:
+        """
+        Finds the next comment, CDATA section, processing instruction or tag of one of names
+
+        Returns a "more" token at a token that may continue after the end of the buffer and
+        None if there is no token up to the end of the buffer.
+        """
+        while True:
+            opaque = -1
+            for needle in (b"<!", b"<?"):
+                found = self._find(buffer, needle, pos)
+                if found >= 0 and (opaque < 0 or found < opaque):
+                    opaque = found
+
+            # Vor opaque beginnende Tags haben ihren Namen auch vor opaque
+            limit = opaque if opaque >= 0 else len(buffer)
+            tag = name_end = -1
+            tag_name = None
+            for name in names:
+                search = pos
+                while True:
+                    found = self._find(buffer, name, search)
+                    if found < 0 or found > limit:
+                        break
+                    start = _tag_start(buffer, found, len(name))
+                    if start is not None and start >= pos:
+                        tag, name_end, tag_name = start, found + len(name), name
+                        limit = found
+                        break
+                    search = found + 1
+
+            if opaque >= 0 and (tag < 0 or opaque < tag):
+                for opener, closer, kind in _OPAQUE:
+                    if buffer.startswith(opener, opaque):
+                        end = buffer.find(closer, opaque + len(opener))
+                        if end >= 0:
+                            return kind, opaque, end + len(closer), None, False, False
+                        if not self._eof:
+                            return "more", opaque, opaque, None, False, False
+                        break
+                else:
+                    if len(buffer) - opaque < 9 and not self._eof:
+                        return "more", opaque, opaque, None, False, False
+                pos = opaque + 2  # fehlerhaftes Dokument, libxml2 meldet den Fehler
+                continue
+
+            if tag < 0:
+                return None
+            closing = buffer[tag + 1] == 0x2F  # "/"
+            tag_end = (_END_TAG_END if closing else _START_TAG_END).match(buffer, name_end)
+            if tag_end is None:
+                if not self._eof:
+                    return "more", tag, tag, None, False, False
+                pos = name_end  # fehlerhaftes Dokument, libxml2 meldet den Fehler
+                continue
+            return "tag", tag, tag_end.end(), tag_name, closing, not closing and bool(tag_end.group(1))
+
+
+def _tag_start(buffer: bytes, found: int, length: int) -> Optional[int]:
+    """Position of the "<" if the name at found is the name of a start or end tag, else None"""
+    after = found + length
+    if after >= len(buffer) or buffer[after] not in _NAME_END:
+        return None
+    start = found - 1
+    if start >= 0 and buffer[start] == 0x3A:  # ":" nach einem Namespace-Präfix
+        start -= 1
+        while start >= 0 and buffer[start] in _PREFIX_CHARS:
+            start -= 1
+        if start == found - 2:
+            return None
+    if start >= 0 and buffer[start] == 0x2F:  # "/"
+        start -= 1
+    if start >= 0 and buffer[start] == 0x3C:  # "<"
+        return start
+    return None
+
+
+def _strip_end(buffer: bytes, end: int) -> int:
+    """Moves end back over the whitespace before it"""
+    while end > 0 and buffer[end - 1] in _WHITESPACE:
+        end -= 1
+    return end
+
+
+def _count_elements(buffer: bytes, start: int, end: int) -> int:
+    """Counts the start tags between tokens (no comments, CDATA or processing instructions there)"""
+    return buffer.count(b"<", start, end) - buffer.count(b"</", start, end)
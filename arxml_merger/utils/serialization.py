@@ -0,0 +1,276 @@
+"""
+Streaming serialization of merged ARXML trees
+
+The document is written package by package: an envelope of the tree with placeholders for
+the top-level AR-PACKAGE elements is serialized once, every package is serialized on its own
+at the depth it has in the document, and the pieces are spliced together. The output is
+byte-identical to ElementTree.write, but only one package is held as bytes at a time.
+
+Packages can be serialized by a thread pool; lxml releases the GIL while libxml2 writes
+the bytes, and the pieces are spliced in document order, so the output does not change.
+"""
+
+from typing import IO, Callable, Iterator, List, Optional, Tuple, Union
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import copy
+import io
+import os
+import uuid
+
+from lxml import etree
+
+from .xml_utils import get_local_name
+
+
+def _is_ascii_compatible(encoding: str) -> bool:
+    """Splicing searches for markup bytes, which needs an ASCII-compatible encoding"""
+    try:
+        return "<>/".encode(encoding) == b"<>/"
+    except LookupError:
+        return False
+
+
+def _find_packages(root: etree._Element) -> Optional[etree._Element]:
+    for child in root:
+        if get_local_name(child) == "AR-PACKAGES":
+            return child
+    return None
+
+
+def _is_placeholder(node: etree._Element, marker: str) -> bool:
+    return node.tag is etree.Comment and node.text == marker
+
+
+def _build_envelope(root: etree._Element, packages: etree._Element,
+                    marker: str) -> Tuple[etree._Element, List[etree._Element]]:
+    """
+    Copies the tree without the top-level AR-PACKAGE subtrees
+
+    Each package is replaced by a placeholder comment carrying the package's tail, so the
+    envelope serializes with the same indentation as the full document. Placeholder comments
+    already present in the tree are kept and split at as well.
+    """
+    envelope = etree.Element(root.tag, dict(root.attrib), nsmap=root.nsmap)
+    envelope.text = root.text
+    split_packages = []
+
+    for child in root:
+        if child is not packages:
+            envelope.append(copy.deepcopy(child))
+            continue
+
+        own_namespaces = {prefix: uri for prefix, uri in child.nsmap.items() if root.nsmap.get(prefix) != uri}
+        packages_copy = etree.SubElement(envelope, child.tag, dict(child.attrib), nsmap=own_namespaces or None)
+        packages_copy.text = child.text
+        packages_copy.tail = child.tail
+        for package in child:
+            if get_local_name(package) == "AR-PACKAGE":
+                placeholder = etree.Comment(marker)
+                placeholder.tail = package.tail
+                packages_copy.append(placeholder)
+                split_packages.append(package)
+            elif _is_placeholder(package, marker):
+                packages_copy.append(copy.deepcopy(package))
+                split_packages.append(package)
+            else:
+                packages_copy.append(copy.deepcopy(package))
+
+    for sibling in reversed(list(root.itersiblings(preceding=True))):
+        envelope.addprevious(copy.deepcopy(sibling))
+    for sibling in reversed(list(root.itersiblings())):
+        envelope.addnext(copy.deepcopy(sibling))
+
+    return envelope, split_packages
+
+
+def _write_to_bytes(tree: etree._ElementTree, encoding: str, pretty_print: bool, xml_declaration: bool) -> bytes:
+    # ElementTree.write normalisiert den Encoding-Namen in der Deklaration, tostring nicht
+    buffer = io.BytesIO()
+    tree.write(buffer, encoding=encoding, xml_declaration=xml_declaration, pretty_print=pretty_print)
+    return buffer.getvalue()
+
+
+def serialize_package(package: etree._Element, encoding: str = "UTF-8", pretty_print: bool = True) -> bytes:
+    """
+    Serializes a top-level AR-PACKAGE exactly as it appears inside the whole document
+
+    The package is copied into a wrapper AUTOSAR/AR-PACKAGES pair with the same namespaces
+    and mixed-content state as its ancestors, so libxml2 indents it at the same depth.
+    The package's tail is not part of the result.
+    """
+    packages = package.getparent()
+    root = packages.getparent()
+
+    wrapper = etree.Element(root.tag, nsmap=root.nsmap)
+    # Textknoten der Vorfahren schalten pretty_print für den Teilbaum ab
+    if root.text is not None or any(child.tail is not None for child in root):
+        wrapper.text = "\n"
+    own_namespaces = {prefix: uri for prefix, uri in packages.nsmap.items() if root.nsmap.get(prefix) != uri}
+    wrapper_packages = etree.SubElement(wrapper, packages.tag, nsmap=own_namespaces or None)
+    if packages.text is not None or any(child.tail is not None for child in packages):
+        wrapper_packages.text = "\n"
+
+    package_copy = copy.deepcopy(package)
+    package_copy.tail = None
+    wrapper_packages.append(package_copy)
+
+    data = etree.tostring(wrapper, encoding=encoding, xml_declaration=False, pretty_print=pretty_print)
+    # Attributwerte und Text sind escaped: das erste '>' schließt AUTOSAR, das zweite AR-PACKAGES
+    start = data.index(b"<", data.index(b">", data.index(b">") + 1) + 1)
+    end = data.rindex(b">", 0, data.rindex(b"</", 0, data.rindex(b"</"))) + 1
+    return data[start:end]
+
+
+def resolve_workers(workers: Optional[int]) -> int:
+    """Number of serialization threads: None/1 = sequential, 0 = one per CPU"""
+    if workers is None:
+        return 1
+    if workers < 0:
+        raise ValueError(f"Number of workers must not be negative: {workers}")
+    return workers or os.cpu_count() or 1
+
+
+def _serialize_packages(packages: List[etree._Element], encoding: str,
+                        pretty_print: bool, workers: int) -> Iterator[bytes]:
+    """Serializes the packages in order; with workers > 1 at most 2 * workers are pending"""
+    if workers <= 1 or len(packages) <= 1:
+        for package in packages:
+            yield serialize_package(package, encoding, pretty_print)
+        return
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="arxml-save") as executor:
+        pending = deque()
+        for package in packages:
+            pending.append(executor.submit(serialize_package, package, encoding, pretty_print))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def supports_splicing(root: etree._Element, encoding: str = "UTF-8") -> bool:
+    """Whether a tree is written package by package (otherwise it is written in one piece)"""
+    return (_find_packages(root) is not None and not root.getroottree().docinfo.doctype
+            and _is_ascii_compatible(encoding))
+
+
+def new_placeholder_marker() -> str:
+    """Unique comment text for package placeholders (see iter_serialized_slots)"""
+    return f"arxml-merger:{uuid.uuid4().hex}"
+
+
+def iter_serialized_chunks(root: etree._Element,
+                           encoding: str = "UTF-8",
+                           pretty_print: bool = True,
+                           xml_declaration: bool = True,
+                           workers: Optional[int] = None) -> Iterator[bytes]:
+    """
+    Serializes a tree in chunks of one top-level package each
+
+    Args:
+        root: Root element (AUTOSAR) of the tree
+        encoding: Output encoding
+        pretty_print: Indent elements without mixed content
+        xml_declaration: Write the XML declaration
+        workers: Serialization threads (None/1 = sequential, 0 = one per CPU)
+
+    Returns:
+        Iterator over the encoded chunks; joined they equal ElementTree.write's output
+    """
+    if not supports_splicing(root, encoding):
+        yield _write_to_bytes(root.getroottree(), encoding, pretty_print, xml_declaration)
+        return
+
+    for _, chunk in iter_serialized_slots(root, new_placeholder_marker(), encoding, pretty_print,
+                                          xml_declaration, workers):
+        yield chunk
+
+
+def iter_serialized_slots(root: etree._Element,
+                          marker: str,
+                          encoding: str = "UTF-8",
+                          pretty_print: bool = True,
+                          xml_declaration: bool = True,
+                          workers: Optional[int] = None) -> Iterator[Tuple[Optional[etree._Element], bytes]]:
+    """
+    Serializes a tree in chunks and tells envelope and package chunks apart
+
+    Comments reading marker among the top-level packages are placeholders for packages the
+    caller writes itself (e.g. bytes reused from an earlier output); they are serialized
+    like a package, not as comments. The tree must support splicing (see supports_splicing).
+
+    Args:
+        root: Root element (AUTOSAR) of the tree
+        marker: Placeholder comment text, see new_placeholder_marker
+        encoding: Output encoding (ASCII-compatible)
+        pretty_print: Indent elements without mixed content
+        xml_declaration: Write the XML declaration
+        workers: Serialization threads (None/1 = sequential, 0 = one per CPU)
+
+    Returns:
+        Iterator over (None, envelope chunk), (package, package chunk) and
+        (placeholder, b"") pairs in document order
+    """
+    if not supports_splicing(root, encoding):
+        raise ValueError("Tree cannot be serialized package by package")
+
+    workers = resolve_workers(workers)
+    envelope, split_nodes = _build_envelope(root, _find_packages(root), marker)
+    envelope_data = _write_to_bytes(envelope.getroottree(), encoding, pretty_print, xml_declaration)
+    del envelope
+
+    pieces = envelope_data.split(f"<!--{marker}-->".encode(encoding))
+    package_chunks = _serialize_packages([node for node in split_nodes if not _is_placeholder(node, marker)],
+                                         encoding, pretty_print, workers)
+    yield None, pieces[0]
+    for node, piece in zip(split_nodes, pieces[1:]):
+        if _is_placeholder(node, marker):
+            yield node, b""
+        else:
+            yield node, next(package_chunks)
+        yield None, piece
+
+
+def write_tree(root: etree._Element,
+               output: Union[str, Path, IO[bytes]],
+               encoding: str = "UTF-8",
+               pretty_print: bool = True,
+               workers: Optional[int] = None,
+               on_package: Optional[Callable[[int], None]] = None) -> int:
+    """
+    Writes a tree package by package to a path or a binary file-like object
+
+    Args:
+        root: Root element of the tree
+        output: Output path or binary stream (file, pipe, sys.stdout.buffer, compressed stream)
+        encoding: Output encoding
+        pretty_print: Indent elements without mixed content
+        workers: Serialization threads (None/1 = sequential, 0 = one per CPU)
+        on_package: Called with the bytes written so far after every top-level package;
+            may raise to abort the write
+
+    Returns:
+        Number of bytes written
+    """
+    if on_package is not None and supports_splicing(root, encoding):
+        chunks = iter_serialized_slots(root, new_placeholder_marker(), encoding, pretty_print, workers=workers)
+    else:
+        chunks = ((None, chunk) for chunk in iter_serialized_chunks(root, encoding, pretty_print, workers=workers))
+    if hasattr(output, "write"):
+        return _write_chunks(output, chunks, on_package)
+
+    with open(output, "wb") as stream:
+        return _write_chunks(stream, chunks, on_package)
+
+
+def _write_chunks(stream: IO[bytes], chunks: Iterator[Tuple[Optional[etree._Element], bytes]],
+                  on_package: Optional[Callable[[int], None]] = None) -> int:
+    written = 0
+    for package, chunk in chunks:
+        stream.write(chunk)
+        written += len(chunk)
+        if package is not None and on_package is not None:
+            on_package(written)
+    return written
@@ -2,11 +2,90 @@
 Hilfsfunktionen für den ARXML Merger
 """
 
-from typing import List, Optional
+from typing import Dict, Iterable, List, Optional, Tuple, Union, IO
 from lxml import etree
 from pathlib import Path
 import hashlib
 import logging
+import threading
+
+from .pruning import PruningReader
+
+
+def get_local_name(element: etree._Element) -> Optional[str]:
+    """Returns the local tag name of an element, or None for comments and processing instructions"""
+    tag = element.tag
+    if not isinstance(tag, str):
+        return None
+    return tag[tag.rfind("}") + 1:]
+
+
+def _join_text(text: Optional[str], addition: Optional[str]) -> Optional[str]:
+    """Joins two text nodes; whitespace-only indentation is replaced instead of accumulated"""
+    if (not text or not text.strip()) and (not addition or not addition.strip()):
+        return addition
+    return (text or "") + (addition or "")
+
+
+def remove_element(element: etree._Element) -> None:
+    """Removes an element from its parent and keeps the surrounding text/indentation intact"""
+    parent = element.getparent()
+    if parent is None:
+        return
+    
+    previous = element.getprevious()
+    if previous is not None:
+        previous.tail = _join_text(previous.tail, element.tail)
+    else:
+        parent.text = _join_text(parent.text, element.tail)
+    parent.remove(element)
+
+
+def parse_pruned(source: Union[str, IO[bytes]],
+                 ignore_elements: Iterable[str],
+                 **parser_options) -> Tuple[etree._Element, Dict[str, Dict[str, int]]]:
+    """
+    Parses an XML document and drops ignored subtrees before the parser builds them
+    
+    Args:
+        source: File name or binary file object
+        ignore_elements: Local names of the elements to drop (any namespace)
+        parser_options: Additional lxml parser options
+        
+    Returns:
+        Root element and the skipped nodes/bytes per ignored tag
+    """
+    ignore_elements = list(ignore_elements)
+    stream = open(source, "rb") if isinstance(source, str) else None
+    try:
+        reader = PruningReader(stream if stream is not None else source, ignore_elements,
+                               parser_options.get("remove_blank_text", False))
+        # Die Tags treffen nur, wenn der Reader die Eingabe nicht filtern konnte (UTF-16)
+        context = etree.iterparse(reader, events=("end",), tag=["{*}" + name for name in ignore_elements],
+                                  **parser_options)
+        skipped = reader.skipped
+        for _, element in context:
+            prune_element(element, skipped)
+        return context.root, skipped
+    finally:
+        if stream is not None:
+            stream.close()
+
+
+def prune_element(element: etree._Element, skipped: Dict[str, Dict[str, int]]) -> None:
+    """
+    Removes a parsed ignored element and counts it in skipped (the root is never removed)
+    
+    Only needed where PruningReader cannot filter the input; the bytes are those of the
+    serialized element.
+    """
+    if element.getparent() is None:
+        return
+    stats = skipped.setdefault(get_local_name(element), {"nodes": 0, "bytes": 0})
+    stats["nodes"] += sum(1 for _ in element.iter())
+    stats["bytes"] += len(etree.tostring(element, with_tail=False))
+    element.clear(keep_tail=True)
+    remove_element(element)
 
 
 def get_element_path(element: etree._Element, root: etree._Element = None) -> str:
@@ -21,7 +100,7 @@ def get_element_path(element: etree._Element, root: etree._Element = None) -> st
         # Erstelle Elementname mit Index falls mehrere gleichnamige Geschwister
         tag_name = etree.QName(current).localname
         siblings = list(current.getparent()) if current.getparent() is not None else []
-        same_tag_siblings = [s for s in siblings if etree.QName(s).localname == tag_name]
+        same_tag_siblings = [s for s in siblings if get_local_name(s) == tag_name]
         
         if len(same_tag_siblings) > 1:
             index = same_tag_siblings.index(current) + 1
@@ -121,10 +200,120 @@ def normalize_whitespace(text: str) -> str:
     return " ".join(text.split())
 
 
+# Merkle digest of a subtree and the number of nodes it covers
+SubtreeDigest = Tuple[bytes, int]
+
+
+def node_key(node: etree._Element, attrib: Optional[Dict[str, str]] = None) -> str:
+    """
+    Encodes a single node for the Merkle digest: tag, sorted attributes, exact text and tail
+    
+    attrib overrides the node's own attributes. Text and tail are not normalized: a merge
+    that replaces an element copies its whitespace, so only exactly equal subtrees may be
+    skipped. Separators are control characters that cannot occur in XML content, so the
+    encoding is unambiguous.
+    """
+    tag = node.tag
+    text = node.text or ""
+    tail = node.tail or ""
+    if tag.__class__ is not str:
+        # Kommentare und Processing Instructions
+        return f"#{getattr(tag, '__name__', 'node')}\x00{text}\x00{tail}"
+    if attrib is None:
+        attrib = node.attrib
+    if not attrib:
+        return f"{tag}\x000\x00{text}\x00{tail}"
+    attributes = "\x00".join(f"{name}={value}" for name, value in sorted(attrib.items()))
+    return f"{tag}\x00{len(attrib)}\x00{attributes}\x00{text}\x00{tail}"
+
+
+def combine_digest(key: str, child_parts: List[str]) -> bytes:
+    """Digest of a node with children from its node_key and the parts of its children"""
+    return hashlib.blake2b(("\x02" + key + "".join(child_parts)).encode("utf-8"), digest_size=16).digest()
+
+
+def leaf_part(key: str) -> str:
+    """Leaves are folded into their parent's digest instead of being hashed separately"""
+    return "\x01" + key
+
+
+def digest_part(digest: bytes) -> str:
+    """Part of a child with children in its parent's digest"""
+    return "\x03" + digest.hex()
+
+
+def leaf_digest(key: str) -> bytes:
+    """Digest of a leaf compared on its own"""
+    return hashlib.blake2b(leaf_part(key).encode("utf-8"), digest_size=16).digest()
+
+
+def compute_subtree_digest(element: etree._Element,
+                           cache: Dict[etree._Element, SubtreeDigest]) -> SubtreeDigest:
+    """
+    Computes the Merkle digest of a subtree bottom-up (iteratively, without recursion)
+    
+    Digests of elements with children are stored in cache and reused for subtrees that are
+    already cached; leaves are folded into their parent's digest. Whitespace is part of the
+    digest; the fast parser profile drops formatting-only whitespace nodes while parsing.
+    """
+    cached = cache.get(element)
+    if cached is not None:
+        return cached
+    if len(element) == 0:
+        return leaf_digest(node_key(element)), 1
+    
+    stack = [(element, False)]
+    while stack:
+        node, children_done = stack.pop()
+        if not children_done:
+            stack.append((node, True))
+            for child in node:
+                if len(child) and child not in cache:
+                    stack.append((child, False))
+            continue
+        
+        parts = []
+        count = 1
+        for child in node:
+            if len(child):
+                child_digest, child_count = cache[child]
+                parts.append(digest_part(child_digest))
+                count += child_count
+            else:
+                parts.append(leaf_part(node_key(child)))
+                count += 1
+        cache[node] = (combine_digest(node_key(node), parts), count)
+    
+    return cache[element]
+
+
+def compute_subtree_digests(root: etree._Element) -> Dict[etree._Element, SubtreeDigest]:
+    """Computes the Merkle digests for all subtrees of root (elements with children only)"""
+    digests: Dict[etree._Element, SubtreeDigest] = {}
+    if len(root) == 0:
+        return digests
+    
+    # Ein Durchlauf mit iterwalk: jede Ebene sammelt die Teile ihrer Kinder
+    levels: List[List] = [[[], 0]]
+    for event, node in etree.iterwalk(root, events=("start", "end")):
+        if event == "start":
+            levels.append([[], 0])
+            continue
+        parts, count = levels.pop()
+        parent = levels[-1]
+        if parts:
+            digest = combine_digest(node_key(node), parts)
+            digests[node] = (digest, count + 1)
+            parent[0].append(digest_part(digest))
+        else:
+            parent[0].append(leaf_part(node_key(node)))
+        parent[1] += count + 1
+    return digests
+
+
 def create_element_hash(element: etree._Element) -> str:
-    """Erstellt einen Hash für ein Element basierend auf seinem Inhalt"""
-    content = etree.tostring(element, encoding='unicode', method='xml')
-    return hashlib.md5(content.encode('utf-8')).hexdigest()
+    """Erstellt einen Hash für ein Element basierend auf seinem Inhalt (Merkle-Digest)"""
+    return compute_subtree_digest(element, {})[0].hex()
 
 
 def validate_arxml_structure(root_element: etree._Element) -> List[str]:
@@ -152,8 +341,15 @@ def validate_arxml_structure(root_element: etree._Element) -> List[str]:
     return errors
 
 
+# Ob setup_logging schon gelaufen ist (von get_logger oder der Anwendung)
+_logging_configured = False
+_logging_lock = threading.Lock()
+
+
 def setup_logging(log_level: str = "INFO", log_file: Optional[Path] = None) -> logging.Logger:
     """Richtet Logging für den Merger ein"""
+    global _logging_configured
+    _logging_configured = True
     logger = logging.getLogger("arxml_merger")
     logger.setLevel(getattr(logging, log_level.upper()))
     
@@ -181,6 +377,15 @@ def setup_logging(log_level: str = "INFO", log_file: Optional[Path] = None) -> l
     return logger
 
 
+def get_logger() -> logging.Logger:
+    """Logger des Mergers; richtet beim ersten Aufruf das Standard-Logging ein, falls noch nicht geschehen"""
+    if not _logging_configured:
+        with _logging_lock:
+            if not _logging_configured:
+                setup_logging()
+    return logging.getLogger("arxml_merger")
+
+
 def deep_copy_element(element: etree._Element) -> etree._Element:
     """Erstellt eine tiefe Kopie eines XML-Elements"""
     # Konvertiere zu String und parse wieder für echte Deep Copy
@@ -255,7 +460,7 @@ def get_autosar_path(element: etree._Element, root: etree._Element = None) -> st
         # Versuche SHORT-NAME zu finden
         short_name = None
         for child in current:
-            if etree.QName(child).localname == "SHORT-NAME":
+            if get_local_name(child) == "SHORT-NAME":
                 short_name = child.text.strip() if child.text else None
                 break
         
@@ -264,7 +469,7 @@ def get_autosar_path(element: etree._Element, root: etree._Element = None) -> st
         else:
             # Fallback auf Index wenn kein SHORT-NAME vorhanden
             siblings = list(current.getparent()) if current.getparent() is not None else []
-            same_tag_siblings = [s for s in siblings if etree.QName(s).localname == tag_name]
+            same_tag_siblings = [s for s in siblings if get_local_name(s) == tag_name]
             
             if len(same_tag_siblings) > 1:
                 index = same_tag_siblings.index(current) + 1
@@ -276,3 +481,39 @@ def get_autosar_path(element: etree._Element, root: etree._Element = None) -> st
     
     path_parts.reverse()
     return "/" + "/".join(path_parts)
+
+
+def get_short_name(element: etree._Element) -> Optional[str]:
+    """Returns the SHORT-NAME of an element, None if it has none"""
+    for child in element:
+        if get_local_name(child) == "SHORT-NAME":
+            return child.text.strip() if child.text else None
+    return None
+
+
+def find_by_reference(root: etree._Element, reference: str) -> Optional[etree._Element]:
+    """
+    Resolves an AUTOSAR reference like /Package/SubPackage/Element via SHORT-NAMEs
+    
+    Each path segment names the nearest descendant with that SHORT-NAME; elements with
+    another SHORT-NAME are not descended into.
+    
+    Returns:
+        The referenced element, None if the reference does not resolve
+    """
+    current = root
+    for name in reference.strip("/").split("/"):
+        stack = [child for child in reversed(current) if isinstance(child.tag, str)]
+        found = None
+        while stack:
+            element = stack.pop()
+            short_name = get_short_name(element)
+            if short_name == name:
+                found = element
+                break
+            if short_name is None and get_local_name(element) != "SHORT-NAME":
+                stack.extend(child for child in reversed(element) if isinstance(child.tag, str))
+        if found is None:
+            return None
+        current = found
+    return current
@@ -2,13 +2,32 @@
 Unit tests for the ARXML Merger
 """
 
+import asyncio
+import gzip
+import http.client
+import io
+import json
 import pytest
+import random
+import tarfile
 import tempfile
+import threading
+import zipfile
 from pathlib import Path
 from lxml import etree
 
 from arxml_merger import ArxmlMerger, MergeConfig, ConflictResolutionStrategy
-from arxml_merger.core.exceptions import InvalidArxmlFileError, ArxmlMergerException
+from arxml_merger.core.exceptions import InvalidArxmlFileError, ArxmlMergerException, MergeCancelledError
+from arxml_merger.core.aio import MergeProgressStream
+from arxml_merger.core.models import MergeResult, MergeStatistics
+from arxml_merger.core.cache import ModelStore, hash_file
+from arxml_merger.core.progress import CancellationToken
+from arxml_merger.core.events import ElementAdded, ConflictDetected, VerboseMergeLogger
+from arxml_merger.core.ordering import InputStatistics, plan_merge_order
+from arxml_merger.core.parallel import PackageMergePool
+from arxml_merger.core.sharding import ShardedMerge
+from arxml_merger.core.watch import MergeWatcher
+from arxml_merger.server import MergeService, create_server
 from arxml_merger.schema.autosar_schema import SchemaDetector
 
 
@@ -120,6 +139,510 @@ class TestArxmlMerger:
         root = tree.getroot()
         assert etree.QName(root).localname == "AUTOSAR"
     
+    def test_save_streams_packages_identically(self, temp_files):
+        """Test that the package-wise streaming writer matches ElementTree.write byte for byte"""
+        files, temp_path = temp_files
+        
+        for config in (MergeConfig(), MergeConfig(parser_profile="fast", output_encoding="ISO-8859-1")):
+            result = ArxmlMerger(config).merge_files(files)
+            reference = temp_path / "reference.arxml"
+            etree.ElementTree(result.merged_tree).write(
+                str(reference), encoding=config.output_encoding, xml_declaration=True, pretty_print=True
+            )
+            
+            stream = io.BytesIO()
+            written = result.save(stream)
+            
+            assert stream.getvalue() == reference.read_bytes()
+            assert written == len(stream.getvalue())
+    
+    def test_save_keeps_order_before_root(self, temp_files):
+        """Test that comments and processing instructions before the root keep their order"""
+        files, temp_path = temp_files
+        prolog_file = temp_path / "prolog.arxml"
+        prolog_file.write_text(files[0].read_text(encoding='utf-8').replace(
+            "<AUTOSAR ", "<!-- first --><!-- second --><?pi x?><AUTOSAR ", 1
+        ), encoding='utf-8')
+        
+        root = etree.parse(str(prolog_file)).getroot()
+        reference = io.BytesIO()
+        etree.ElementTree(root).write(reference, encoding="UTF-8", xml_declaration=True, pretty_print=True)
+        stream = io.BytesIO()
+        MergeResult(root, MergeConfig(), MergeStatistics()).save(stream)
+        
+        assert stream.getvalue() == reference.getvalue()
+        assert reference.getvalue().index(b"first") < reference.getvalue().index(b"second")
+        
+        # Der externe Merge schreibt die Hülle der ersten Datei über denselben Pfad
+        external_output = temp_path / "external.arxml"
+        ArxmlMerger().merge_external([prolog_file, files[1]], external_output)
+        output = external_output.read_bytes()
+        assert output.index(b"first") < output.index(b"second") < output.index(b"<?pi x?>")
+    
+    def test_parallel_save_identical(self, temp_files):
+        """Test that serializing packages in worker threads gives the sequential output"""
+        files, temp_path = temp_files
+        extra_files = []
+        for index in range(4):
+            extra_file = temp_path / f"extra{index}.arxml"
+            extra_file.write_text(files[1].read_text(encoding='utf-8').replace(
+                "ComponentTypes2", f"Extra{index}"
+            ), encoding='utf-8')
+            extra_files.append(extra_file)
+        
+        result = ArxmlMerger(MergeConfig(parser_profile="fast")).merge_files(files + extra_files)
+        sequential, parallel = io.BytesIO(), io.BytesIO()
+        result.save(sequential)
+        result.save(parallel, workers=3)
+        
+        assert parallel.getvalue() == sequential.getvalue()
+        assert parallel.getvalue().count(b"<AR-PACKAGE>") == 6
+        
+        with pytest.raises(ArxmlMergerException):
+            ArxmlMerger(MergeConfig(save_workers=-1))
+    
+    @pytest.mark.parametrize("suffix, module", [(".gz", "gzip"), (".xz", "lzma"), (".zst", "zstandard")])
+    def test_compressed_input_and_output(self, temp_files, suffix, module):
+        """Test transparent decompression on load and compression on save"""
+        codec = pytest.importorskip(module)
+        files, temp_path = temp_files
+        
+        def compress(data):
+            if module == "zstandard":
+                return codec.ZstdCompressor().compress(data)
+            return codec.compress(data)
+        
+        def decompress(data):
+            if module == "zstandard":
+                return codec.ZstdDecompressor().decompressobj().decompress(data)
+            return codec.decompress(data)
+        
+        # Der Inhalt wird an den Magic Bytes erkannt, nicht an der Endung
+        compressed_files = []
+        for index, file_path in enumerate(files):
+            compressed = temp_path / f"compressed{index}.arxml{suffix if index == 0 else ''}"
+            compressed.write_bytes(compress(file_path.read_bytes()))
+            compressed_files.append(compressed)
+        
+        result = ArxmlMerger().merge_files(compressed_files)
+        output_file = temp_path / f"merged.arxml{suffix}"
+        result.save(output_file)
+        
+        reference = io.BytesIO()
+        ArxmlMerger().merge_files(files).save(reference)
+        assert decompress(output_file.read_bytes()) == reference.getvalue()
+    
+    def test_compression_level_validated(self, temp_files):
+        """Test that compression levels are checked against the codec's range"""
+        files, temp_path = temp_files
+        
+        with pytest.raises(ArxmlMergerException):
+            ArxmlMerger(MergeConfig(output_compression="gzip", compression_level=12))
+        with pytest.raises(ArxmlMergerException):
+            ArxmlMerger(MergeConfig(compression_level="9"))
+        
+        # Ohne festen Codec entscheidet erst die Endung beim Speichern
+        result = ArxmlMerger(MergeConfig(compression_level=15)).merge_files(files)
+        with pytest.raises(ArxmlMergerException):
+            result.save(temp_path / "merged.arxml.gz")
+        
+        output_file = temp_path / "merged9.arxml.gz"
+        ArxmlMerger(MergeConfig(compression_level=9)).merge_files(files).save(output_file)
+        assert gzip.decompress(output_file.read_bytes()).startswith(b"<?xml")
+    
+    @pytest.mark.parametrize("archive_name", ["bundle.zip", "bundle.tar.gz"])
+    def test_merge_from_archive(self, temp_files, archive_name):
+        """Test that archive members are streamed in member order and filtered by glob patterns"""
+        files, temp_path = temp_files
+        archive_path = temp_path / archive_name
+        
+        # Absichtlich in umgekehrter Reihenfolge gepackt
+        # Muster gelten unabhängig von Groß-/Kleinschreibung
+        members = [("models/b.ARXML", files[1]), ("models/a.arxml", files[0]), ("Test/skip.arxml", files[1])]
+        if archive_name.endswith(".zip"):
+            with zipfile.ZipFile(archive_path, "w") as archive:
+                for name, file_path in members:
+                    archive.write(file_path, name)
+        else:
+            with tarfile.open(archive_path, "w:gz") as archive:
+                for name, file_path in members:
+                    archive.add(file_path, name)
+        
+        config = MergeConfig(archive_exclude=["test/*"], load_workers=2)
+        result = ArxmlMerger(config).merge_files([archive_path])
+        reference = ArxmlMerger().merge_files(files)
+        
+        assert result.statistics.files_processed == 2
+        assert result.to_string() == reference.to_string()
+    
+    def test_merge_result_cache(self, temp_files):
+        """Test cache hits for identical inputs, misses on changes and LRU eviction"""
+        files, temp_path = temp_files
+        cache_dir = temp_path / "cache"
+        config = MergeConfig(cache_dir=str(cache_dir))
+        
+        first = ArxmlMerger(config).merge_files(files)
+        second = ArxmlMerger(config).merge_files(files)
+        assert not first.statistics.cache_hit
+        assert second.statistics.cache_hit
+        assert second.statistics.elements_merged == first.statistics.elements_merged
+        
+        first_output, second_output = io.BytesIO(), io.BytesIO()
+        first.save(first_output)
+        second.save(second_output)
+        assert second_output.getvalue() == first_output.getvalue()
+        assert second.to_string() == first.to_string()
+        
+        # Andere Inhalte oder eine andere Konfiguration: neuer Schlüssel
+        files[1].write_text(files[1].read_text(encoding='utf-8').replace("Port2", "Port3"), encoding='utf-8')
+        assert not ArxmlMerger(config).merge_files(files).statistics.cache_hit
+        last_wins = MergeConfig(cache_dir=str(cache_dir), conflict_resolution=ConflictResolutionStrategy.LAST_WINS)
+        assert not ArxmlMerger(last_wins).merge_files(files).statistics.cache_hit
+        assert len(list((cache_dir / "results").iterdir())) == 3
+        
+        # Größenlimit: nur der zuletzt gespeicherte Eintrag bleibt
+        small = MergeConfig(cache_dir=str(cache_dir), cache_max_size=1, skip_identical_subtrees=False)
+        ArxmlMerger(small).merge_files(files)
+        assert len(list((cache_dir / "results").iterdir())) == 1
+    
+    def test_model_cache(self, temp_files):
+        """Test that unchanged inputs are loaded from the parsed-model cache"""
+        from arxml_merger.core.cache import ModelCache
+        from arxml_merger.core.models import ArxmlFile
+        
+        files, temp_path = temp_files
+        cache_dir = temp_path / "models"
+        config = MergeConfig(model_cache_dir=str(cache_dir), ignore_elements=["ADMIN-DATA"])
+        
+        first = ArxmlMerger(config).merge_files(files)
+        second = ArxmlMerger(config).merge_files(files)
+        assert first.statistics.models_from_cache == 0
+        assert second.statistics.models_from_cache == len(files)
+        assert second.to_string() == first.to_string()
+        assert second.statistics.ignored_elements == first.statistics.ignored_elements
+        
+        # Binärformat: Rundreise mit Schema-Version und Split-Key-Prüfung
+        arxml_file = ArxmlFile.from_file(files[0], config)
+        arxml_file.schema_version = "4.3.0"
+        arxml_file.split_key_errors = []
+        restored = ArxmlFile.from_bytes(arxml_file.to_bytes(), files[0], config)
+        assert restored.schema_version == "4.3.0"
+        assert restored.split_key_errors == []
+        assert etree.tostring(restored.root_element) == etree.tostring(arxml_file.root_element)
+        with pytest.raises(ValueError):
+            ArxmlFile.from_bytes(b"<AUTOSAR/>", files[0], config)
+        
+        # Geänderte Datei: neuer Eintrag; Größenlimit verdrängt alte Einträge
+        files[1].write_text(files[1].read_text(encoding='utf-8').replace("Port2", "Port3"), encoding='utf-8')
+        third = ArxmlMerger(config).merge_files(files)
+        assert third.statistics.models_from_cache == len(files) - 1
+        ModelCache(cache_dir, 1).evict()
+        assert list((cache_dir / "models").iterdir()) == []
+        small = MergeConfig(model_cache_dir=str(cache_dir), model_cache_max_size=1,
+                            ignore_elements=["ADMIN-DATA"])
+        assert ArxmlMerger(small).merge_files(files).statistics.models_from_cache == 0
+        assert len(list((cache_dir / "models").iterdir())) == 1
+    
+    def test_incremental_merge(self, temp_files):
+        """Test that an incremental re-merge reuses untouched packages and equals a full merge"""
+        files, temp_path = temp_files
+        output = temp_path / "out" / "merged.arxml"
+        
+        first = ArxmlMerger().merge_incremental(files, output)
+        assert first.statistics.packages_reused == 0
+        assert (temp_path / "out" / "merged.arxml.manifest.json.gz").exists()
+        assert ArxmlMerger().merge_incremental(files, output).statistics.packages_reused == 2
+        
+        def full_merge():
+            result = ArxmlMerger().merge_files(files)
+            buffer = io.BytesIO()
+            result.save(buffer)
+            return result, buffer.getvalue()
+        
+        # Nur das geänderte Package wird neu gemergt
+        files[1].write_text(files[1].read_text(encoding='utf-8').replace("Port2", "Port3"), encoding='utf-8')
+        second = ArxmlMerger().merge_incremental(files, output)
+        full, full_output = full_merge()
+        assert second.statistics.packages_reused == 1
+        assert output.read_bytes() == full_output
+        assert second.statistics.elements_merged == full.statistics.elements_merged
+        assert second.to_string() == full.to_string()
+        
+        # Neue Datei mit Beitrag zu einem bestehenden Package
+        extra = temp_path / "test3.arxml"
+        extra.write_text(files[0].read_text(encoding='utf-8').replace("TestComponent1", "TestComponent3"),
+                         encoding='utf-8')
+        files.append(extra)
+        third = ArxmlMerger().merge_incremental(files, output)
+        full, full_output = full_merge()
+        assert third.statistics.packages_reused == 1
+        assert third.statistics.files_processed == 3
+        assert output.read_bytes() == full_output
+        
+        # Geänderte erste Datei: vollständiger Merge
+        files.reverse()
+        assert ArxmlMerger().merge_incremental(files, output).statistics.packages_reused == 0
+        assert output.read_bytes() == full_merge()[1]
+    
+    @pytest.mark.parametrize("strategy", [ConflictResolutionStrategy.MERGE_ALL, ConflictResolutionStrategy.LAST_WINS,
+                                          ConflictResolutionStrategy.FIRST_WINS])
+    def test_incremental_merge_randomized(self, tmp_path, strategy):
+        """Test that random edit sequences give the output, statistics and conflicts of merge_files()"""
+        rng = random.Random(f"incremental-{strategy.value}")
+        config = MergeConfig(conflict_resolution=strategy)
+        output = tmp_path / "merged.arxml"
+        
+        def random_package(name):
+            components = []
+            for component in rng.sample(range(4), rng.randint(1, 3)):
+                ports = "".join(
+                    f"<{kind}-PORT-PROTOTYPE><SHORT-NAME>Port{port}</SHORT-NAME></{kind}-PORT-PROTOTYPE>"
+                    for port, kind in ((port, "PR"[port % 2]) for port in rng.sample(range(5), rng.randint(0, 3)))
+                )
+                uuid = f' UUID="u{rng.randint(0, 2)}"' if rng.random() < 0.5 else ""
+                desc = f"<DESC>d{rng.randint(0, 2)}</DESC>" if rng.random() < 0.5 else ""
+                components.append(
+                    f"<APPLICATION-SW-COMPONENT-TYPE{uuid}><SHORT-NAME>C{component}</SHORT-NAME>"
+                    f"{desc}<PORTS>{ports}</PORTS></APPLICATION-SW-COMPONENT-TYPE>"
+                )
+            return (f"<AR-PACKAGE><SHORT-NAME>{name}</SHORT-NAME>"
+                    f"<ELEMENTS>{''.join(components)}</ELEMENTS></AR-PACKAGE>")
+        
+        def write_random(path):
+            packages = "".join(random_package(f"P{index}") for index in rng.sample(range(5), rng.randint(1, 3)))
+            path.write_text('<?xml version="1.0" encoding="UTF-8"?>\n'
+                            '<AUTOSAR xmlns="http://autosar.org/schema/r4.0">'
+                            f'<AR-PACKAGES>{packages}</AR-PACKAGES></AUTOSAR>', encoding='utf-8')
+        
+        files = []
+        for index in range(4):
+            files.append(tmp_path / f"in{index}.arxml")
+            write_random(files[-1])
+        created = len(files)
+        reused = 0
+        
+        for _ in range(12):
+            action = rng.choice(("edit", "edit", "add", "remove", "unchanged"))
+            if action == "edit":
+                write_random(rng.choice(files[1:]))
+            elif action == "add":
+                files.append(tmp_path / f"in{created}.arxml")
+                created += 1
+                write_random(files[-1])
+            elif action == "remove" and len(files) > 2:
+                files.remove(rng.choice(files[1:]))
+            
+            incremental = ArxmlMerger(config).merge_incremental(files, output)
+            full = ArxmlMerger(config).merge_files(files)
+            buffer = io.BytesIO()
+            full.save(buffer)
+            
+            assert output.read_bytes() == buffer.getvalue()
+            assert incremental.statistics.elements_merged == full.statistics.elements_merged
+            assert incremental.statistics.files_processed == full.statistics.files_processed
+            assert ([c.to_dict() for c in incremental.conflicts] ==
+                    [c.to_dict() for c in full.conflicts])
+            reused += incremental.statistics.packages_reused
+        
+        assert reused > 0
+    
+    def test_watch_mode(self, temp_files):
+        """Test that the watcher re-merges only on content changes and keeps unchanged models"""
+        files, temp_path = temp_files
+        output = temp_path / "merged.arxml"
+        watcher = MergeWatcher(ArxmlMerger(), files, output)
+        
+        first = watcher.check()
+        assert first.succeeded and first.changed == files
+        assert first.result.statistics.files_processed == 2
+        assert watcher.check() is None
+        
+        # Speichern ohne Änderung löst keinen Zyklus aus
+        files[0].write_text(files[0].read_text(encoding='utf-8'), encoding='utf-8')
+        assert watcher.check() is None
+        
+        base_model = watcher.models.get(str(files[0].resolve()), hash_file(files[0]))
+        files[1].write_text(files[1].read_text(encoding='utf-8').replace("Port2", "Port2b"), encoding='utf-8')
+        second = watcher.check()
+        assert second.changed == [files[1]]
+        assert second.latency > 0
+        assert second.result.statistics.packages_reused == 1
+        assert base_model is not None
+        assert watcher.models.get(str(files[0].resolve()), hash_file(files[0])) is base_model
+        assert watcher.merger.models is None
+        
+        full = ArxmlMerger().merge_files(files)
+        buffer = io.BytesIO()
+        full.save(buffer)
+        assert output.read_bytes() == buffer.getvalue()
+        
+        # Fehlerhafte Zwischenstände lassen die Ausgabe unverändert
+        files[1].write_text("<AUTOSAR>", encoding='utf-8')
+        failed = watcher.check()
+        assert not failed.succeeded
+        assert output.read_bytes() == buffer.getvalue()
+    
+    def test_merge_service(self, temp_files):
+        """Test the JSON-RPC merge service with warm models and latency metrics"""
+        files, temp_path = temp_files
+        paths = [str(f) for f in files]
+        service = MergeService(workers=2)
+        
+        def call(method, **params):
+            return service.handle({"jsonrpc": "2.0", "method": method, "params": params, "id": 7})
+        
+        try:
+            merged = call("merge", files=paths)["result"]
+            assert merged["statistics"]["files_processed"] == 2
+            assert merged["xml"] == ArxmlMerger().merge_files(files).to_string()
+            
+            found = call("query", files=paths, reference="/ComponentTypes2/TestComponent2")["result"]
+            assert found["found"] and found["tag"] == "APPLICATION-SW-COMPONENT-TYPE"
+            assert not call("query", files=paths, reference="/ComponentTypes/Missing")["result"]["found"]
+            
+            assert call("validate", files=paths)["result"]["valid"]
+            assert any(package["is_new"] for package in call("plan", files=paths)["result"]["packages"])
+            
+            output = temp_path / "out" / "served.arxml"
+            written = call("merge", files=paths, output=str(output),
+                           config={"conflict_resolution": "last_wins"})["result"]
+            assert written["output"] == str(output) and output.exists()
+            
+            assert call("unknown")["error"]["code"] == -32601
+            assert call("merge", files=[str(temp_path / "missing.arxml")])["error"]["code"] == -32000
+            assert call("merge", files=paths, config={"no_such_field": 1})["error"]["code"] == -32602
+            assert call("merge", files=paths, config={"conflict_resolution": "x"})["error"]["code"] == -32602
+            assert call("plan", files=paths, config={"parser_profile": "x"})["error"]["code"] == -32602
+            assert call("merge", files=paths, output=3)["error"]["code"] == -32602
+            
+            metrics = service.metrics()
+            assert metrics["methods"]["merge"]["requests"] == 6
+            assert metrics["methods"]["merge"]["errors"] == 4
+            assert metrics["models_in_memory"] == 2
+            assert metrics["result_hits"] >= 2
+            
+            # Fehler außerhalb der Parameterprüfung sind interne Fehler
+            service._methods["plan"] = lambda params: {}["missing"]
+            assert call("plan", files=paths)["error"]["code"] == -32603
+            
+            # HTTP-Transport
+            server = create_server(service, "127.0.0.1:0")
+            thread = threading.Thread(target=server.serve_forever, daemon=True)
+            thread.start()
+            try:
+                host, port = server.server_address[:2]
+                connection = http.client.HTTPConnection(host, port, timeout=10)
+                body = json.dumps({"jsonrpc": "2.0", "method": "validate", "params": {"files": paths}, "id": 1})
+                connection.request("POST", "/", body, {"Content-Type": "application/json"})
+                response = json.loads(connection.getresponse().read())
+                assert response["id"] == 1 and response["result"]["valid"]
+                connection.request("GET", "/metrics")
+                assert json.loads(connection.getresponse().read())["methods"]["validate"]["requests"] == 2
+            finally:
+                server.shutdown()
+                server.server_close()
+        finally:
+            service.close()
+        
+        bounded = MergeService(workers=1, max_models=1)
+        try:
+            bounded.handle({"jsonrpc": "2.0", "method": "merge", "params": {"files": paths}, "id": 1})
+            assert bounded.metrics()["models_in_memory"] == 1
+        finally:
+            bounded.close()
+    
+    def test_async_merge(self, temp_files):
+        """Test merge_files_async/save_async with progress events and cancellation"""
+        files, temp_path = temp_files
+        output = temp_path / "async.arxml"
+        
+        async def merge_and_save():
+            progress = MergeProgressStream()
+            task = asyncio.create_task(ArxmlMerger().merge_files_async(files, progress))
+            events = [event async for event in progress]
+            result = await task
+            return events, result, await result.save_async(output)
+        
+        events, result, written = asyncio.run(merge_and_save())
+        assert [(event.stage, event.done, event.total, event.item) for event in events] == [
+            ("load", 1, 2, str(files[0])), ("load", 2, 2, str(files[1])),
+            ("merge", 0, 1, "ComponentTypes2"), ("merge", 1, 1, str(files[1]))
+        ]
+        assert events[-1].fraction == 1.0 and events[-1].eta == 0.0 and events[-1].packages == 1
+        assert result.to_string() == ArxmlMerger().merge_files(files).to_string()
+        assert written == output.stat().st_size
+        
+        async def cancelled_merge():
+            task = asyncio.create_task(ArxmlMerger().merge_files_async(files))
+            await asyncio.sleep(0)
+            task.cancel()
+            await task
+        
+        with pytest.raises(asyncio.CancelledError):
+            asyncio.run(cancelled_merge())
+        
+        # Fortschritt beim Schreiben: ein Ereignis pro Package
+        save_events = []
+        result.save(output, progress_callback=save_events.append)
+        assert [(event.stage, event.done, event.total) for event in save_events] == [("save", 1, 2), ("save", 2, 2)]
+        assert save_events[-1].bytes_done > 0
+        
+        # Abbruch zwischen Dateien bzw. Packages
+        token = CancellationToken()
+        token.cancel()
+        with pytest.raises(MergeCancelledError):
+            ArxmlMerger().merge_files(files, cancel_token=token)
+        with pytest.raises(MergeCancelledError):
+            result.save(output, cancel_token=token)
+        assert not output.exists()
+    
+    def test_merge_event_observers(self, temp_files):
+        """Test typed merge events, event type filters and verbose_merge as observer"""
+        files, temp_path = temp_files
+        update = temp_path / "update.arxml"
+        update.write_text(files[0].read_text(encoding='utf-8').replace(
+            "<SHORT-NAME>Port1</SHORT-NAME>\n                        </P-PORT-PROTOTYPE>",
+            "<SHORT-NAME>Port1</SHORT-NAME>\n                        </P-PORT-PROTOTYPE>\n"
+            "                        <R-PORT-PROTOTYPE><SHORT-NAME>Port3</SHORT-NAME></R-PORT-PROTOTYPE>"
+        ), encoding='utf-8')
+        
+        merger = ArxmlMerger()
+        events = []
+        added = []
+        merger.add_observer(events.append)
+        merger.add_observer(added.append, event_types=(ElementAdded,))
+        merger.merge_files([files[0], update, files[1]])
+        
+        component = "/AR-PACKAGES/AR-PACKAGE[ComponentTypes]/ELEMENTS/APPLICATION-SW-COMPONENT-TYPE[TestComponent1]"
+        assert [(type(event).__name__, event.path) for event in events] == [
+            ("ElementMerged", "/AR-PACKAGES/AR-PACKAGE[ComponentTypes]"),
+            ("ElementMerged", component),
+            ("ElementMerged", component + "/PORTS/P-PORT-PROTOTYPE[Port1]"),
+            ("ElementAdded", component + "/PORTS/R-PORT-PROTOTYPE[Port3]"),
+            ("ElementAdded", "/AR-PACKAGES/AR-PACKAGE[ComponentTypes2]"),
+        ]
+        assert added == [event for event in events if isinstance(event, ElementAdded)]
+        assert all(event.source_file in (str(update), str(files[1])) for event in events)
+        
+        merger.remove_observer(events.append)
+        merger.remove_observer(added.append)
+        merger.merge_files(files)
+        assert len(events) == 5 and len(added) == 2
+        
+        # FAIL_ON_CONFLICT meldet Konflikte als Ereignis
+        config = MergeConfig(conflict_resolution=ConflictResolutionStrategy.FAIL_ON_CONFLICT)
+        merger = ArxmlMerger(config)
+        conflicts = []
+        merger.add_observer(conflicts.append, event_types=(ConflictDetected,))
+        result = merger.merge_files([files[0], update])
+        assert [event.conflict for event in conflicts] == result.conflicts
+        assert result.conflicts
+        
+        # verbose_merge ist ein Observer; ohne Observer werden keine Ereignisse erzeugt
+        assert any(isinstance(observer, VerboseMergeLogger)
+                   for observer, _ in ArxmlMerger(MergeConfig(verbose_merge=True))._observers)
+        assert ArxmlMerger()._observers == []
+    
     def test_invalid_file(self):
         """Test Behandlung ungültiger Dateien"""
         merger = ArxmlMerger()
@@ -134,6 +657,383 @@ class TestArxmlMerger:
         with pytest.raises(ArxmlMergerException):
             merger.merge_files([])
     
+    def test_ignore_elements_pruned_while_parsing(self, temp_files):
+        """Test that ignore_elements are dropped at parse time and reported"""
+        from arxml_merger.utils.pruning import PruningReader
+        
+        files, temp_path = temp_files
+        admin_file = temp_path / "admin.arxml"
+        admin_data = "<ADMIN-DATA><SDGS><SDG GID=\"vendor\"><SD>x</SD></SDG></SDGS></ADMIN-DATA>"
+        admin_file.write_text(files[0].read_text(encoding='utf-8').replace(
+            "<ELEMENTS>", admin_data + "<!-- <ADMIN-DATA> --><ELEMENTS>"
+        ), encoding='utf-8')
+        
+        config = MergeConfig(ignore_elements=["ADMIN-DATA"])
+        result = ArxmlMerger(config).merge_files([admin_file, files[1]])
+        
+        tags = [etree.QName(e).localname for e in result.merged_tree.iter(etree.Element)]
+        assert "ADMIN-DATA" not in tags
+        assert "APPLICATION-SW-COMPONENT-TYPE" in tags
+        assert "<!-- <ADMIN-DATA> -->" in result.to_string()
+        assert result.statistics.ignored_elements["ADMIN-DATA"] == {"nodes": 4, "bytes": len(admin_data)}
+        
+        # Gleiche Ausgabe bei beliebigen Puffergrenzen, auch mit Präfix und Verschachtelung
+        document = (b'<R xmlns:ar="urn:x">\n  <A/>\n  <ar:ADMIN-DATA a="1>2"><ADMIN-DATA/><![CDATA[</ADMIN-DATA>]]>'
+                    b'</ar:ADMIN-DATA >\n  <B>t</B>\n</R>')
+        for chunk_size in (1, 2, 5, 1 << 20):
+            reader = PruningReader(io.BytesIO(document), ["ADMIN-DATA"], chunk_size=chunk_size)
+            assert reader.read() == b'<R xmlns:ar="urn:x">\n  <A/>\n  <B>t</B>\n</R>'
+            assert reader.skipped == {"ADMIN-DATA": {"nodes": 2, "bytes": 78}}
+    
+    def test_low_memory_merge(self, temp_files):
+        """Test that the sequential low-memory merge gives the same result"""
+        files, temp_path = temp_files
+        inputs = [files[0], files[1], files[0]]
+        expected = ArxmlMerger().merge_files(inputs)
+        
+        result = ArxmlMerger(MergeConfig(low_memory=True, gc_tuning=True)).merge_files(inputs)
+        assert result.to_string() == expected.to_string()
+        assert result.statistics.files_processed == 3
+        assert result.statistics.elements_merged == expected.statistics.elements_merged
+        assert result.statistics.schema_version == "4.0"
+        assert result.statistics.largest_input == max(path.stat().st_size for path in files)
+        assert result.statistics.peak_rss is None or result.statistics.peak_rss > 0
+        
+        # Im Speicher gehaltene Modelle werden nicht zum Zielbaum
+        merger = ArxmlMerger(MergeConfig(low_memory=True))
+        merger.models = ModelStore()
+        merger.merge_files(files)
+        before = [etree.tostring(model.root_element) for model in merger.models.values()]
+        assert merger.merge_files(files).to_string() == ArxmlMerger().merge_files(files).to_string()
+        assert [etree.tostring(model.root_element) for model in merger.models.values()] == before
+    
+    def test_out_of_core_merge(self, temp_files):
+        """Test that the spilling out-of-core merge writes the same output as a full merge"""
+        files, temp_path = temp_files
+        inputs = [files[0], files[1], files[0]]
+        spill_dir = temp_path / "spill"
+        output = temp_path / "external.arxml"
+        
+        for strategy in (ConflictResolutionStrategy.MERGE_ALL, ConflictResolutionStrategy.FAIL_ON_CONFLICT):
+            config = MergeConfig(conflict_resolution=strategy, ignore_elements=["P-PORT-PROTOTYPE"])
+            expected = ArxmlMerger(config).merge_files(inputs)
+            expected.save(temp_path / "full.arxml")
+            
+            events = []
+            merger = ArxmlMerger(config)
+            merger.progress_callback = events.append
+            result = merger.merge_external(inputs, output, spill_dir=spill_dir)
+            assert output.read_bytes() == (temp_path / "full.arxml").read_bytes()
+            assert result.to_string() == expected.to_string()
+            assert [c.to_dict() for c in result.conflicts] == [c.to_dict() for c in expected.conflicts]
+            assert result.statistics.elements_merged == expected.statistics.elements_merged
+            assert result.statistics.ignored_elements == expected.statistics.ignored_elements
+            assert [(event.stage, event.done) for event in events] == [
+                ("load", 1), ("load", 2), ("load", 3), ("save", 1), ("save", 2)
+            ]
+        assert list(spill_dir.iterdir()) == []
+        
+        with pytest.raises(ArxmlMergerException):
+            ArxmlMerger().merge_external([temp_path / "bundle.zip"], output)
+    
+    def test_sharded_merge(self, temp_files):
+        """Test that shard, merge-shard and stitch resume after interruption and equal a full merge"""
+        files, temp_path = temp_files
+        inputs = [files[0], files[1], files[0]]
+        work_dir = temp_path / "work"
+        config = MergeConfig(conflict_resolution=ConflictResolutionStrategy.FAIL_ON_CONFLICT)
+        expected = ArxmlMerger(config).merge_files(inputs)
+        expected.save(temp_path / "full.arxml")
+        
+        # Abbruch nach der zweiten Datei, der zweite Lauf setzt mit der dritten fort
+        token = CancellationToken()
+        sharded = ShardedMerge(work_dir, config)
+        sharded.cancel_token = token
+        sharded.progress_callback = lambda event: token.cancel() if event.done == 2 else None
+        with pytest.raises(MergeCancelledError):
+            sharded.shard(inputs, shards=4)
+        plan = ShardedMerge(work_dir, config).shard(inputs, shards=4)
+        assert plan.shards == [[0], [1]]
+        
+        assert ShardedMerge(work_dir).merge_shard(1)
+        with pytest.raises(ArxmlMergerException):
+            ShardedMerge(work_dir).stitch(temp_path / "sharded.arxml")
+        assert ShardedMerge(work_dir).pending_shards() == [0]
+        assert ShardedMerge(work_dir).merge_shard(0)
+        assert not ShardedMerge(work_dir).merge_shard(0)
+        
+        result = ShardedMerge(work_dir).stitch(temp_path / "sharded.arxml")
+        assert (temp_path / "sharded.arxml").read_bytes() == (temp_path / "full.arxml").read_bytes()
+        assert [c.to_dict() for c in result.conflicts] == [c.to_dict() for c in expected.conflicts]
+        assert result.statistics.elements_merged == expected.statistics.elements_merged
+        
+        with pytest.raises(ArxmlMergerException):
+            ShardedMerge(work_dir, MergeConfig()).shard(inputs)
+    
+    def test_deeply_nested_merge(self):
+        """Test that the worklist merge handles package hierarchies nested 10,000 levels deep"""
+        namespace = "http://autosar.org/schema/r4.0"
+        depth = 10000
+        
+        def build_model(leaf):
+            # Der Parser erlaubt höchstens 2048 Ebenen, daher in Stücken parsen und anhängen
+            root = etree.fromstring(f'<AUTOSAR xmlns="{namespace}"><AR-PACKAGES/></AUTOSAR>')
+            parent = root[0]
+            for start in range(0, depth, 500):
+                levels = range(start, min(start + 500, depth))
+                package = etree.fromstring(
+                    f'<AR-PACKAGE xmlns="{namespace}">'
+                    + "<AR-PACKAGE>".join(f"<SHORT-NAME>P{level}</SHORT-NAME><AR-PACKAGES>" for level in levels)
+                    + "</AR-PACKAGES></AR-PACKAGE>" * len(levels),
+                    etree.XMLParser(huge_tree=True)
+                )
+                parent.append(package)
+                for _ in range(len(levels) - 1):
+                    package = package[1][0]
+                parent = package[1]
+            package = etree.SubElement(parent, f"{{{namespace}}}AR-PACKAGE")
+            etree.SubElement(package, f"{{{namespace}}}SHORT-NAME").text = leaf
+            return root, parent
+        
+        (target, deepest), (source, _) = build_model("Left"), build_model("Right")
+        merger = ArxmlMerger()
+        merger.unit_timings = {}
+        with merger._merge_context():
+            conflicts = merger._merge_single_file(target, source, merger._get_schema_handler("4.0"), "source.arxml")
+        
+        assert conflicts == []
+        assert [package[0].text for package in deepest] == ["Left", "Right"]
+        assert merger.unit_timings["AR-PACKAGE"].units == depth
+    
+    def test_package_pool_merge(self, temp_files):
+        """Test that merging packages in worker processes equals the inline merge"""
+        files, temp_path = temp_files
+        # Der Pool wird erst ab zwei Packages je Datei genutzt
+        inputs = []
+        for index, uuid in enumerate(("a", "b", "a")):
+            root = etree.parse(str(files[0])).getroot()
+            root[0].append(etree.parse(str(files[1])).getroot()[0][0])
+            root[0][0].set("UUID", uuid)
+            inputs.append(temp_path / f"packages{index}.arxml")
+            etree.ElementTree(root).write(str(inputs[-1]), encoding="UTF-8", xml_declaration=True)
+        
+        for strategy in (ConflictResolutionStrategy.MERGE_ALL, ConflictResolutionStrategy.FAIL_ON_CONFLICT):
+            config = MergeConfig(conflict_resolution=strategy)
+            expected = ArxmlMerger(config).merge_files(inputs)
+            expected.save(temp_path / "inline.arxml")
+            
+            # Schwelle 1: jedes zugeordnete Package geht an einen Worker
+            pooled = MergeConfig(conflict_resolution=strategy, package_workers=2, package_pool_threshold=1)
+            with ArxmlMerger(pooled) as merger:
+                result = merger.merge_files(inputs)
+                pool = merger._package_pool
+                # Der Pool bleibt für weitere Merges bestehen
+                assert pool is not None
+                assert merger.merge_files(inputs).to_string() == result.to_string()
+                assert merger._package_pool is pool
+            assert merger._package_pool is None
+            result.save(temp_path / "pooled.arxml")
+            
+            assert (temp_path / "pooled.arxml").read_bytes() == (temp_path / "inline.arxml").read_bytes()
+            assert [c.to_dict() for c in result.conflicts] == [c.to_dict() for c in expected.conflicts]
+            assert result.statistics.elements_merged == expected.statistics.elements_merged
+        
+        # Kleine Quell-Packages und unverhältnismäßig große Ziel-Packages bleiben inline
+        pool = PackageMergePool(MergeConfig(package_pool_threshold=3), 1)
+        try:
+            package = etree.fromstring("<P><A/><B/><C/></P>")
+            large = etree.fromstring("<P>" + "<A/>" * 20 + "</P>")
+            assert pool.accepts(package, package)
+            assert not pool.accepts(package, etree.fromstring("<P><A/></P>"))
+            assert not pool.accepts(large, package)
+            assert pool.accepts(large, large)
+        finally:
+            pool.close()
+    
+    def test_optimize_order(self, temp_files):
+        """Test that the largest input becomes the base only for order-insensitive strategies"""
+        files, temp_path = temp_files
+        large = temp_path / "large.arxml"
+        root = etree.parse(str(files[1])).getroot()
+        root[0].append(etree.parse(str(files[0])).getroot()[0][0])
+        etree.ElementTree(root).write(str(large), encoding="UTF-8", xml_declaration=True)
+        
+        for strategy, expected_order in ((ConflictResolutionStrategy.MERGE_ALL, [large, files[0]]),
+                                         (ConflictResolutionStrategy.FIRST_WINS, [files[0], large])):
+            ArxmlMerger(MergeConfig(conflict_resolution=strategy)).merge_files(expected_order).save(
+                temp_path / "expected.arxml")
+            config = MergeConfig(conflict_resolution=strategy, optimize_order=True)
+            ArxmlMerger(config).merge_files([files[0], large]).save(temp_path / "ordered.arxml")
+            assert (temp_path / "ordered.arxml").read_bytes() == (temp_path / "expected.arxml").read_bytes()
+        
+        # Basis ist die größte Datei, danach zuerst die meisten neuen Elemente
+        statistics = [InputStatistics(10, {("A",): 10}), InputStatistics(30, {("A",): 5, ("B",): 25}),
+                      InputStatistics(20, {("C",): 20}), InputStatistics(15, {("B",): 15})]
+        assert plan_merge_order(statistics) == [1, 2, 3, 0]
+    
+    def test_optimize_order_rejected_by_streaming_merges(self, temp_files):
+        """Test that merges in the given input order reject optimize_order instead of ignoring it"""
+        files, temp_path = temp_files
+        merger = ArxmlMerger(MergeConfig(optimize_order=True))
+        output = temp_path / "merged.arxml"
+        
+        for merge in (lambda: merger.merge_incremental(files, output),
+                      lambda: merger.merge_external(files, output),
+                      lambda: ShardedMerge(temp_path / "work", merger.config).shard(files),
+                      lambda: MergeWatcher(merger, files, output)):
+            with pytest.raises(ArxmlMergerException, match="optimize_order"):
+                merge()
+        assert not output.exists()
+    
+    def test_concurrent_merges_share_one_merger(self, temp_files):
+        """Test that merges running in several threads on one merger match serial merges"""
+        from concurrent.futures import ThreadPoolExecutor
+        
+        files, temp_path = temp_files
+        copy_file = temp_path / "copy.arxml"
+        copy_file.write_text(files[0].read_text(encoding='utf-8'), encoding='utf-8')
+        inputs = [[files[0], files[1]], [files[1], files[0]], [files[0], files[1], copy_file], [files[1]]] * 4
+        
+        def summary(result):
+            return result.to_string(), result.conflicts, result.statistics.subtrees_skipped
+        
+        expected = [summary(ArxmlMerger().merge_files(paths)) for paths in inputs]
+        # Auch mit geteilten Modellen im Speicher (Server), unbegrenzt und mit Verdrängung
+        for models in (None, ModelStore(), ModelStore(max_models=1)):
+            merger = ArxmlMerger()
+            merger.models = models
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                results = list(executor.map(lambda paths: summary(merger.merge_files(paths)), inputs))
+            
+            assert results == expected
+            if models is not None:
+                assert 1 <= len(models) <= (models.max_models or 3)
+                originals = {etree.tostring(ArxmlMerger().merge_files([path]).merged_tree)
+                             for path in (files[0], files[1], copy_file)}
+                assert {etree.tostring(model.root_element) for model in models.values()} <= originals
+        with pytest.raises(ArxmlMergerException):
+            merger._context
+    
+    def test_identical_subtrees_skipped(self, temp_files):
+        """Test that identical subtrees are skipped via Merkle digests without changing the result"""
+        files, temp_path = temp_files
+        copy_file = temp_path / "copy.arxml"
+        copy_file.write_text(files[0].read_text(encoding='utf-8'), encoding='utf-8')
+        
+        result = ArxmlMerger().merge_files([files[0], files[1], copy_file])
+        reference = ArxmlMerger(MergeConfig(skip_identical_subtrees=False)).merge_files(
+            [files[0], files[1], copy_file]
+        )
+        
+        assert result.statistics.subtrees_skipped == 1
+        assert result.statistics.nodes_skipped == 8
+        assert result.to_string() == reference.to_string()
+        
+        # Nur Leerraum verschieden: LAST_WINS übernimmt die Quelle, mit und ohne Überspringen
+        def write_model(name, description):
+            path = temp_path / name
+            path.write_text(files[0].read_text(encoding='utf-8').replace(
+                "<PORTS>", f"<DESC>{description}</DESC><PORTS>"
+            ), encoding='utf-8')
+            return path
+        
+        padded_inputs = [write_model("plain.arxml", "x"), write_model("padded.arxml", " x ")]
+        outputs = [
+            ArxmlMerger(MergeConfig(conflict_resolution=ConflictResolutionStrategy.LAST_WINS,
+                                    skip_identical_subtrees=skip)).merge_files(padded_inputs).to_string()
+            for skip in (True, False)
+        ]
+        assert "<DESC> x </DESC>" in outputs[0]
+        assert outputs[0] == outputs[1]
+    
+    def test_identical_subtrees_with_repeated_siblings(self, temp_files):
+        """Test that subtrees with repeated unkeyed siblings merge the same with and without skipping"""
+        files, temp_path = temp_files
+        sdgs = ["<SDG><SD>1</SD></SDG><SDG><SDX>2</SDX></SDG>",
+                "<SDG><SD>1</SD></SDG><SDG><SDX>2</SDX></SDG><SDG GID=\"other\"><SD>3</SD></SDG>"]
+        inputs = []
+        for index, sdg in enumerate([sdgs[0], sdgs[0], sdgs[1]]):
+            path = temp_path / f"sdgs{index}.arxml"
+            path.write_text(files[0].read_text(encoding='utf-8').replace(
+                "<ELEMENTS>", f"<ADMIN-DATA><SDGS>{sdg}</SDGS></ADMIN-DATA><ELEMENTS>"
+            ), encoding='utf-8')
+            inputs.append(path)
+        
+        for pair in (inputs[:2], [inputs[0], inputs[2]]):
+            for strategy in ConflictResolutionStrategy:
+                outputs = [
+                    ArxmlMerger(MergeConfig(conflict_resolution=strategy,
+                                            skip_identical_subtrees=skip)).merge_files(pair).to_string()
+                    for skip in (True, False)
+                ]
+                assert outputs[0] == outputs[1], (pair, strategy)
+        
+        # Wie ohne Überspringen wird das zweite SDG in das erste gefaltet
+        merged = "".join(ArxmlMerger().merge_files(inputs[:2]).to_string().split())
+        assert "<SDG><SD>1</SD><SDX>2</SDX></SDG><SDG><SDX>2</SDX></SDG>" in merged
+    
+    def test_plan_files_dry_run(self, temp_files):
+        """Test that the dry-run plan reports new elements and packages without merging"""
+        files, temp_path = temp_files
+        changed_file = temp_path / "changed.arxml"
+        changed_file.write_text(files[0].read_text(encoding='utf-8').replace("Port1", "Port3"),
+                                encoding='utf-8')
+        
+        plan = ArxmlMerger().plan_files([files[0], files[1], changed_file])
+        
+        assert plan.packages["/ComponentTypes2"].is_new
+        assert plan.packages["/ComponentTypes"].new_elements == [
+            "/ComponentTypes/ELEMENTS/TestComponent1/PORTS/Port3"
+        ]
+        assert plan.replaced_elements == 0
+        assert plan.conflicts == 0
+        assert "/ComponentTypes2 (new package)" in plan.format_report()
+    
+    def test_plan_matches_merge_events(self, temp_files):
+        """Test that the plan counts agree with the events of a real merge for every strategy"""
+        files, temp_path = temp_files
+        changed_files = []
+        for index, (port, desc) in enumerate((("Port3", ""), ("Port4", "<DESC>r</DESC>"))):
+            changed_file = temp_path / f"changed{index}.arxml"
+            changed_file.write_text(
+                files[0].read_text(encoding='utf-8')
+                .replace("Port1", port)
+                .replace("<APPLICATION-SW-COMPONENT-TYPE>", f'<APPLICATION-SW-COMPONENT-TYPE UUID="c{index}">')
+                .replace("</PORTS>", f"</PORTS><DESC>changed {index}</DESC>"
+                                     f"<RUNNABLE-ENTITY><SHORT-NAME>R</SHORT-NAME>{desc}</RUNNABLE-ENTITY>"),
+                encoding='utf-8'
+            )
+            changed_files.append(changed_file)
+        inputs = [files[0], files[1], changed_files[0], files[0], changed_files[1], changed_files[0]]
+        
+        for strategy in ConflictResolutionStrategy:
+            for skip in (True, False):
+                config = MergeConfig(conflict_resolution=strategy, skip_identical_subtrees=skip)
+                plan = ArxmlMerger(config).plan_files(inputs)
+                
+                merger = ArxmlMerger(config)
+                events = []
+                merger.add_observer(events.append)
+                result = merger.merge_files(inputs)
+                counts = {}
+                for event in events:
+                    name = type(event).__name__
+                    if name == "ElementAdded" and event.tag == "AR-PACKAGE" and event.split_keys is None:
+                        name = "PackageAdded"
+                    elif name == "ElementMerged" and event.split_keys is None:
+                        continue
+                    counts[name] = counts.get(name, 0) + 1
+                
+                label = (strategy, skip)
+                assert plan.new_elements == counts.get("ElementAdded", 0), label
+                assert plan.merged_elements == counts.get("ElementMerged", 0), label
+                assert plan.replaced_elements == counts.get("ElementReplaced", 0), label
+                assert sum(p.kept_elements for p in plan.packages.values()) == counts.get("ElementKept", 0), label
+                assert plan.conflicts == counts.get("ConflictDetected", 0) == len(result.conflicts), label
+                assert sum(p.is_new for p in plan.packages.values()) == counts.get("PackageAdded", 0), label
+                assert (sum(p.identical_subtrees for p in plan.packages.values()) ==
+                        result.statistics.subtrees_skipped), label
+    
     def test_conflict_resolution_strategies(self, temp_files):
         """Test verschiedene Konfliktauflösungsstrategien"""
         files, _ = temp_files
@@ -213,6 +1113,42 @@ class TestMergeConfig:
         assert config.preserve_comments == True
         assert config.output_encoding == "utf-8"
     
+    def test_parser_profiles(self):
+        """Test mapping of parser profiles and preserve flags onto lxml options"""
+        fast = MergeConfig().get_parser_options()
+        assert fast["remove_blank_text"] is True
+        assert fast["collect_ids"] is False
+        assert fast["remove_comments"] is False
+        
+        faithful = MergeConfig(preserve_formatting=True, preserve_comments=False).get_parser_options()
+        assert faithful["remove_blank_text"] is False
+        assert faithful["remove_comments"] is True
+        
+        assert MergeConfig(parser_profile="huge").get_parser_options()["huge_tree"] is True
+        
+        with pytest.raises(ArxmlMergerException):
+            ArxmlMerger(MergeConfig(parser_profile="unknown"))
+    
+    def test_fast_profile_drops_whitespace_nodes(self, tmp_path):
+        """Test that the fast profile loads no whitespace text and re-indents on save"""
+        from arxml_merger.core.models import ArxmlFile
+        
+        arxml_path = tmp_path / "formatted.arxml"
+        arxml_path.write_text(
+            '<AUTOSAR xmlns="http://autosar.org/schema/r4.0">\n'
+            '        <AR-PACKAGES>\n        <!-- note -->\n        </AR-PACKAGES>\n</AUTOSAR>',
+            encoding='utf-8'
+        )
+        
+        fast = ArxmlFile.from_file(arxml_path, MergeConfig())
+        faithful = ArxmlFile.from_file(arxml_path, MergeConfig(preserve_formatting=True))
+        stripped = ArxmlFile.from_file(arxml_path, MergeConfig(preserve_comments=False))
+        
+        assert fast.root_element.text is None
+        assert faithful.root_element.text == "\n        "
+        assert len(fast.root_element[0]) == 1
+        assert len(stripped.root_element[0]) == 0
+    
     def test_merge_config_custom(self):
         """Test benutzerdefinierte Konfiguration"""
         config = MergeConfig(
@@ -243,6 +1179,20 @@ class TestXmlUtils:
         assert "APPLICATION-SW-COMPONENT-TYPE" in signature
         assert "SHORT-NAME=TestComponent" in signature
     
+    def test_create_element_hash_ignores_formatting(self):
+        """Test Merkle-Hash: Attributreihenfolge und entfernte Formatierung egal, Inhalt nicht"""
+        from arxml_merger.utils.xml_utils import create_element_hash
+        
+        parser = etree.XMLParser(remove_blank_text=True)
+        compact = etree.fromstring(b'<A x="1" y="2"><B>t</B><C><D/></C></A>')
+        formatted = etree.fromstring(b'<A y="2" x="1">\n  <B>t</B>\n  <C>\n    <D/>\n  </C>\n</A>', parser)
+        padded = etree.fromstring(b'<A x="1" y="2"><B> t </B><C><D/></C></A>')
+        changed = etree.fromstring(b'<A x="1" y="2"><B>t</B><C><E/></C></A>')
+        
+        assert create_element_hash(compact) == create_element_hash(formatted)
+        assert create_element_hash(compact) != create_element_hash(padded)
+        assert create_element_hash(compact) != create_element_hash(changed)
+    
     def test_validate_arxml_structure(self):
         """Test ARXML-Struktur-Validierung"""
         from arxml_merger.utils.xml_utils import validate_arxml_structure
@@ -265,5 +1215,66 @@ class TestXmlUtils:
         assert "Root-Element ist nicht 'AUTOSAR'" in errors
 
 
+class TestInputDiscovery:
+    """Test class for --input-dir discovery and manifests"""
+    
+    def test_discover_files_sorted_and_cached(self, tmp_path, monkeypatch):
+        """Test recursive discovery order and reuse of the cached file list"""
+        from arxml_merger.utils import discovery
+        
+        (tmp_path / "models" / "b").mkdir(parents=True)
+        (tmp_path / "models" / "a").mkdir()
+        for name in ["models/b/Z.ARXML", "models/a/y.arxml.gz", "models/x.arxml", "models/a/notes.txt"]:
+            (tmp_path / name).write_text("<AUTOSAR/>")
+        cache_file = tmp_path / "cache.json"
+        
+        files = discovery.discover_files([tmp_path / "models"], cache_file=cache_file)
+        assert [f.relative_to(tmp_path / "models").as_posix() for f in files] == [
+            "a/y.arxml.gz", "b/Z.ARXML", "x.arxml"
+        ]
+        
+        # Unveränderte Verzeichnisse: keine erneute Suche
+        def fail_scan(*args):
+            raise AssertionError("directories rescanned")
+        monkeypatch.setattr(discovery, "_scan_tree", fail_scan)
+        assert discovery.discover_files([tmp_path / "models"], cache_file=cache_file) == files
+        
+        monkeypatch.undo()
+        (tmp_path / "models" / "b" / "new.arxml").write_text("<AUTOSAR/>")
+        assert len(discovery.discover_files([tmp_path / "models"], cache_file=cache_file)) == 4
+    
+    def test_discovery_cache_needs_cache_dir(self, tmp_path):
+        """Test that the CLI caches the discovered file list only below a configured cache directory"""
+        import argparse
+        from arxml_merger.cli import discovery_cache
+        
+        args = argparse.Namespace(input_dir=[str(tmp_path)], input_pattern=["*.arxml"], no_discovery_cache=False,
+                                  cache_dir=None, model_cache_dir=None)
+        assert discovery_cache(args) is None
+        
+        args.model_cache_dir = str(tmp_path / "models")
+        assert discovery_cache(args).parent == tmp_path / "models" / "discovery"
+        args.cache_dir = str(tmp_path / "results")
+        assert discovery_cache(args).parent == tmp_path / "results" / "discovery"
+        
+        args.no_discovery_cache = True
+        assert discovery_cache(args) is None
+    
+    def test_read_manifest_priorities(self, tmp_path):
+        """Test manifest parsing: relative paths, comments and stable priority order"""
+        from arxml_merger.utils.discovery import read_manifest
+        
+        for name in ["base.arxml", "override.arxml", "extra.arxml"]:
+            (tmp_path / name).write_text("<AUTOSAR/>")
+        manifest = tmp_path / "inputs.txt"
+        manifest.write_text("# inputs\n10 override.arxml\nbase.arxml\n\nextra.arxml\n")
+        
+        assert [f.name for f in read_manifest(manifest)] == ["base.arxml", "extra.arxml", "override.arxml"]
+        
+        manifest.write_text("missing.arxml\n")
+        with pytest.raises(FileNotFoundError):
+            read_manifest(manifest)
+
+
 if __name__ == "__main__":
     pytest.main([__file__])
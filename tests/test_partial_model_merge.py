@@ -8,7 +8,8 @@ from pathlib import Path
 from lxml import etree
 
 from arxml_merger import ArxmlMerger, MergeConfig, ConflictResolutionStrategy
-from arxml_merger.schema.autosar_schema import SchemaDetector
+from arxml_merger.core.exceptions import ArxmlMergerException, SplitKeyError
+from arxml_merger.schema.autosar_schema import SchemaDetector, compile_split_key_extractor
 from arxml_merger.utils.xml_utils import get_element_signature, find_matching_element
 
 
@@ -248,5 +249,86 @@ class TestAutosarSchemaHandlerEnhancements:
         assert split_keys[0] == "SHORT-NAME"
 
 
+class TestCustomSplitKeys:
+    """Tests for compiled custom split keys from MergeConfig.custom_split_keys"""
+    
+    @staticmethod
+    def _variant_model(variant):
+        return f"""<?xml version="1.0" encoding="UTF-8"?>
+<AUTOSAR xmlns="http://autosar.org/schema/r4.0">
+    <AR-PACKAGES>
+        <AR-PACKAGE>
+            <SHORT-NAME>Components</SHORT-NAME>
+            <ELEMENTS>
+                <APPLICATION-SW-COMPONENT-TYPE>
+                    <SHORT-NAME>Comp</SHORT-NAME>
+                    <PORTS>
+                        <P-PORT-PROTOTYPE>
+                            <SHORT-NAME>Port</SHORT-NAME>
+                            <VARIANT>{variant}</VARIANT>
+                        </P-PORT-PROTOTYPE>
+                    </PORTS>
+                </APPLICATION-SW-COMPONENT-TYPE>
+            </ELEMENTS>
+        </AR-PACKAGE>
+    </AR-PACKAGES>
+</AUTOSAR>"""
+    
+    @pytest.fixture
+    def variant_files(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            temp_path = Path(temp_dir)
+            files = []
+            for variant in ("A", "B"):
+                file_path = temp_path / f"variant_{variant}.arxml"
+                file_path.write_text(self._variant_model(variant), encoding='utf-8')
+                files.append(file_path)
+            yield files
+    
+    def test_compiled_extractor_matches_signature(self):
+        """Compiled key tuples are equal exactly when element signatures are equal"""
+        element = etree.fromstring(b"""<X xmlns="http://autosar.org/schema/r4.0" INDEX="2">
+            <SHORT-NAME> Name </SHORT-NAME><VARIANT></VARIANT></X>""")
+        
+        assert compile_split_key_extractor(["SHORT-NAME"])(element) == ("Name",)
+        assert compile_split_key_extractor(["SHORT-NAME", "INDEX", "VARIANT"])(element) == ("Name", "2", None)
+    
+    def test_composite_key_keeps_variants_apart(self, variant_files):
+        """Elements with equal SHORT-NAME but different VARIANT are not merged"""
+        default_result = ArxmlMerger().merge_files(variant_files)
+        config = MergeConfig(custom_split_keys={"P-PORT-PROTOTYPE": ["SHORT-NAME", "VARIANT"]})
+        custom_result = ArxmlMerger(config).merge_files(variant_files)
+        
+        def count_ports(root):
+            return len([e for e in root.iter() if etree.QName(e).localname == "P-PORT-PROTOTYPE"])
+        
+        assert count_ports(default_result.merged_tree) == 1
+        assert count_ports(custom_result.merged_tree) == 2
+    
+    @pytest.mark.parametrize("custom_split_keys", [
+        {"P-PORT-PROTOTYPE": []},
+        {"P-PORT-PROTOTYPE": "SHORT-NAME"},
+        {"P-PORT-PROTOTYPE": ["SHORT NAME"]},
+        {"P-PORT-PROTOTYPE": ["SHORT-NAME", "SHORT-NAME"]},
+        {"": ["SHORT-NAME"]},
+    ])
+    def test_invalid_split_keys_rejected_at_construction(self, custom_split_keys):
+        """Invalid split key specifications fail before any file is parsed"""
+        with pytest.raises(SplitKeyError):
+            ArxmlMerger(MergeConfig(custom_split_keys=custom_split_keys))
+    
+    @pytest.mark.parametrize("ignore_elements", [
+        ["ADMIN-DATA", "ÄNDERUNG"],
+        ["ADMIN DATA"],
+        [""],
+        [None],
+        "ADMIN-DATA",
+    ])
+    def test_invalid_ignore_elements_rejected_at_construction(self, ignore_elements):
+        """Invalid ignored element names fail before any file is parsed and name the entry"""
+        with pytest.raises(ArxmlMergerException, match="ignore_elements"):
+            ArxmlMerger(MergeConfig(ignore_elements=ignore_elements))
+
+
 if __name__ == "__main__":
     pytest.main([__file__])
\ No newline at end of file